@@ -76,7 +76,7 @@ export const RENDERER_DIST = path.join(process.env.APP_ROOT, 'dist')
 process.env.VITE_PUBLIC = VITE_DEV_SERVER_URL ? path.join(process.env.APP_ROOT, 'public') : RENDERER_DIST
 
 // Toast通知ログの型定義
-import type { ToastLog } from '../src/types/toast-log'
+import type { DryRunRequest, DryRunResponse, HistoryPage, HistoryQuery, SpeechNormalizeOptions, ToastLog } from '../src/types/toast-log'
 
 let win: BrowserWindow | null
 let toastBridgeProcess: ChildProcess | null = null
@@ -84,6 +84,16 @@ let toastBridgeProcess: ChildProcess | null = null
 const storedLogs: ToastLog[] = []
 // 利用可能な音声リストを保持（リロード時も保持）
 let storedAvailableVoices: string[] = []
+// 通知履歴の検索（history_query）の応答待ち（request_idごと）
+const pendingHistoryQueries = new Map<number, (page: HistoryPage) => void>()
+let nextHistoryRequestId = 1
+// 応答がない場合に検索を打ち切るまでの時間（ミリ秒）
+const HISTORY_QUERY_TIMEOUT_MS = 10000
+// 読み上げルールの試行（dry_run）の応答待ち（request_idごと）
+const pendingDryRuns = new Map<number, (response: DryRunResponse) => void>()
+let nextDryRunRequestId = 1
+// 応答がない場合に試行を打ち切るまでの時間（ミリ秒。数千件を処理するため検索より長くする）
+const DRY_RUN_TIMEOUT_MS = 60000
 
 function createWindow() {
   win = new BrowserWindow({
@@ -190,6 +200,26 @@ function startToastBridge() {
       if (line.trim()) {
         try {
           const message = JSON.parse(line.trim())
+
+          // 通知履歴の検索結果は要求元に返すだけで、ログには残さない
+          if (message.type === 'history_page') {
+            const resolve = pendingHistoryQueries.get(message.request_id)
+            if (resolve) {
+              pendingHistoryQueries.delete(message.request_id)
+              resolve({ items: message.items || [], next_cursor: message.next_cursor ?? null, enabled: message.enabled, error: message.error })
+            }
+            continue
+          }
+
+          // 読み上げルールの試行結果も要求元に返すだけで、ログには残さない
+          if (message.type === 'dry_run_result') {
+            const resolve = pendingDryRuns.get(message.request_id)
+            if (resolve) {
+              pendingDryRuns.delete(message.request_id)
+              resolve({ results: message.results || [], summary: message.summary ?? null, error: message.error })
+            }
+            continue
+          }
           
           // Electronのコンソールにログ出力
           const source = message.source || 'toast_bridge'
@@ -240,7 +270,12 @@ function startToastBridge() {
           
           // debugタイプ以外のメッセージをReact側に転送
           // debugタイプはコンソールのみで、UIには表示しない
-          if (message.type !== 'debug') {
+          // metricsタイプは定期的に届くため、ログには保持せず転送のみ行う
+          if (message.type === 'metrics') {
+            if (win && !win.isDestroyed()) {
+              win.webContents.send('toast-log', message)
+            }
+          } else if (message.type !== 'debug') {
             // ログを配列に追加（最大1000件まで保持）
             storedLogs.push(message)
             if (storedLogs.length > 1000) {
@@ -363,8 +398,9 @@ function stopToastBridge() {
 
 /**
  * テキストをPythonプロセスに送信して読み上げる
+ * normalize は通知の場合のみ指定する（Python側で正規化する。手動の読み上げは正規化しない）
  */
-function speakText(text: string) {
+function speakText(text: string, appId = '', shortText = '', normalize?: SpeechNormalizeOptions) {
   if (!toastBridgeProcess || !toastBridgeProcess.stdin) {
     const errorMsg = 'Toast Bridge: 読み上げプロセスが起動していません'
     console.error(errorMsg)
@@ -385,7 +421,11 @@ function speakText(text: string) {
 
   const message = {
     type: 'speak',
-    text: text
+    text: text,
+    app_id: appId,
+    // 読み上げ待ちが多いときに代わりに読み上げる短いテキスト（空の場合は全文を読み上げる）
+    short_text: shortText,
+    ...(normalize ? { normalize } : {})
   }
 
   try {
@@ -474,14 +514,91 @@ function setVoice(voiceName: string) {
   }
 }
 
+/**
+ * 通知履歴を1ページ分検索する（Pythonプロセスの history_query に転送して応答を待つ）
+ */
+function queryHistory(query: HistoryQuery): Promise<HistoryPage> {
+  if (!toastBridgeProcess || !toastBridgeProcess.stdin || toastBridgeProcess.stdin.destroyed) {
+    return Promise.resolve({ items: [], next_cursor: null, error: '読み上げプロセスが起動していません' })
+  }
+
+  const requestId = nextHistoryRequestId++
+  const message = {
+    type: 'history_query',
+    request_id: requestId,
+    query: query.query ?? '',
+    app_id: query.app_id ?? '',
+    cursor: query.cursor ?? null,
+    limit: query.limit,
+  }
+
+  return new Promise((resolve) => {
+    const timer = setTimeout(() => {
+      pendingHistoryQueries.delete(requestId)
+      resolve({ items: [], next_cursor: null, error: '通知履歴の検索がタイムアウトしました' })
+    }, HISTORY_QUERY_TIMEOUT_MS)
+
+    pendingHistoryQueries.set(requestId, (page) => {
+      clearTimeout(timer)
+      resolve(page)
+    })
+
+    try {
+      toastBridgeProcess?.stdin?.write(JSON.stringify(message) + '\n', 'utf-8')
+    } catch (error) {
+      clearTimeout(timer)
+      pendingHistoryQueries.delete(requestId)
+      resolve({ items: [], next_cursor: null, error: `通知履歴の検索コマンド送信エラー ${error}` })
+    }
+  })
+}
+
+/**
+ * 読み上げルールを通知に適用した結果を取得する（Pythonプロセスの dry_run に転送して応答を待つ。読み上げは行わない）
+ */
+function dryRun(request: DryRunRequest): Promise<DryRunResponse> {
+  if (!toastBridgeProcess || !toastBridgeProcess.stdin || toastBridgeProcess.stdin.destroyed) {
+    return Promise.resolve({ results: [], summary: null, error: '読み上げプロセスが起動していません' })
+  }
+
+  const requestId = nextDryRunRequestId++
+  const message = {
+    type: 'dry_run',
+    request_id: requestId,
+    settings: request.settings ?? {},
+    notifications: request.notifications,
+    history: request.history,
+  }
+
+  return new Promise((resolve) => {
+    const timer = setTimeout(() => {
+      pendingDryRuns.delete(requestId)
+      resolve({ results: [], summary: null, error: '読み上げルールの試行がタイムアウトしました' })
+    }, DRY_RUN_TIMEOUT_MS)
+
+    pendingDryRuns.set(requestId, (response) => {
+      clearTimeout(timer)
+      resolve(response)
+    })
+
+    try {
+      toastBridgeProcess?.stdin?.write(JSON.stringify(message) + '\n', 'utf-8')
+    } catch (error) {
+      clearTimeout(timer)
+      pendingDryRuns.delete(requestId)
+      resolve({ results: [], summary: null, error: `読み上げルールの試行コマンド送信エラー ${error}` })
+    }
+  })
+}
+
 // IPCハンドラー: レンダラーから読み上げリクエストを受け取る
-ipcMain.on('speak-text', (_event, text: string) => {
+ipcMain.on('speak-text', (_event, text: string, appId?: string, shortText?: string, normalize?: SpeechNormalizeOptions) => {
   const logMsg = `IPC受信: speak-text ${text}`
   console.log(logMsg)
   if (win && !win.isDestroyed()) {
     win.webContents.send('console-log', { level: 'log', source: 'main', message: logMsg })
   }
-  speakText(text)
+  speakText(text, appId, shortText, normalize)
 })
 
 // IPCハンドラー: レンダラーから音量設定リクエストを受け取る
@@ -513,6 +630,16 @@ ipcMain.handle('get-stored-logs', () => {
   return storedLogs
 })
 
+// IPCハンドラー: 通知履歴を1ページ分検索
+ipcMain.handle('query-history', (_event, query: HistoryQuery) => {
+  return queryHistory(query || {})
+})
+
+// IPCハンドラー: 読み上げルールを試行（読み上げは行わない）
+ipcMain.handle('dry-run', (_event, request: DryRunRequest) => {
+  return dryRun(request || { settings: {} })
+})
+
 // IPCハンドラー: 保持されている利用可能な音声リストを取得
 ipcMain.handle('get-available-voices', () => {
   return storedAvailableVoices
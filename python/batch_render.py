@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+# batch_render.py
+# 通知ログ（JSONL）をまとめて読み上げ用テキストに変換し、1件ずつWAVファイルに書き出すCLI
+#
+# 使い方:
+#   python python/batch_render.py notifications.jsonl --output-dir renders
+#   python python/batch_render.py notifications.jsonl --output-dir renders --engine null --workers 4
+#
+# 入力は1行1件のJSON。以下の形式に対応する:
+#   - 通知（app, title, text）。type を持つ場合は "notification" のみ対象
+#   - past_notifications メッセージ（notifications の各要素を対象にする）
+#
+# 出力:
+#   - output-dir/000001.wav ...（入力の通し番号）
+#   - output-dir/manifest.jsonl（完了した1件ごとの結果。再実行時はここに記録済みの件を読み飛ばす）
+#   - stdout に1件ごとの結果（render_result）と集計（render_summary）をJSONで出力する
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import config
+from logger import send_json, set_output_sink
+
+MANIFEST_FILE_NAME = "manifest.jsonl"
+
+# ワーカープロセスごとの読み上げエンジン（_init_worker で作成）
+_worker_engine = None
+
+
+def iter_notifications(path: str):
+    """
+    入力JSONLから通知を1件ずつ返すジェネレーター
+
+    Yields:
+        (通し番号（1から）, 通知の辞書)
+    """
+    index = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(record, dict):
+                continue
+
+            msg_type = record.get("type")
+            if msg_type == "past_notifications":
+                logs = record.get("notifications") or []
+            elif msg_type in (None, "notification"):
+                logs = [record]
+            else:
+                continue
+
+            for log in logs:
+                index += 1
+                yield index, log
+
+
+def load_manifest(output_dir: str) -> set:
+    """manifest.jsonl から書き出し済みの通し番号を読み込む（WAVファイルが残っているもののみ）"""
+    done = set()
+    path = os.path.join(output_dir, MANIFEST_FILE_NAME)
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # 中断時に書きかけになった最終行
+                continue
+            if entry.get("ok") and os.path.exists(os.path.join(output_dir, entry.get("file", ""))):
+                done.add(entry["index"])
+    return done
+
+
+def _forward_errors(data: dict):
+    """ワーカープロセスのログはエラーのみstderrに出力する"""
+    if data.get("type") == "error":
+        print(json.dumps(data, ensure_ascii=False), file=sys.stderr, flush=True)
+
+
+def _init_worker(engine_name: str):
+    """ワーカープロセスの初期化（読み上げエンジンとe2kはプロセスごとに1回だけ準備する）"""
+    global _worker_engine
+    set_output_sink(_forward_errors)
+
+    # SAPIはスレッドごとにCOMの初期化が必要（ワーカーの終了まで保持する）
+    from tts_engine import create_engine, pythoncom
+    if pythoncom is not None:
+        pythoncom.CoInitialize()
+
+    config.load_e2k()
+    _worker_engine = create_engine(engine_name)
+
+
+def _render_one(task: tuple) -> dict:
+    """
+    1件の通知を読み上げ用テキストに変換してWAVファイルに書き出す（ワーカープロセスで実行）
+
+    Args:
+        task: (通し番号, 通知の辞書, 出力先ディレクトリ)
+
+    Returns:
+        結果の辞書（index, file, text, ok, error, elapsed_ms）
+    """
+    from text_processor import convert_english_to_katakana, process_notification_for_speech
+
+    index, log, output_dir = task
+    file_name = f"{index:06d}.wav"
+    result = {"index": index, "file": file_name, "text": "", "ok": False}
+    start = time.perf_counter()
+    try:
+        text = convert_english_to_katakana(process_notification_for_speech(log))
+        result["text"] = text
+
+        # 書きかけのファイルを完了扱いにしないよう、一時ファイルに書き出してから置き換える
+        path = os.path.join(output_dir, file_name)
+        part_path = f"{path}.part"
+        _worker_engine.render_to_wav(text, part_path)
+        os.replace(part_path, path)
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+def render_batch(
+    input_path: str,
+    output_dir: str,
+    engine_name: str = None,
+    workers: int = None,
+    chunksize: int = 8,
+    force: bool = False,
+) -> dict:
+    """
+    通知ログをプロセスプールで並列にWAVファイルへ書き出す
+
+    完了した結果から順に manifest.jsonl へ追記し、stdoutに出力する（完了順のため入力順とは限らない）。
+    中断後に同じ output_dir で再実行すると、書き出し済みの件は読み飛ばす
+
+    Args:
+        input_path: 入力JSONLのパス
+        output_dir: 出力先ディレクトリ
+        engine_name: 読み上げエンジン名（Noneの場合は config.TTS_ENGINE、未指定なら環境に応じて選択）
+        workers: ワーカープロセス数（Noneの場合はCPUコア数）
+        chunksize: 1回にワーカーへ渡す件数
+        force: Trueの場合は manifest.jsonl を無視してすべて書き出し直す
+
+    Returns:
+        集計の辞書（rendered, skipped, failed, elapsed_seconds, utterances_per_second）
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE_NAME)
+    if force and os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    done = load_manifest(output_dir)
+    workers = workers or os.cpu_count() or 1
+
+    skipped = 0
+
+    def pending_tasks():
+        nonlocal skipped
+        for index, log in iter_notifications(input_path):
+            if index in done:
+                skipped += 1
+                continue
+            yield index, log, output_dir
+
+    rendered = 0
+    failed = 0
+    start = time.perf_counter()
+    # supervisorと同じく、Windows/PyInstallerでも動作するspawnを使用する
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(engine_name,)) as pool, \
+            open(manifest_path, "a", encoding="utf-8") as manifest:
+        for result in pool.imap_unordered(_render_one, pending_tasks(), chunksize=chunksize):
+            manifest.write(json.dumps(result, ensure_ascii=False) + "\n")
+            manifest.flush()
+            if result["ok"]:
+                rendered += 1
+            else:
+                failed += 1
+            send_json({"type": "render_result", "source": "batch_render", **result})
+    elapsed = time.perf_counter() - start
+
+    return {
+        "rendered": rendered,
+        "skipped": skipped,
+        "failed": failed,
+        "workers": workers,
+        "elapsed_seconds": round(elapsed, 3),
+        "utterances_per_second": round(rendered / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="通知ログ（JSONL）を1件ずつWAVファイルに書き出す")
+    parser.add_argument("input", help="通知ログ（JSONL）")
+    parser.add_argument("--output-dir", default="renders", help="出力先ディレクトリ")
+    parser.add_argument("--engine", default=None, help="読み上げエンジン（sapi / espeak / null）")
+    parser.add_argument("--workers", type=int, default=None, help="ワーカープロセス数（省略時はCPUコア数）")
+    parser.add_argument("--chunksize", type=int, default=8, help="1回にワーカーへ渡す件数")
+    parser.add_argument("--force", action="store_true", help="書き出し済みの件も含めてすべて書き出し直す")
+    args = parser.parse_args(argv)
+
+    summary = render_batch(
+        args.input, args.output_dir,
+        engine_name=args.engine, workers=args.workers, chunksize=args.chunksize, force=args.force,
+    )
+    send_json({"type": "render_summary", "source": "batch_render", **summary})
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# bench_katakana.py
+# 英語→片仮名変換のベンチマーク（従来の処理 vs convert_english_to_katakana の事前確認・全角英数字の半角化・単語ごとのキャッシュ）
+#
+# 使い方:
+#   python python/benchmarks/bench_katakana.py
+#   python python/benchmarks/bench_katakana.py --size 5000 --repeat 5
+#
+# 日本語のみ・日英混在・英語中心の3種類の合成コーパスで計測する。
+# debugログは出力先を差し替えて捨てる（ログの組み立てにかかる時間は計測に含める）。
+# 単語ごとの変換結果のキャッシュは計測の繰り返しごとに空にする
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+from logger import log_debug, log_error, set_output_sink  # noqa: E402
+from pronunciation_dict import get_pronunciation_dict  # noqa: E402
+from text_processor import _e2k_convert_word, convert_english_to_katakana  # noqa: E402
+
+
+def legacy_convert_english_to_katakana(text: str) -> str:
+    """従来の処理を再現した変換（英字の有無にかかわらずe2kの確認・分割・ログ出力を行う）"""
+    if not text:
+        return text
+    parts = get_pronunciation_dict().split(text)
+    if len(parts) > 1 or parts[0][1] is not None:
+        return "".join(reading if reading is not None else _legacy_runs(part) for part, reading in parts)
+    return _legacy_runs(text)
+
+
+def _legacy_runs(text: str) -> str:
+    if not config.load_e2k():
+        log_debug(f"convert_english_to_katakana: e2kが利用できません。元のテキストを返します: {text[:50]}...")
+        return text
+    try:
+        log_debug(f"convert_english_to_katakana: 変換前テキスト: {text[:100]}...")
+        pattern = re.compile(r'([a-zA-Z]+)|([^a-zA-Z]+)')
+        converted_parts = []
+        for english_chunk, non_english_chunk in pattern.findall(text):
+            if english_chunk:
+                # 従来は単語ごとのキャッシュがないため、キャッシュを通さずに変換する
+                converted_parts.append(_e2k_convert_word.__wrapped__(english_chunk))
+            elif non_english_chunk:
+                converted_parts.append(non_english_chunk)
+        result = ''.join(converted_parts)
+        log_debug(f"convert_english_to_katakana: 変換成功: {text[:50]}... → {result[:50]}...")
+        return result
+    except Exception as e:
+        log_error(f"convert_english_to_katakana: e2k変換エラー: {e}")
+        return text
+
+
+JAPANESE_PHRASES = [
+    "新しいメッセージがあります", "会議が5分後に始まります", "ビルドが成功しました",
+    "レビューを依頼されました", "ファイルのアップロードが完了しました", "山田さんからの着信",
+    "明日の予定を確認してください", "バッテリー残量が少なくなっています",
+]
+ENGLISH_WORDS = [
+    "Slack", "Teams", "Google", "Chrome", "Outlook", "Discord", "GitHub", "build", "deploy",
+    "review", "meeting", "update", "download", "API", "PR", "CI",
+]
+FULLWIDTH_WORDS = ["Ｇｏｏｇｌｅ", "Ｓｌａｃｋ", "ＰＣ", "ＡＰＩ", "Ｚｏｏｍ"]
+
+
+def build_corpus(kind: str, size: int, seed: int = 42) -> list:
+    """
+    合成コーパスを作成する
+
+    Args:
+        kind: "japanese"（日本語のみ）, "mixed"（日本語に英単語・全角英字が混在）, "english"（英語中心）
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        if kind == "japanese":
+            text = "、".join(rng.choice(JAPANESE_PHRASES) for _ in range(rng.randint(1, 4)))
+        elif kind == "mixed":
+            words = [rng.choice(ENGLISH_WORDS + FULLWIDTH_WORDS) for _ in range(rng.randint(1, 2))]
+            text = f"{' '.join(words)}、{rng.choice(JAPANESE_PHRASES)}"
+        else:
+            text = " ".join(rng.choice(ENGLISH_WORDS) for _ in range(rng.randint(4, 12)))
+        corpus.append(text)
+    return corpus
+
+
+def bench(func, corpus: list, repeat: int) -> tuple:
+    """corpus全体をrepeat回処理し、最良の所要時間（秒）と出力を返す"""
+    best = float("inf")
+    outputs = []
+    for _ in range(repeat):
+        _e2k_convert_word.cache_clear()
+        start = time.perf_counter()
+        outputs = [func(text) for text in corpus]
+        best = min(best, time.perf_counter() - start)
+    return best, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="英語→片仮名変換のベンチマーク")
+    parser.add_argument("--size", type=int, default=200, help="コーパスごとの件数")
+    parser.add_argument("--repeat", type=int, default=1, help="計測の繰り返し回数（最良値を採用）")
+    args = parser.parse_args()
+
+    set_output_sink(lambda _data: None)
+    e2k_available = config.load_e2k()
+    # 単語ごとの変換結果のばらつきを除くため、モデルの読み込みは計測前に済ませる
+    convert_english_to_katakana("warm up")
+
+    print(f"e2k: {'利用可能' if e2k_available else '利用不可（英字は変換されません）'}")
+    print(f"{'コーパス':<12}{'件数':>8}{'従来(ms)':>12}{'事前確認(ms)':>14}{'速度比':>10}{'全角英字の変換':>16}")
+    for kind in ("japanese", "mixed", "english"):
+        corpus = build_corpus(kind, args.size)
+        legacy_time, legacy_outputs = bench(legacy_convert_english_to_katakana, corpus, args.repeat)
+        fast_time, fast_outputs = bench(convert_english_to_katakana, corpus, args.repeat)
+        # 全角英字を含む通知のうち、片仮名に変換された件数（従来は全角のまま残る）
+        fullwidth = [i for i, text in enumerate(corpus) if any(word in text for word in FULLWIDTH_WORDS)]
+        converted = sum(1 for i in fullwidth if fast_outputs[i] != legacy_outputs[i])
+        print(
+            f"{kind:<12}{len(corpus):>8}{legacy_time * 1000:>12.1f}{fast_time * 1000:>14.1f}"
+            f"{legacy_time / fast_time:>9.2f}x{f'{converted}/{len(fullwidth)}':>16}"
+        )
+
+
+if __name__ == "__main__":
+    main()
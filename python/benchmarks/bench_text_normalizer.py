@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# bench_text_normalizer.py
+# 読み上げテキスト正規化のベンチマーク（従来の複数回置換 vs normalize_speech_text）
+#
+# 使い方:
+#   python python/benchmarks/bench_text_normalizer.py
+#   python python/benchmarks/bench_text_normalizer.py --corpus notifications.jsonl --repeat 5
+#
+# --corpus には1行1通知のJSONL（app, title, text）を指定する。省略時は合成コーパスを使用する
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_processor import build_speech_text  # noqa: E402
+
+TEMPLATE = "{app}、{title}、{text}"
+CONSECUTIVE_MIN_LENGTH = 4
+# 読み上げ時間の推定に使う1秒あたりの文字数（SAPI標準速度の日本語音声の目安）
+SPOKEN_CHARS_PER_SECOND = 8.0
+
+
+def multi_pass_speech_text(log: dict, template: str, consecutive_min_length: int, max_length: int) -> str:
+    """従来の処理（process_notification_for_speech + ToastLogContext.tsx）を再現した複数回置換"""
+    text = template
+    app_text = (log.get("app") or "").strip()
+    title_text = (log.get("title") or "").strip()
+    text_content = (log.get("text") or "").replace("\n", " ").strip()
+
+    text = text.replace("{app}", app_text)
+    text = text.replace("{title}", title_text)
+    text = text.replace("{text}", text_content)
+
+    if consecutive_min_length > 0:
+        pattern = re.compile(rf"(.)\1{{{consecutive_min_length - 1},}}")
+        text = pattern.sub(lambda m: m.group()[0] * 3, text)
+
+    text = re.sub(r"\s+", " ", text).strip()
+    text = re.sub(r"[、，,]+", "、", text).strip()
+    text = re.sub(r"^[、，,]+|[、，,]+$", "", text).strip()
+
+    if max_length > 0 and len(text) > max_length:
+        text = text[:max_length] + "以下省略"
+    return text or "通知があります"
+
+
+def build_synthetic_corpus(size: int, seed: int = 42) -> list:
+    """短い日本語の通知と、URL・絵文字・長い数字・記号を含む長い通知を混ぜた合成コーパス"""
+    rng = random.Random(seed)
+    apps = ["Slack", "Microsoft Teams", "Google Chrome", "Outlook", "LINE", "Discord"]
+    phrases = [
+        "新しいメッセージがあります", "会議が5分後に始まります", "ビルドが成功しました",
+        "レビューを依頼されました", "ファイルのアップロードが完了しました",
+    ]
+    noise = [
+        "https://example.com/pull/12345?tab=files#diff-abcdef",
+        "🎉🎉🎉", "🔥", "！！！！！", "。。。。", "wwwwwwww", "ーーーーーー",
+        "注文番号 1234567890123456", "\n\n", "  ,  ,  ", "…………",
+    ]
+    corpus = []
+    for i in range(size):
+        body = rng.choice(phrases)
+        if i % 2 == 0:
+            # 長くノイズの多い通知
+            body = " ".join(rng.choice(phrases + noise) for _ in range(rng.randint(10, 40)))
+        corpus.append({
+            "app": rng.choice(apps),
+            "title": rng.choice(phrases),
+            "text": body,
+        })
+    return corpus
+
+
+def load_corpus(path: str) -> list:
+    """JSONLファイルから通知コーパスを読み込む"""
+    corpus = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                corpus.append(json.loads(line))
+    return corpus
+
+
+def bench(func, corpus: list, repeat: int) -> tuple:
+    """corpus全体をrepeat回処理し、最良の所要時間（秒）と出力の合計文字数を返す"""
+    best = float("inf")
+    total_chars = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        total_chars = sum(len(func(log)) for log in corpus)
+        best = min(best, time.perf_counter() - start)
+    return best, total_chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description="読み上げテキスト正規化のベンチマーク")
+    parser.add_argument("--corpus", help="通知コーパス（JSONL）。省略時は合成コーパス")
+    parser.add_argument("--size", type=int, default=20000, help="合成コーパスの件数")
+    parser.add_argument("--repeat", type=int, default=5, help="計測の繰り返し回数（最良値を採用）")
+    parser.add_argument("--max-length", type=int, default=0, help="最大文字数（0で無効）")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else build_synthetic_corpus(args.size)
+    input_chars = sum(len(log.get("title") or "") + len(log.get("text") or "") for log in corpus)
+
+    multi_time, multi_chars = bench(
+        lambda log: multi_pass_speech_text(log, TEMPLATE, CONSECUTIVE_MIN_LENGTH, args.max_length),
+        corpus, args.repeat,
+    )
+    single_time, single_chars = bench(
+        lambda log: build_speech_text(log, TEMPLATE, CONSECUTIVE_MIN_LENGTH, args.max_length),
+        corpus, args.repeat,
+    )
+
+    print(f"コーパス: {len(corpus)}件, 入力 {input_chars}文字")
+    print(f"{'方式':<16}{'合計(ms)':>12}{'1件(us)':>12}{'出力文字数':>14}{'推定読み上げ(分)':>18}")
+    for name, elapsed, chars in (
+        ("複数回置換", multi_time, multi_chars),
+        ("single-pass", single_time, single_chars),
+    ):
+        per_item = elapsed / len(corpus) * 1e6
+        spoken_minutes = chars / SPOKEN_CHARS_PER_SECOND / 60
+        print(f"{name:<16}{elapsed * 1000:>12.1f}{per_item:>12.2f}{chars:>14}{spoken_minutes:>18.1f}")
+    print(f"速度比: {multi_time / single_time:.2f}x, 出力文字数: {single_chars / multi_chars:.1%}")
+
+
+if __name__ == "__main__":
+    main()
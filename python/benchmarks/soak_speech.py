@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+# soak_speech.py
+# 読み上げの負荷試験（nullエンジンで大量の読み上げを行い、メモリ・ハンドル・遅延の推移を確認する）
+#
+# 使い方:
+#   python python/benchmarks/soak_speech.py
+#   python python/benchmarks/soak_speech.py --count 10000 --heap-mb 200 --legacy-gc
+#
+# 読み上げ（speak_text）の流れはそのままに、エンジンだけを音を出さないnullエンジンに差し替える。
+# 以下を満たさない場合は終了コード1で終了する:
+#   - メモリ（tracemalloc）: 前半と後半のチェックポイントの差が --max-growth-kb 以下
+#   - ハンドル: 未解放のエンジン・スレッド・ファイルディスクリプタ（Windowsはハンドル）が増えていない
+#   - 遅延: 後半の1件あたりの所要時間のp50が前半の --max-latency-ratio 倍以下
+#
+# --legacy-gc を指定すると、1件ごとに gc.collect() を行う従来の解放処理を再現して比較できる
+# --audit を指定すると、イベントループの監査モード（loop_watchdog）を有効にする
+
+import argparse
+import array
+import asyncio
+import gc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+from logger import set_output_sink  # noqa: E402
+
+
+def handle_count():
+    """プロセスが開いているハンドル（Windows）またはファイルディスクリプタの数（取得できない場合はNone）"""
+    if sys.platform == "win32":
+        import ctypes
+        count = ctypes.c_ulong()
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.kernel32.GetProcessHandleCount(process, ctypes.byref(count)):
+            return count.value
+        return None
+    for path in ("/proc/self/fd", "/dev/fd"):
+        if os.path.isdir(path):
+            return len(os.listdir(path))
+    return None
+
+
+def percentile(values: list, ratio: float) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(ratio * (len(values) - 1))))]
+
+
+def build_heap(megabytes: int) -> list:
+    """長時間動作したプロセスを模した、GCの走査対象になる大量の小さなオブジェクト"""
+    # 1要素あたり約200バイト（辞書 + 文字列）
+    return [{"id": i, "text": f"通知 {i}"} for i in range(megabytes * 5000)]
+
+
+async def soak(args) -> dict:
+    from loop_watchdog import LoopWatchdog
+    from sapi_speaker import speak_text
+    from speaker_cache import get_speaker_cache
+    from speech_queue import enqueue_speech, get_speech_queue, speech_worker_loop
+    from speech_thread import get_speech_thread
+    from tts_engine import open_engine_count
+
+    loop = asyncio.get_running_loop()
+    config.main_loop = loop
+    # 読み上げは1件ずつのため、完了待ち（run_in_executor）のスレッドは1つで足りる。
+    # 既定のexecutorはタイミング次第でスレッドを増やすため、スレッド数の比較が不安定になる
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=1))
+
+    watchdog = LoopWatchdog()
+    watchdog_task = asyncio.create_task(watchdog.run())
+
+    # 計測値の記録自体でメモリが増えないよう、あらかじめ確保しておく
+    latencies = array.array("d", bytes(8 * args.count))
+    measured = 0
+    done = asyncio.Event()
+    finished = 0
+
+    async def measured_speak(text, rate, app_id=""):
+        nonlocal measured
+        start = time.perf_counter()
+        await speak_text(text, rate, app_id)
+        if args.legacy_gc:
+            gc.collect()
+        if measured < args.count:
+            latencies[measured] = time.perf_counter() - start
+            measured += 1
+
+    def on_done(_utterance):
+        nonlocal finished
+        finished += 1
+        if finished >= args.count:
+            done.set()
+
+    worker = asyncio.create_task(speech_worker_loop(measured_speak, on_done=on_done))
+
+    checkpoints = []
+    checkpoint_every = max(1, args.count // 10)
+    started = time.perf_counter()
+    for i in range(args.count):
+        enqueue_speech(f"Slack、新着メッセージ {i}、Hello world {i % 97}")
+        # 読み上げ待ちをためすぎないよう、一定件数ごとに読み上げの完了を待つ
+        while len(get_speech_queue()) >= args.window:
+            await asyncio.sleep(0)
+        if (i + 1) % checkpoint_every == 0:
+            checkpoints.append({
+                "utterances": i + 1,
+                "traced_kb": tracemalloc.get_traced_memory()[0] / 1024,
+                "handles": handle_count(),
+                "threads": threading.active_count(),
+                "engines": open_engine_count(),
+            })
+    await done.wait()
+    elapsed = time.perf_counter() - started
+
+    worker.cancel()
+    watchdog_task.cancel()
+    await asyncio.gather(worker, watchdog_task, return_exceptions=True)
+    # 保持しているエンジンを解放し、読み上げスレッドで解放が終わるのを待つ
+    get_speaker_cache().close_all()
+    await get_speech_thread().run(lambda: None)
+
+    return {
+        "elapsed": elapsed,
+        "latencies": list(latencies[:measured]),
+        "checkpoints": checkpoints,
+        "engines_after": open_engine_count(),
+        "loop_lag": watchdog.snapshot(),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="読み上げの負荷試験（nullエンジン）")
+    parser.add_argument("--count", type=int, default=10000, help="読み上げる件数")
+    parser.add_argument("--window", type=int, default=8, help="読み上げ待ちの最大件数")
+    parser.add_argument("--heap-mb", type=int, default=50, help="事前に確保しておくヒープの大きさ（MB、目安）")
+    parser.add_argument("--legacy-gc", action="store_true", help="1件ごとにgc.collect()を行う（従来の解放処理）")
+    parser.add_argument("--audit", action="store_true", help="イベントループの監査モードを有効にする")
+    parser.add_argument("--max-growth-kb", type=float, default=512.0, help="許容するメモリ増加量（KB）")
+    parser.add_argument("--max-latency-ratio", type=float, default=1.5, help="許容する後半/前半のp50の比")
+    args = parser.parse_args()
+
+    # 読み上げ以外の要素（流量制限・遅延目標・英語の変換）を外し、エンジンはnullにする
+    config.TTS_ENGINE = "null"
+    config.NULL_ENGINE_SECONDS_PER_CHAR = 0.0
+    config.current_voice_name = "Null Voice"
+    config.THROTTLE_ENABLED = False
+    config.LATENCY_TARGET_ENABLED = False
+    config.E2K_LOADED = True
+    config.E2K_AVAILABLE = False
+    config.LOOP_AUDIT_MODE = args.audit
+
+    # debugログは件数が多いため捨て、エラーだけ表示する
+    errors = []
+
+    def sink(data):
+        if data.get("type") == "error":
+            errors.append(data.get("text", ""))
+            print(data.get("text", ""), file=sys.stderr)
+
+    set_output_sink(sink)
+
+    heap = build_heap(args.heap_mb)
+    tracemalloc.start()
+    result = asyncio.run(soak(args))
+    tracemalloc.stop()
+    del heap
+
+    latencies = result["latencies"]
+    quarter = max(1, len(latencies) // 4)
+    # 最初の1/4はウォームアップとして除外し、2番目と最後の1/4を比べる
+    early = latencies[quarter:quarter * 2]
+    late = latencies[-quarter:]
+    checkpoints = result["checkpoints"]
+    # 最初のチェックポイントはキャッシュなどの初期確保を含むため、2番目以降で比較する
+    baseline = checkpoints[1] if len(checkpoints) > 1 else checkpoints[0]
+    last = checkpoints[-1]
+    growth_kb = last["traced_kb"] - baseline["traced_kb"]
+
+    print(f"読み上げ件数: {len(latencies)}件, 所要時間: {result['elapsed']:.1f}秒, "
+          f"{len(latencies) / result['elapsed']:.0f}件/秒, 解放処理: {'gc.collect()' if args.legacy_gc else 'close()'}")
+    print(f"{'件数':>8}{'メモリ(KB)':>14}{'ハンドル':>10}{'スレッド':>10}{'エンジン':>10}")
+    for cp in checkpoints:
+        print(f"{cp['utterances']:>8}{cp['traced_kb']:>14.1f}{str(cp['handles']):>10}{cp['threads']:>10}{cp['engines']:>10}")
+    print(f"1件あたり(ms): 前半 p50={percentile(early, 0.5) * 1000:.2f} p99={percentile(early, 0.99) * 1000:.2f} / "
+          f"後半 p50={percentile(late, 0.5) * 1000:.2f} p99={percentile(late, 0.99) * 1000:.2f}")
+    print(f"イベントループの遅延: {result['loop_lag']}")
+
+    failures = []
+    if growth_kb > args.max_growth_kb:
+        failures.append(f"メモリが{growth_kb:.1f}KB増加しました")
+    if result["engines_after"] != 0:
+        failures.append(f"解放されていないエンジンが{result['engines_after']}個あります")
+    if baseline["handles"] is not None and last["handles"] > baseline["handles"]:
+        failures.append(f"ハンドルが{baseline['handles']}から{last['handles']}に増加しました")
+    if last["threads"] > baseline["threads"]:
+        failures.append(f"スレッドが{baseline['threads']}から{last['threads']}に増加しました")
+    early_p50 = percentile(early, 0.5)
+    late_p50 = percentile(late, 0.5)
+    # 1ms未満の揺らぎは誤差として扱う
+    if late_p50 > early_p50 * args.max_latency_ratio + 0.001:
+        failures.append(f"1件あたりの所要時間が増加しました（p50 {early_p50 * 1000:.2f}ms → {late_p50 * 1000:.2f}ms）")
+    if errors:
+        failures.append(f"エラーログが{len(errors)}件出力されました")
+
+    if failures:
+        for failure in failures:
+            print(f"NG: {failure}")
+        return 1
+    print("OK: メモリ・ハンドル・1件あたりの所要時間は安定しています")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,7 @@
 import sys
 import io
 import os
+import threading
 
 # UTF-8エンコーディングを強制設定
 os.environ['PYTHONIOENCODING'] = 'utf-8'
@@ -33,6 +34,116 @@ SAPI_SPEAK_ASYNC_FLAG = 1    # 非同期フラグ (SVSFDefault)
 VOLUME_MIN = 0               # 音量の最小値
 VOLUME_MAX = 100             # 音量の最大値
 
+# 読み上げテキストの正規化（text_processor.normalize_speech_text）
+SPEECH_TEMPLATE_DEFAULT = "{app}、{title}、{text}"  # 読み上げテンプレートの初期値
+SPEECH_URL_TEXT = "URL省略"          # URLの代わりに読み上げるテキスト
+SPEECH_LONG_DIGIT_RUN = 8            # この桁数以上連続する数字は省略する（0で無効）
+SPEECH_LONG_DIGIT_TEXT = "数字省略"  # 長い数字の代わりに読み上げるテキスト
+SPEECH_CONSECUTIVE_CHAR_MAX = 3      # 連続文字を短縮するときの文字数
+SPEECH_TRUNCATED_SUFFIX = "以下省略"  # 最大文字数で切り詰めたときに付けるテキスト
+SPEECH_EMPTY_NOTIFICATION_TEXT = "通知があります"  # 正規化した結果が空になった通知の代わりに読み上げるテキスト
+
+# 読み上げエンジン（tts_engine）
+# sapi / espeak / null / wav。空の場合はWindowsではsapi、それ以外ではespeak（未インストールならnull）
+TTS_ENGINE = os.environ.get("TOSPEAK_TTS_ENGINE", "")
+TTS_WAV_INNER_ENGINE = os.environ.get("TOSPEAK_WAV_INNER_ENGINE", "")  # wavエンジンで音声を生成するエンジン
+TTS_WAV_OUTPUT_DIR = os.environ.get("TOSPEAK_WAV_OUTPUT_DIR", "tospeak-wav")  # wavエンジンの出力先
+NULL_ENGINE_SECONDS_PER_CHAR = float(os.environ.get("TOSPEAK_NULL_SECONDS_PER_CHAR", "0.1"))  # nullエンジンの1文字あたりの読み上げ時間
+
+# アプリごとの音声・音量・速度（voice_profiles）
+# app_id -> {"voice_name": 音声名, "volume": 0〜100, "rate": -10〜10}（stdinのset_app_profilesで設定。省略した項目は全体の設定）
+APP_VOICE_PROFILES = {}
+
+# 音声ごとの読み上げエンジンのキャッシュ（speaker_cache）
+# 読み上げ後のエンジンを保持しておき、同じ音声の次の読み上げで再利用する
+SPEAKER_CACHE_ENABLED = os.environ.get("TOSPEAK_SPEAKER_CACHE", "1") != "0"
+SPEAKER_CACHE_MAX_SESSIONS = 2         # 同時に保持するエンジンの数（読み上げ中のものを含む）
+SPEAKER_CACHE_IDLE_SECONDS = 10.0      # この秒数読み上げがなければすべて解放する（CeVIO AIを他のアプリが使えるように）
+SPEAKER_CACHE_EXCLUSIVE_VOICES = ("CeVIO",)  # 同時に1つしか接続できない音声（音声名に含まれる文字列）
+
+# 読み上げの遅延目標モード（speech_queue）
+# 読み上げ待ちが増えると段階的に読み上げ速度を上げ、本文を省略し、
+# 期限を過ぎた読み上げは破棄して件数の要約に置き換える
+LATENCY_TARGET_ENABLED = True
+LATENCY_DEADLINE_SECONDS = 60.0      # これより古い読み上げは破棄する
+LATENCY_RATE_STEPS = (               # (読み上げ待ちの件数, SAPIの速度) 件数の少ない順
+    (2, 2),
+    (4, 4),
+    (6, 6),
+)
+LATENCY_SHORTEN_BACKLOG = 6          # 読み上げ待ちがこの件数以上の場合は本文を省略する
+SAPI_RATE_DEFAULT = 0                # SAPIの標準速度
+SAPI_RATE_MIN = -10
+SAPI_RATE_MAX = 10
+
+# 読み上げの流量制限（speech_throttle）
+# アプリ（app_id）ごとのトークンバケットと、1分あたりの読み上げ秒数の上限（全アプリ合計）
+# 上限を超えた通知は読み上げず、THROTTLE_SUMMARY_INTERVAL秒ごとに「N件の通知を省略しました」を読み上げる
+THROTTLE_ENABLED = True
+THROTTLE_APP_CAPACITY = 5              # アプリごとに連続で読み上げられる件数（バケットの容量）
+THROTTLE_APP_PER_MINUTE = 6.0          # アプリごとに1分あたりに回復する件数
+THROTTLE_APP_OVERRIDES = {}            # app_id -> {"capacity": 件数, "per_minute": 件数}（stdinのset_throttleで設定）
+THROTTLE_GLOBAL_SECONDS_PER_MINUTE = 40.0  # 直近1分間の読み上げ秒数の上限（0で無効）
+THROTTLE_SUMMARY_INTERVAL = 30.0       # 省略件数の要約を読み上げる間隔（秒）
+SPOKEN_CHARS_PER_SECOND = 8.0          # 読み上げ時間の推定に使う1秒あたりの文字数（SAPI標準速度）
+
+# 実行状態のメトリクス（metrics）
+METRICS_INTERVAL = 60.0                # metricsメッセージを送信する間隔（秒、0で無効）
+
+# イベントループの遅延の監視（loop_watchdog）
+LOOP_WATCHDOG_ENABLED = True
+LOOP_WATCHDOG_INTERVAL = 0.1           # 遅延を計測する間隔（秒）
+LOOP_STALL_THRESHOLD = 0.25            # この秒数以上イベントループが止まったらスタックを出力する
+LOOP_LAG_WINDOW = 600                  # パーセンタイルの計算に使う直近の計測数（0.1秒間隔で約1分）
+LOOP_AUDIT_MODE = os.environ.get("TOSPEAK_LOOP_AUDIT", "") == "1"  # asyncioの低速コールバック検出（ベンチマーク用）
+
+# マルチプロセスモード（supervisor + 監視プロセス + 読み上げプロセス）
+# 環境変数 TOSPEAK_MULTIPROCESS=1 または起動引数 --multiprocess で有効化
+MULTIPROCESS_MODE = os.environ.get("TOSPEAK_MULTIPROCESS", "") == "1"
+WORKER_RESTART_BACKOFF_INITIAL = 1.0   # ワーカー再起動の初回待機秒数
+WORKER_RESTART_BACKOFF_MAX = 30.0      # ワーカー再起動の最大待機秒数
+WORKER_STABLE_SECONDS = 60.0           # この秒数以上動作していれば待機秒数をリセット
+SPEECH_JOB_TIMEOUT = 120.0             # 1件の読み上げがこの秒数を超えたらハングとみなす
+SPEECH_JOB_MAX_ATTEMPTS = 2            # 読み上げプロセス再起動時に再送する最大回数
+
+# データの保存先（通知履歴など）
+# 環境変数 TOSPEAK_DATA_DIR で変更可能。未指定の場合は %LOCALAPPDATA%\ToSpeak（Windows以外は ~/.local/share/ToSpeak）
+DATA_DIR = os.environ.get("TOSPEAK_DATA_DIR") or os.path.join(
+    os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".local", "share"),
+    "ToSpeak",
+)
+
+# 通知履歴（history_store）
+HISTORY_ENABLED = os.environ.get("TOSPEAK_HISTORY", "1") != "0"
+HISTORY_DB_PATH = os.path.join(DATA_DIR, "history.sqlite3")
+HISTORY_RETENTION_DAYS = 30            # これより古い履歴は削除する（0で無効）
+HISTORY_MAX_ENTRIES = 50000            # 保持する履歴の最大件数（超えた分は古い順に削除、0で無効）
+HISTORY_BATCH_SIZE = 200               # 1回のトランザクションで書き込む最大件数
+HISTORY_FLUSH_INTERVAL = 0.5           # 書き込み待ちをまとめる最大秒数
+HISTORY_RETENTION_INTERVAL = 600.0     # 保持期間・件数による削除を行う間隔（秒）
+HISTORY_PAGE_SIZE_DEFAULT = 50         # history_query の1ページの件数（省略時）
+HISTORY_PAGE_SIZE_MAX = 500            # history_query の1ページの最大件数
+
+# 処理済みの通知の記録（seen_notifications）
+# 起動時、前回までに送信済みの通知（通知IDと内容のハッシュが一致するもの）は送信しない
+# 環境変数 TOSPEAK_SEEN_REBUILD=1（または起動引数 --rebuild-seen）で記録を作り直す
+SEEN_STATE_ENABLED = os.environ.get("TOSPEAK_SEEN_STATE", "1") != "0"
+SEEN_REBUILD = os.environ.get("TOSPEAK_SEEN_REBUILD", "") == "1"
+SEEN_STATE_PATH = os.path.join(DATA_DIR, "seen_notifications.json")
+SEEN_EXACT_MAX = 2000                  # 通知IDを正確に保持する直近の件数
+SEEN_BLOOM_BITS = 1 << 16              # ブルームフィルター1世代のビット数（8KB）
+SEEN_BLOOM_HASHES = 4                  # ブルームフィルターのハッシュ関数の数
+SEEN_BLOOM_CAPACITY = 5000             # 1世代に追加する件数（超えたら世代を進める。誤判定率は約0.5%）
+SEEN_SAVE_INTERVAL = 5.0               # 記録をファイルに保存する最短の間隔（秒）
+
+# ユーザー辞書（pronunciation_dict）: 表記<TAB>読み方 の行、または {"表記": "読み方"} のJSON
+PRONUNCIATION_DICT_PATH = os.environ.get("TOSPEAK_PRONUNCIATION_DICT") or os.path.join(DATA_DIR, "pronunciations.txt")
+
+# 読み上げルールの試行（speech_rules の dry_run）
+DRY_RUN_MAX_NOTIFICATIONS = 10000      # 1回の dry_run で処理する最大件数
+RULE_PATTERN_MAX_LENGTH = 1000         # 正規表現パターンの最大長（Electron側の MAX_PATTERN_LENGTH と同じ）
+RULE_PATTERN_MAX_REPETITIONS = 25      # 正規表現に含められる繰り返しの最大数（safe-regexと同じ基準）
+
 # グローバル変数（複数タスク間で共有）
 current_volume = VOLUME_LEVEL
 current_voice_name = TARGET_VOICE_NAME  # 現在選択されている音声名（空の場合は読み上げ無効）
@@ -41,16 +152,42 @@ main_loop = None  # メインイベントループへの参照
 # =================================================
 # e2k (English to Katakana Translator) の初期化
 # =================================================
+# e2kはnumpyとモデルの読み込みに時間がかかるため、import時ではなく
+# load_e2k() の初回呼び出し時に初期化する（起動時は別スレッドで先読みする）
+E2K_WORD_CACHE_SIZE = 4096             # 単語ごとの変換結果を保持する件数（1語の変換に数十msかかるため）
+E2K_LOADED = False
+E2K_AVAILABLE = False
 E2K_IMPORT_ERROR = None
-try:
-    from e2k import C2K, NGram
-    E2K_AVAILABLE = True
-    # e2kのインスタンスを初期化
-    e2k_ngram = NGram()
-    e2k_c2k = C2K()
-    # 初期化ログは後で出力（loggerモジュールをインポートする必要があるため）
-except ImportError as e:
-    E2K_AVAILABLE = False
-    e2k_ngram = None
-    e2k_c2k = None
-    E2K_IMPORT_ERROR = str(e)
+e2k_ngram = None
+e2k_c2k = None
+_e2k_lock = threading.Lock()
+
+
+def load_e2k() -> bool:
+    """
+    e2kを読み込んでインスタンスを初期化する（2回目以降は何もしない）
+
+    Returns:
+        e2kが利用可能な場合はTrue
+    """
+    global E2K_LOADED, E2K_AVAILABLE, E2K_IMPORT_ERROR, e2k_ngram, e2k_c2k
+    if E2K_LOADED:
+        return E2K_AVAILABLE
+
+    with _e2k_lock:
+        if E2K_LOADED:
+            return E2K_AVAILABLE
+        try:
+            from e2k import C2K, NGram
+            # e2kのインスタンスを初期化
+            e2k_ngram = NGram()
+            e2k_c2k = C2K()
+            E2K_AVAILABLE = True
+            # 初期化ログは呼び出し側で出力（loggerモジュールをインポートする必要があるため）
+        except Exception as e:
+            # ImportErrorに加え、モデル読み込みの失敗も利用不可として扱う
+            E2K_AVAILABLE = False
+            E2K_IMPORT_ERROR = str(e)
+        E2K_LOADED = True
+
+    return E2K_AVAILABLE
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+# history_store.py
+# 通知履歴の保存・検索（SQLite + 全文検索）
+#
+# 書き込みはバックグラウンドのスレッドがまとめて1トランザクションで行い、
+# 検索は呼び出し元のスレッドで別の接続を使って行う（WALモードのため書き込み中も検索できる）
+
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import config
+from logger import log_debug, log_error
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    notification_id TEXT UNIQUE,
+    app TEXT NOT NULL DEFAULT '',
+    app_id TEXT NOT NULL DEFAULT '',
+    title TEXT NOT NULL DEFAULT '',
+    text TEXT NOT NULL DEFAULT '',
+    timestamp TEXT NOT NULL DEFAULT '',
+    received_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_received_at ON history (received_at);
+CREATE INDEX IF NOT EXISTS history_app_id ON history (app_id, id);
+"""
+
+# 本文はhistoryテーブルに1つだけ持ち、全文検索の索引はトリガーで同期する
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5 (
+    app, title, text, content='history', content_rowid='id', tokenize='{tokenizer}'
+);
+CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts (rowid, app, title, text) VALUES (new.id, new.app, new.title, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, app, title, text) VALUES ('delete', old.id, old.app, old.title, old.text);
+END;
+"""
+
+# trigramは日本語のように単語を空白で区切らない文章でも部分一致で検索できる（SQLite 3.34以降）
+_TRIGRAM_MIN_QUERY_LENGTH = 3
+
+_COLUMNS = "id, notification_id, app, app_id, title, text, timestamp"
+
+# 書き込みスレッドの停止指示
+_STOP = object()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=10.0, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _detect_fts_tokenizer(conn: sqlite3.Connection):
+    """使用できる全文検索のトークナイザーを返す（FTS5がない場合はNone）"""
+    for tokenizer in ("trigram", "unicode61"):
+        try:
+            conn.execute(f"CREATE VIRTUAL TABLE temp.fts_probe USING fts5 (x, tokenize='{tokenizer}')")
+            conn.execute("DROP TABLE temp.fts_probe")
+            return tokenizer
+        except sqlite3.OperationalError:
+            continue
+    return None
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class HistoryStore:
+    """
+    通知履歴のストア
+
+    add() はキューに追加するだけですぐに戻る。書き込みスレッドは最初の add() で起動し、
+    HISTORY_BATCH_SIZE 件たまるか HISTORY_FLUSH_INTERVAL 秒経過するごとにまとめて書き込む
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or config.HISTORY_DB_PATH
+        self.fts_tokenizer = None
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._local = threading.local()
+        self._last_retention = 0.0
+
+    # -------------------------------------------------
+    # 接続・スキーマ
+    # -------------------------------------------------
+    def _ensure_schema(self, conn: sqlite3.Connection):
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            conn.executescript(_SCHEMA)
+            row = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type='table' AND name='history_fts'"
+            ).fetchone()
+            if row:
+                self.fts_tokenizer = "trigram" if "trigram" in row[0] else "unicode61"
+            else:
+                self.fts_tokenizer = _detect_fts_tokenizer(conn)
+                if self.fts_tokenizer:
+                    conn.executescript(_FTS_SCHEMA.format(tokenizer=self.fts_tokenizer))
+                else:
+                    log_debug("history_store: FTS5が利用できないため、部分一致で検索します")
+            conn.commit()
+            self._schema_ready = True
+
+    def _reader(self) -> sqlite3.Connection:
+        """検索用の接続（スレッドごとに1つ）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = _connect(self.path)
+            self._ensure_schema(conn)
+            self._local.conn = conn
+        return conn
+
+    # -------------------------------------------------
+    # 書き込み
+    # -------------------------------------------------
+    def add(self, log: dict):
+        """
+        通知を履歴に追加する（書き込みは書き込みスレッドで行う）
+
+        Args:
+            log: 通知の辞書（app, app_id, title, text, notification_id, timestamp）
+        """
+        self._start_writer()
+        self._queue.put((
+            log.get("notification_id") or None,
+            log.get("app") or "",
+            log.get("app_id") or "",
+            log.get("title") or "",
+            log.get("text") or "",
+            log.get("timestamp") or "",
+            time.time(),
+        ))
+
+    def _start_writer(self):
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._writer_loop, name="history-writer", daemon=True)
+                self._writer.start()
+                atexit.register(self.close)
+
+    def _writer_loop(self):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = _connect(self.path)
+            self._ensure_schema(conn)
+        except Exception as e:
+            log_error(f"history_store: データベースを開けません: {e}")
+            return
+
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            received = 0
+            batch = []
+            deadline = time.monotonic() + config.HISTORY_FLUSH_INTERVAL
+            # 一定時間または一定件数までまとめて書き込む
+            while True:
+                received += 1
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= config.HISTORY_BATCH_SIZE:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    with conn:
+                        conn.executemany(
+                            "INSERT OR IGNORE INTO history "
+                            "(notification_id, app, app_id, title, text, timestamp, received_at) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            batch,
+                        )
+                except Exception as e:
+                    log_error(f"history_store: 書き込みエラー: {e}")
+            for _ in range(received):
+                self._queue.task_done()
+
+            if time.monotonic() - self._last_retention >= config.HISTORY_RETENTION_INTERVAL:
+                self._last_retention = time.monotonic()
+                self._apply_retention(conn)
+
+        conn.close()
+
+    def _apply_retention(self, conn: sqlite3.Connection) -> int:
+        """保持期間・最大件数を超えた履歴を削除し、削除件数を返す"""
+        deleted = 0
+        try:
+            with conn:
+                if config.HISTORY_RETENTION_DAYS > 0:
+                    cutoff = time.time() - config.HISTORY_RETENTION_DAYS * 86400
+                    deleted += conn.execute("DELETE FROM history WHERE received_at < ?", (cutoff,)).rowcount
+                if config.HISTORY_MAX_ENTRIES > 0:
+                    deleted += conn.execute(
+                        "DELETE FROM history WHERE id <= "
+                        "(SELECT id FROM history ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                        (config.HISTORY_MAX_ENTRIES,),
+                    ).rowcount
+            if deleted:
+                log_debug(f"history_store: 保持期間・件数を超えた履歴を{deleted}件削除しました")
+        except Exception as e:
+            log_error(f"history_store: 履歴の削除エラー: {e}")
+        return deleted
+
+    def apply_retention(self) -> int:
+        """保持期間・最大件数を超えた履歴をすぐに削除する（呼び出し元のスレッドで実行）"""
+        return self._apply_retention(self._reader())
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        書き込み待ちがすべて書き込まれるまで待つ
+
+        Returns:
+            timeout 以内に書き込まれた場合はTrue
+        """
+        end = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= end:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self):
+        """書き込み待ちを書き込んでから書き込みスレッドを停止する"""
+        writer = self._writer
+        if writer is None or not writer.is_alive():
+            return
+        self._queue.put(_STOP)
+        writer.join(timeout=5.0)
+
+    # -------------------------------------------------
+    # 検索
+    # -------------------------------------------------
+    def query(self, text: str = "", app_id: str = "", cursor: int = None, limit: int = None) -> dict:
+        """
+        履歴を新しい順に検索する
+
+        Args:
+            text: 検索文字列（app/title/textの部分一致。空の場合はすべて）
+            app_id: 通知元のアプリIDで絞り込む（空の場合はすべて）
+            cursor: 前のページの next_cursor（Noneの場合は最新から）
+            limit: 1ページの件数（省略時は HISTORY_PAGE_SIZE_DEFAULT）
+
+        Returns:
+            {"items": [履歴の辞書...], "next_cursor": 次のページのカーソル（最後のページの場合はNone）}
+        """
+        if limit is None:
+            limit = config.HISTORY_PAGE_SIZE_DEFAULT
+        limit = max(1, min(config.HISTORY_PAGE_SIZE_MAX, int(limit)))
+        conn = self._reader()
+
+        conditions = []
+        params = []
+        source = "history"
+        text = (text or "").strip()
+        if text:
+            if self.fts_tokenizer == "trigram" and len(text) >= _TRIGRAM_MIN_QUERY_LENGTH:
+                source = "history JOIN history_fts ON history_fts.rowid = history.id"
+                conditions.append("history_fts MATCH ?")
+                # 入力をそのまま1つのフレーズとして検索する（FTSの演算子として解釈させない）
+                params.append('"' + text.replace('"', '""') + '"')
+            else:
+                pattern = f"%{_escape_like(text)}%"
+                conditions.append(
+                    "(app LIKE ? ESCAPE '\\' OR title LIKE ? ESCAPE '\\' OR text LIKE ? ESCAPE '\\')"
+                )
+                params.extend([pattern, pattern, pattern])
+        if app_id:
+            conditions.append("history.app_id = ?")
+            params.append(app_id)
+        if cursor is not None:
+            conditions.append("history.id < ?")
+            params.append(int(cursor))
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        columns = ", ".join(f"history.{c.strip()}" for c in _COLUMNS.split(","))
+        rows = conn.execute(
+            f"SELECT {columns} FROM {source} {where} ORDER BY history.id DESC LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+
+        items = [
+            {
+                "id": row[0],
+                "type": "notification",
+                "notification_id": row[1] or "",
+                "app": row[2],
+                "app_id": row[3],
+                "title": row[4],
+                "text": row[5],
+                "timestamp": row[6],
+            }
+            for row in rows[:limit]
+        ]
+        next_cursor = items[-1]["id"] if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    def count(self) -> int:
+        """保存されている履歴の件数"""
+        return self._reader().execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+
+# 通知履歴のストア（プロセスごとに1つ）
+_history_store = None
+_history_store_lock = threading.Lock()
+
+
+def get_history_store() -> HistoryStore:
+    """通知履歴のストアを取得する（初回呼び出し時に作成）"""
+    global _history_store
+    if _history_store is None:
+        with _history_store_lock:
+            if _history_store is None:
+                _history_store = HistoryStore()
+    return _history_store
+
+
+def record_notification(log: dict):
+    """通知を履歴に追加する（HISTORY_ENABLEDがFalseの場合は何もしない）"""
+    if not config.HISTORY_ENABLED:
+        return
+    try:
+        get_history_store().add(log)
+    except Exception as e:
+        log_error(f"history_store: 履歴の追加エラー: {e}")
@@ -3,8 +3,28 @@
 # ログ出力機能
 
 import json
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
+# 出力先（Noneの場合はstdoutに直接出力）
+# マルチプロセスモードでは、子プロセスがsupervisorへのキューを設定する
+_output_sink = None
+
+# スレッドごとの設定（debugログの抑止）
+_thread_state = threading.local()
+
+
+def set_output_sink(sink):
+    """
+    send_jsonの出力先を差し替える
+
+    Args:
+        sink: メッセージ辞書を受け取る呼び出し可能オブジェクト（Noneでstdoutに戻す）
+    """
+    global _output_sink
+    _output_sink = sink
+
 
 def send_json(data: dict):
     """JSONメッセージをstdoutに出力（Electron側で受け取る）"""
@@ -15,11 +35,31 @@ def send_json(data: dict):
     if "source" not in data:
         data["source"] = "toast_bridge"
     
+    if _output_sink is not None:
+        _output_sink(data)
+        return
+    
     print(json.dumps(data, ensure_ascii=False), flush=True)
 
 
+@contextmanager
+def debug_logs_suppressed():
+    """
+    このスレッドのdebugログを出力しない（errorログは出力する）
+    大量のテキストを一括で処理する場合（dry_runなど）に、1件ごとのログで遅くならないようにする
+    """
+    previous = getattr(_thread_state, "suppress_debug", False)
+    _thread_state.suppress_debug = True
+    try:
+        yield
+    finally:
+        _thread_state.suppress_debug = previous
+
+
 def log_debug(message: str):
     """デバッグログをstdoutに出力（Electron側で受け取る）"""
+    if getattr(_thread_state, "suppress_debug", False):
+        return
     log_msg = {
         "type": "debug",
         "source": "toast_bridge",
@@ -38,3 +78,20 @@ def log_error(message: str):
         "timestamp": datetime.now().isoformat()
     }
     send_json(log_msg)
+
+
+# 受信ログに内容を含めないメッセージ（通知のリストや辞書など、内容が大きくなりうるもの）
+_SUMMARIZED_MESSAGE_TYPES = ("dry_run", "set_pronunciations", "set_app_profiles", "set_throttle")
+
+
+def describe_message(msg: dict) -> str:
+    """受信したメッセージのログ用の表示（内容が大きくなりうるメッセージは件数だけにする）"""
+    msg_type = msg.get("type")
+    if msg_type not in _SUMMARIZED_MESSAGE_TYPES:
+        text = str(msg)
+        return text if len(text) <= 200 else f"{text[:200]}..."
+    counts = {
+        key: len(value) for key, value in msg.items()
+        if isinstance(value, (list, dict)) and key != "history"
+    }
+    return f"{{type: {msg_type}, 件数: {counts}}}"
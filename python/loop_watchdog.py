@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# loop_watchdog.py
+# イベントループの遅延（lag）の監視
+#
+# イベントループ上のタスクが LOOP_WATCHDOG_INTERVAL 秒ごとに起き、予定時刻からの遅れを記録する。
+# 別スレッドがその記録を見張り、LOOP_STALL_THRESHOLD 秒以上止まっている場合は、
+# その時点でイベントループのスレッドが実行している処理のスタックをエラーログに出力する。
+#
+# 監査モード（環境変数 TOSPEAK_LOOP_AUDIT=1）ではasyncioのデバッグモードを有効にし、
+# LOOP_STALL_THRESHOLD 秒以上かかったコールバックをすべてログに出力する（ベンチマーク用）
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+import config
+from logger import log_debug, log_error
+from metrics import register_metrics_provider
+
+
+def _percentile(sorted_values: list, ratio: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(ratio * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class _AsyncioLogHandler(logging.Handler):
+    """asyncioのログ（低速なコールバックの警告など）をエラーログに転送する"""
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            log_error(f"asyncio: {record.getMessage()}")
+        except Exception:
+            pass
+
+
+def enable_audit_mode(loop: asyncio.AbstractEventLoop, threshold: float = None):
+    """
+    asyncioのデバッグモードを有効にし、threshold秒以上かかったコールバックをログに出力する
+
+    Note:
+        デバッグモードはコールバックごとに計測を行うため、ベンチマーク・負荷試験の実行時のみ使用する
+    """
+    loop.set_debug(True)
+    loop.slow_callback_duration = threshold if threshold is not None else config.LOOP_STALL_THRESHOLD
+    asyncio_logger = logging.getLogger("asyncio")
+    if not any(isinstance(h, _AsyncioLogHandler) for h in asyncio_logger.handlers):
+        asyncio_logger.addHandler(_AsyncioLogHandler())
+    asyncio_logger.setLevel(logging.WARNING)
+    log_debug(f"loop_watchdog: 監査モードを有効にしました（{loop.slow_callback_duration}秒以上のコールバックを記録）")
+
+
+class LoopWatchdog:
+    """
+    イベントループの遅延を計測し、停止（stall）を検出する
+
+    使い方:
+        watchdog = LoopWatchdog()
+        await watchdog.run()  # asyncio.gather などで他のタスクと並行して実行する
+    """
+
+    def __init__(self, interval: float = None, stall_threshold: float = None, window: int = None, label: str = ""):
+        self.label = label  # ログに付けるプロセスの名前（マルチプロセスモードで区別するため）
+        self.interval = interval if interval is not None else config.LOOP_WATCHDOG_INTERVAL
+        self.stall_threshold = stall_threshold if stall_threshold is not None else config.LOOP_STALL_THRESHOLD
+        self._lags = deque(maxlen=window or config.LOOP_LAG_WINDOW)
+        self._last_beat = time.monotonic()
+        self._loop_thread_id = None
+        self._stopped = threading.Event()
+        self.stall_count = 0
+        self.max_lag = 0.0
+
+    # ---------- イベントループ側 ----------
+    async def run(self):
+        """遅延を計測し続ける（キャンセルされるまで戻らない）"""
+        loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        register_metrics_provider("loop_lag", self.snapshot)
+
+        if config.LOOP_AUDIT_MODE:
+            enable_audit_mode(loop, self.stall_threshold)
+
+        monitor = threading.Thread(target=self._monitor, name="loop-watchdog", daemon=True)
+        monitor.start()
+        try:
+            while True:
+                expected = time.monotonic() + self.interval
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                lag = max(0.0, now - expected)
+                self._lags.append(lag)
+                self.max_lag = max(self.max_lag, lag)
+                self._last_beat = now
+        finally:
+            self._stopped.set()
+
+    # ---------- 監視スレッド側 ----------
+    def _monitor(self):
+        """イベントループが止まっていないか見張る（別スレッドで実行）"""
+        reported_beat = None
+        while not self._stopped.wait(self.stall_threshold / 2):
+            last_beat = self._last_beat
+            stalled_for = time.monotonic() - last_beat - self.interval
+            # 1回の停止につき1度だけ報告する
+            if stalled_for < self.stall_threshold or reported_beat == last_beat:
+                continue
+            reported_beat = last_beat
+            self.stall_count += 1
+            log_error(
+                f"loop_watchdog{f'（{self.label}）' if self.label else ''}: イベントループが{stalled_for:.2f}秒以上停止しています。"
+                f"実行中の処理:\n{self._loop_stack()}"
+            )
+
+    def _loop_stack(self) -> str:
+        """イベントループのスレッドが現在実行している処理のスタック"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return "（スタックを取得できません）"
+        return "".join(traceback.format_stack(frame))
+
+    # ---------- メトリクス ----------
+    def snapshot(self) -> dict:
+        """遅延のパーセンタイル（ミリ秒）と停止の回数（metricsメッセージ用）"""
+        lags = sorted(self._lags)
+        return {
+            "samples": len(lags),
+            "p50_ms": round(_percentile(lags, 0.50) * 1000, 1),
+            "p95_ms": round(_percentile(lags, 0.95) * 1000, 1),
+            "p99_ms": round(_percentile(lags, 0.99) * 1000, 1),
+            "max_ms": round(self.max_lag * 1000, 1),
+            "stalls": self.stall_count,
+        }
+
+
+async def loop_watchdog(label: str = ""):
+    """
+    イベントループの遅延の監視を実行する（LOOP_WATCHDOG_ENABLEDがFalseの場合は何もしない）
+
+    Args:
+        label: 停止のログに付けるプロセスの名前（省略可）
+    """
+    if not config.LOOP_WATCHDOG_ENABLED:
+        return
+    await LoopWatchdog(label=label).run()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# metrics.py
+# 実行状態のメトリクス（一定間隔で metrics メッセージとして送信する）
+#
+# 各モジュールは register_metrics_provider() で「名前 -> 値を返す関数」を登録する。
+# metrics_loop() が METRICS_INTERVAL 秒ごとに全プロバイダーを呼び出して1つのメッセージにまとめる
+
+import asyncio
+from datetime import datetime
+
+import config
+from logger import log_error, send_json
+
+# 名前 -> 引数なしで辞書などを返す関数
+_providers = {}
+
+
+def register_metrics_provider(name: str, provider):
+    """
+    メトリクスのプロバイダーを登録する（同じ名前の場合は置き換える）
+
+    Args:
+        name: metrics メッセージ内のキー
+        provider: 引数なしで呼び出され、JSONに変換できる値を返す関数
+    """
+    _providers[name] = provider
+
+
+def collect_metrics() -> dict:
+    """登録されているすべてのプロバイダーから値を集める（失敗したものは error を返す）"""
+    metrics = {}
+    for name, provider in list(_providers.items()):
+        try:
+            metrics[name] = provider()
+        except Exception as e:
+            metrics[name] = {"error": str(e)}
+    return metrics
+
+
+def send_metrics():
+    """metrics メッセージを送信する"""
+    send_json({
+        "type": "metrics",
+        "source": "toast_bridge",
+        "metrics": collect_metrics(),
+        "timestamp": datetime.now().isoformat(),
+    })
+
+
+async def metrics_loop(interval: float = None):
+    """
+    一定間隔で metrics メッセージを送信する
+
+    Args:
+        interval: 送信間隔（秒）。Noneの場合は METRICS_INTERVAL（0以下の場合は送信しない）
+    """
+    interval = config.METRICS_INTERVAL if interval is None else interval
+    if interval <= 0:
+        return
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            send_metrics()
+        except Exception as e:
+            log_error(f"メトリクスの送信エラー: {e}")
@@ -11,7 +11,9 @@ from winsdk.windows.ui.notifications.management import (
 )
 from winsdk.windows.ui.notifications import NotificationKinds
 
+from history_store import record_notification
 from logger import log_error, log_debug, send_json
+from seen_notifications import get_seen_notifications
 
 
 async def get_listener():
@@ -74,40 +76,52 @@ def _extract_notification_data(notification):
     }
 
 
-async def get_past_notifications(listener):
+async def get_past_notifications(listener, send: bool = True):
     """
     起動時に存在する過去の通知を取得して送信する
     
     Args:
         listener: UserNotificationListenerオブジェクト
+        send: Falseの場合は「過去の通知」として送信しない（監視プロセスの再起動時。未処理の通知は戻り値で返す）
     
     Returns:
         tuple: (processed_ids: set, past_notifications: list)
     """
     processed_ids = set()
     past_notifications = []
+    # 前回までの起動で処理済みの通知（ファイルから読み込む）
+    seen = get_seen_notifications()
+    skipped = 0
     
     try:
         existing = await listener.get_notifications_async(NotificationKinds.TOAST)
         if existing:
             for n in existing:
                 processed_ids.add(n.id)
-                
+
                 # 既存通知の内容を取得
                 try:
                     data = _extract_notification_data(n)
+                    # 前回までに送信済みの通知はスキップ（通知IDは再利用されるため、内容のハッシュでも確認する）
+                    if seen.seen_content(n.id, data):
+                        skipped += 1
+                        continue
+                    seen.add(n.id, data)
                     # 過去の通知として保存
-                    past_notifications.append({
+                    past_notification = {
                         **data,
                         "notification_id": str(n.id),
                         "timestamp": datetime.now().isoformat()
-                    })
+                    }
+                    past_notifications.append(past_notification)
+                    # 通知履歴に保存（保存済みの通知IDは無視される）
+                    record_notification(past_notification)
                 except Exception:
                     # ログ出力でエラーが発生しても処理は続行
                     pass
             
             # 過去の通知がある場合、1つのメッセージとして送信
-            if past_notifications:
+            if past_notifications and send:
                 send_json({
                     "type": "past_notifications",
                     "source": "toast_bridge",
@@ -118,6 +132,10 @@ async def get_past_notifications(listener):
                 })
     except Exception as e:
         log_error(f"既存通知の取得に失敗: {e}")
+
+    if skipped:
+        log_debug(f"送信済みの過去の通知 {skipped}件 をスキップしました")
+    seen.save_if_dirty(force=True)
     
     return processed_ids, past_notifications
 
@@ -134,6 +152,8 @@ async def notification_loop(listener, processed_ids=None):
     # processed_idsが指定されていない場合は空のセットを使用
     if processed_ids is None:
         processed_ids = set()
+    # 処理済みの通知の記録（再起動後に同じ通知を送信しないよう、ファイルに保存する）
+    seen = get_seen_notifications()
     
     # 通知監視ループ
     while True:
@@ -157,6 +177,7 @@ async def notification_loop(listener, processed_ids=None):
                     except Exception as e:
                         log_debug(f"通知データ抽出エラー: {e}")
                         continue
+                    seen.add(n.id, data)
 
                     # Electron側に送信するメッセージ
                     msg = {
@@ -169,11 +190,16 @@ async def notification_loop(listener, processed_ids=None):
                     
                     # stdoutにJSONとして送信（Electron側で受け取る）
                     send_json(msg)
+                    # 通知履歴に保存（書き込みは別スレッドでまとめて行う）
+                    record_notification(msg)
 
             # 古いIDをクリーンアップ（メモリリーク防止）
             if len(processed_ids) > 1000:
                 processed_ids = processed_ids.intersection(current_ids)
 
+            # 処理済みの通知の記録を保存（一定間隔ごと）
+            seen.save_if_dirty()
+
             await asyncio.sleep(1)
 
         except asyncio.CancelledError:
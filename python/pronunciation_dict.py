@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+# pronunciation_dict.py
+# ユーザー辞書（読み方の登録）
+#
+# 「Visual Studio Code」「GitHub Actions」のような複数語の製品名は、e2kで1語ずつ変換すると
+# 読み方が不自然になりやすい。登録した表記はe2kより先に最長一致で置き換え、
+# 一致した部分はe2kのモデル（NGram / C2K）を使わずに登録した読み方をそのまま使う。
+#
+#   - 登録は stdin の set_pronunciations、または辞書ファイル（PRONUNCIATION_DICT_PATH）から読み込む
+#   - 表記は英字の大文字小文字を区別しない
+#   - 表記の先頭・末尾が英数字の場合は、前後が英数字でない位置でのみ一致する（「Code」は「Codex」に一致しない）
+#   - 登録・削除はトライ木の該当する経路だけを更新する（全体を作り直さない）
+
+import json
+import os
+import threading
+
+import config
+from logger import log_debug, log_error
+
+# トライ木の節点で、その位置までの表記が登録されていることを表すキー（1文字のキーとは重ならない）
+_TERMINAL = ""
+
+
+def _is_ascii_alnum(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+def _lower_same_length(text: str) -> str:
+    """
+    小文字にした文字列を返す（元の文字列と同じ長さにする）
+
+    小文字にすると長さが変わる文字（İ → i̇ など）はその文字だけそのままにして、
+    照合の位置が元の文字列とずれないようにする
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(lower if len(lower := ch.lower()) == 1 else ch for ch in text)
+
+
+class PronunciationDictionary:
+    """
+    表記 -> 読み方 の辞書（最長一致のトライ木）
+
+    使い方:
+        dictionary = PronunciationDictionary()
+        dictionary.add("Visual Studio Code", "ビジュアルスタジオコード")
+        dictionary.split("Visual Studio Codeを起動")
+        # [("Visual Studio Code", "ビジュアルスタジオコード"), ("を起動", None)]
+    """
+
+    def __init__(self):
+        self._root = {}
+        self._entries = {}  # 小文字にした表記 -> (表記, 読み方)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def entries(self) -> dict:
+        """登録されている 表記 -> 読み方"""
+        return {surface: reading for surface, reading in self._entries.values()}
+
+    # ---------- 登録・削除 ----------
+    def add(self, surface: str, reading: str):
+        """表記と読み方を登録する（同じ表記が登録済みの場合は読み方を置き換える）"""
+        surface = (surface or "").strip()
+        if not surface or reading is None:
+            return
+        key = _lower_same_length(surface)
+        with self._lock:
+            node = self._root
+            for ch in key:
+                node = node.setdefault(ch, {})
+            node[_TERMINAL] = reading
+            self._entries[key] = (surface, reading)
+
+    def remove(self, surface: str) -> bool:
+        """表記の登録を削除する（不要になった節点も削除する）"""
+        key = _lower_same_length((surface or "").strip())
+        with self._lock:
+            if key not in self._entries:
+                return False
+            path = [self._root]
+            for ch in key:
+                path.append(path[-1][ch])
+            del path[-1][_TERMINAL]
+            # 末尾から、子も登録もなくなった節点を取り除く
+            for depth in range(len(key), 0, -1):
+                if path[depth]:
+                    break
+                del path[depth - 1][key[depth - 1]]
+            del self._entries[key]
+            return True
+
+    def update(self, entries: dict):
+        """まとめて登録する（読み方がNoneまたは空の表記は削除する）"""
+        for surface, reading in entries.items():
+            if reading:
+                self.add(surface, str(reading))
+            else:
+                self.remove(surface)
+
+    def clear(self):
+        with self._lock:
+            self._root = {}
+            self._entries = {}
+
+    # ---------- 検索 ----------
+    def _longest_match(self, lowered: str, original: str, start: int):
+        """start から始まる最長の登録表記の (終了位置, 読み方) を返す（一致しない場合はNone）"""
+        node = self._root
+        best = None
+        index = start
+        length = len(lowered)
+        while index < length:
+            node = node.get(lowered[index])
+            if node is None:
+                break
+            index += 1
+            reading = node.get(_TERMINAL)
+            if reading is not None:
+                # 表記の末尾が英数字の場合、続く文字が英数字なら単語の途中のため一致としない
+                if not (_is_ascii_alnum(original[index - 1]) and index < length and _is_ascii_alnum(original[index])):
+                    best = (index, reading)
+        return best
+
+    def split(self, text: str) -> list:
+        """
+        テキストを登録表記とそれ以外に分割する
+
+        Returns:
+            [(部分文字列, 読み方)] のリスト。登録表記に一致しなかった部分の読み方はNone
+        """
+        if not self._entries or not text:
+            return [(text, None)]
+        lowered = _lower_same_length(text)
+        root = self._root
+        # 登録表記の先頭になりうる文字を1つも含まない場合は走査しない
+        if root.keys().isdisjoint(lowered):
+            return [(text, None)]
+        parts = []
+        plain_start = 0
+        index = 0
+        length = len(text)
+        while index < length:
+            ch = lowered[index]
+            # 表記の先頭が英数字の場合、前の文字が英数字なら単語の途中のため一致としない
+            if ch in root and not (index > 0 and _is_ascii_alnum(text[index]) and _is_ascii_alnum(text[index - 1])):
+                match = self._longest_match(lowered, text, index)
+                if match is not None:
+                    end, reading = match
+                    if plain_start < index:
+                        parts.append((text[plain_start:index], None))
+                    parts.append((text[index:end], reading))
+                    index = plain_start = end
+                    continue
+            index += 1
+        if plain_start < length:
+            parts.append((text[plain_start:], None))
+        return parts
+
+
+# =================================================
+# 辞書ファイル
+# =================================================
+def load_dictionary_file(path: str) -> dict:
+    """
+    辞書ファイルを読み込む
+
+    形式:
+        .json: {"表記": "読み方", ...}
+        それ以外: 1行に「表記<TAB>読み方」（# で始まる行と空行は無視する）
+    """
+    entries = {}
+    with open(path, "r", encoding="utf-8-sig") as f:
+        if path.lower().endswith(".json"):
+            data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("辞書ファイル（JSON）は {表記: 読み方} の形式にしてください")
+            return {str(k): str(v) for k, v in data.items() if v}
+        for line_number, line in enumerate(f, 1):
+            line = line.rstrip("\r\n")
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            surface, sep, reading = line.partition("\t")
+            if not sep or not surface.strip() or not reading.strip():
+                log_debug(f"辞書ファイルの{line_number}行目を読み飛ばしました（表記<TAB>読み方 の形式ではありません）")
+                continue
+            entries[surface.strip()] = reading.strip()
+    return entries
+
+
+# ユーザー辞書（プロセスごとに1つ）
+_pronunciation_dict = None
+_pronunciation_dict_lock = threading.Lock()
+
+
+def get_pronunciation_dict() -> PronunciationDictionary:
+    """ユーザー辞書を取得する（初回呼び出し時に辞書ファイルを読み込む）"""
+    global _pronunciation_dict
+    if _pronunciation_dict is not None:
+        return _pronunciation_dict
+    with _pronunciation_dict_lock:
+        if _pronunciation_dict is None:
+            dictionary = PronunciationDictionary()
+            path = config.PRONUNCIATION_DICT_PATH
+            if path and os.path.exists(path):
+                try:
+                    dictionary.update(load_dictionary_file(path))
+                    log_debug(f"ユーザー辞書を読み込みました: {len(dictionary)}件 ({path})")
+                except Exception as e:
+                    log_error(f"ユーザー辞書の読み込みエラー: {e}")
+            _pronunciation_dict = dictionary
+    return _pronunciation_dict
+
+
+def apply_pronunciation_settings(msg: dict):
+    """
+    ユーザー辞書の登録を反映する（stdinの set_pronunciations）
+
+    Args:
+        msg: 以下を含む辞書
+            - entries: {表記: 読み方}（読み方がnullまたは空文字列の表記は削除する）
+            - replace: Trueの場合は登録済みの表記（辞書ファイルの分を含む）をすべて削除してから登録する
+            - path: 読み込む辞書ファイル（省略可）
+    """
+    try:
+        dictionary = get_pronunciation_dict()
+        if msg.get("replace"):
+            dictionary.clear()
+        if msg.get("path"):
+            dictionary.update(load_dictionary_file(msg["path"]))
+        dictionary.update(msg.get("entries") or {})
+        log_debug(f"ユーザー辞書: {len(dictionary)}件")
+    except Exception as e:
+        log_error(f"ユーザー辞書の設定エラー: {e}")
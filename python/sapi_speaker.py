@@ -1,55 +1,67 @@
 # -*- coding: utf-8 -*-
 # sapi_speaker.py
-# SAPI音声読み上げ機能
+# 音声読み上げ機能（読み上げエンジンは tts_engine で選択。標準はSAPI）
+#
+# エンジン（SpVoiceなどのCOMオブジェクト）の作成・呼び出し・解放はすべて
+# 読み上げスレッド（speech_thread）で行い、COMの呼び出しがスレッドをまたがないようにする
+# 読み上げ後のエンジンは音声ごとに保持し（speaker_cache）、同じ音声の次の読み上げで再利用する
 
 import asyncio
-import win32com.client
 from datetime import datetime
 
 import config
 from logger import log_debug, log_error, send_json
 from text_processor import convert_english_to_katakana
+from speaker_cache import get_speaker_cache
+from speech_queue import enqueue_speech
+from speech_thread import get_speech_thread
+from tts_engine import create_engine
+from voice_profiles import resolve_profile
 
 
 def get_available_voices():
     """
-    利用可能なSAPI音声のリストを取得する
+    利用可能な音声のリストを取得する（読み上げスレッドで実行される）
     
     Returns:
         音声名のリスト。エラー時は空のリストを返す
     """
     try:
-        sapi_speaker = win32com.client.Dispatch("SAPI.SpVoice")
-        voices = sapi_speaker.GetVoices()
-        voice_names = []
-        for voice in voices:
-            try:
-                desc = voice.GetDescription()
-                if desc:
-                    voice_names.append(desc)
-            except Exception:
-                # 個別の音声情報取得に失敗しても続行
-                continue
-        return voice_names
+        with create_engine() as engine:
+            return engine.list_voices()
     except Exception as e:
         log_error(f"音声リスト取得エラー: {e}")
         return []
 
 
-def create_sapi_speaker(volume: int = None, voice_name: str = None):
+async def get_available_voices_async():
+    """
+    利用可能な音声のリストを読み上げスレッドで取得する（イベントループは止めない）
+    
+    Returns:
+        音声名のリスト。エラー時は空のリストを返す
+    """
+    return await get_speech_thread().run(get_available_voices)
+
+
+def create_speaker(volume: int = None, voice_name: str = None, rate: int = None):
     """
-    SAPIスピーカーオブジェクトを作成して設定する
+    読み上げエンジンを作成して設定する（読み上げスレッドで実行される）
     
     Args:
         volume: 音量 (0〜100)、Noneの場合はVOLUME_LEVELを使用
         voice_name: 使用する音声名（Noneまたは空文字列の場合はTARGET_VOICE_NAMEを使用、それも空の場合はNoneを返す）
+        rate: 読み上げ速度 (-10〜10)、Noneの場合はSAPI_RATE_DEFAULTを使用
     
     Returns:
-        SAPI.SpVoice オブジェクト、失敗時または音声名が空の場合は None
+        TTSEngine オブジェクト、失敗時または音声名が空の場合は None
     """
+    speaker = None
     try:
         if volume is None:
             volume = config.VOLUME_LEVEL
+        if rate is None:
+            rate = config.SAPI_RATE_DEFAULT
         
         # 使用する音声名を決定（引数が指定されていない場合はデフォルト値を使用）
         target_name = voice_name if voice_name else config.TARGET_VOICE_NAME
@@ -59,47 +71,37 @@ def create_sapi_speaker(volume: int = None, voice_name: str = None):
             log_debug("音声名が設定されていません。読み上げは無効です。")
             return None
         
-        sapi_speaker = win32com.client.Dispatch("SAPI.SpVoice")
-        sapi_speaker.Rate = 0
-        sapi_speaker.Volume = volume
+        speaker = create_engine()
+        speaker.set_rate(rate)
+        speaker.set_volume(volume)
 
         # 指定された音声を検索して設定
-        voices = sapi_speaker.GetVoices()
-        voice_found = False
-        for voice in voices:
-            try:
-                desc = voice.GetDescription()
-                # 音声名が完全一致、または部分一致する場合は使用
-                if desc == target_name or target_name in desc:
-                    sapi_speaker.Voice = voice
-                    voice_found = True
-                    log_debug(f"SAPI音声を設定: {desc}")
-                    break
-            except Exception:
-                # 個別の音声情報取得に失敗しても続行
-                continue
-        
-        # 見つからない場合は標準音声を使用（ログに記録）
-        if not voice_found:
+        desc = speaker.select_voice(target_name)
+        if desc:
+            log_debug(f"音声を設定: {desc} ({speaker.name})")
+        else:
+            # 見つからない場合は標準音声を使用（ログに記録）
             log_debug(f"指定された音声 '{target_name}' が見つかりません。標準音声を使用します。")
 
-        return sapi_speaker
+        return speaker
     except Exception as e:
-        log_error(f"SAPI初期化エラー: {e}")
+        log_error(f"読み上げエンジン初期化エラー: {e}")
+        if speaker:
+            speaker.close()
         return None
 
 
 def setup_sapi(voice_name: str = None):
     """
-    メインスレッドでSAPIを初期化
+    読み上げスレッドでSAPIを初期化（イベントループ以外のスレッドから呼び出す）
     
     Args:
         voice_name: 使用する音声名（Noneの場合はTARGET_VOICE_NAMEを使用）
     
     Returns:
-        SAPI.SpVoice オブジェクト、失敗時は None
+        TTSEngine オブジェクト、失敗時は None
     """
-    return create_sapi_speaker(voice_name=voice_name)
+    return get_speech_thread().call(create_speaker, None, voice_name)
 
 
 async def change_voice(voice_name: str = None):
@@ -133,8 +135,9 @@ async def change_voice(voice_name: str = None):
             
             # 音声変更成功時、読み上げる（読み上げ時に接続が確立される）
             # 起動時（previous_voiceが空）も含めて、音声を設定/変更した場合は読み上げる
+            # 他の読み上げと重ならないよう、読み上げキューに追加する
             speech_text = f"音声を変更しました: {target_voice}"
-            await speak_text(speech_text)
+            enqueue_speech(speech_text)
         else:
             log_debug("change_voice: 音声を無効化します（読み上げ停止）")
             # 音声が空文字列で設定された場合（読み上げ無効化）
@@ -160,25 +163,31 @@ async def change_voice(voice_name: str = None):
         log_error(f"音声変更エラー: {e}\n{error_detail}")
 
 
-async def speak_text(text: str):
+async def speak_text(text: str, rate: int = None, app_id: str = ""):
     """
     テキストを読み上げる（非同期ラッパー）
-    読み上げ時のみSAPI接続を確立し、完了後に解放する（CeVIO Alの同時アクセス制限対策）
+    読み上げ時のみエンジンとの接続を確立し、読み上げがしばらくなければ解放する（CeVIO Alの同時アクセス制限対策）
     
     処理の流れ:
     1. テキストの検証（空文字チェック、音声設定チェック）
-    2. 英語を片仮名に変換（convert_english_to_katakana）
-    3. 読み上げ用のSAPIスピーカーを作成
-    4. SAPIスピーカーで読み上げ実行
+    2. 英語を片仮名に変換（convert_english_to_katakana。通知の正規化は読み上げ待ちへの追加時に済んでいる）
+    3. アプリのプロファイル（voice_profiles）の音声のスピーカー（TTSEngine）を取得（保持していなければ作成）
+    4. スピーカーで読み上げ実行
     5. 読み上げ完了まで待機
-    6. SAPIスピーカーを解放（CeVIO Alの接続を切断）
+    6. スピーカーを返却（speaker_cache が保持し、上限・待機時間を超えたら解放する）
+    
+    3〜6のスピーカーの操作はすべて読み上げスレッドで実行し、完了をawaitで待つ
     
     Args:
         text: 読み上げるテキスト
+        rate: 読み上げ速度 (-10〜10)、Noneの場合はプロファイルの速度（未指定ならSAPI_RATE_DEFAULT）を使用
+              （読み上げキューが読み上げ待ちの件数に応じて指定する）
+        app_id: 通知元のアプリID（アプリごとのプロファイルの音声・音量を使う。空の場合は全体の設定）
     
     Note:
         CeVIO Alの外部連携インターフェイスは同時に1アプリケーションのみアクセス可能。
-        読み上げ完了後に接続を解放することで、他のアプリケーションがアクセスできるようにする。
+        CeVIO音声のスピーカーは1つだけ保持し、SPEAKER_CACHE_IDLE_SECONDS秒読み上げがなければ解放することで、
+        他のアプリケーションがアクセスできるようにする。
     """
     # テキストが空の場合は処理を中断
     if not text or not text.strip():
@@ -190,12 +199,21 @@ async def speak_text(text: str):
         log_debug("speak_text: 音声が設定されていないためスキップ（読み上げ無効）")
         return
     
-    # 読み上げ用のSAPIスピーカーを作成（CeVIO Alの接続を確立）
+    # アプリのプロファイルの音声・音量・速度
+    profile = resolve_profile(app_id)
+    if rate is None:
+        rate = profile.rate
+
+    # 読み上げ用のスピーカーを取得（保持していない場合は作成してCeVIO Alの接続を確立）
+    speech_thread = get_speech_thread()
+    cache = get_speaker_cache(create_speaker)
     temp_speaker = None
+    # 読み上げに失敗したスピーカーは保持せずに解放する
+    reusable = True
     try:
-        temp_speaker = create_sapi_speaker(volume=config.current_volume, voice_name=config.current_voice_name)
+        temp_speaker, created = await cache.acquire(profile.voice_name, profile.volume, rate)
         if not temp_speaker:
-            log_debug("speak_text: SAPIスピーカーの作成に失敗しました")
+            log_debug("speak_text: スピーカーの作成に失敗しました")
             return
         
         # 変換前のテキストを保存（ログ用）
@@ -212,49 +230,53 @@ async def speak_text(text: str):
             log_debug(f"speak_text: 英語を片仮名に変換しました: {original_text[:50]}... → {text[:50]}...")
         
         log_debug(f"speak_text: 読み上げ開始")
-        log_debug(f"speak_text: (音量) {config.current_volume}")
+        log_debug(f"speak_text: (音量) {profile.volume}")
         log_debug(f"speak_text: (text) {text}")
         
-        # 使用中の音声情報をログに出力（デバッグ用）
-        try:
-            current_voice = temp_speaker.Voice
-            voice_desc = current_voice.GetDescription() if current_voice else "None"
-            log_debug(f"SAPI音声: {voice_desc}, 音量: {config.current_volume}")
-            
-            # CeVIO Alの場合、接続確立に時間がかかる可能性があるため、少し待機
-            if "CeVIO" in voice_desc or "cevio" in voice_desc.lower():
-                log_debug("CeVIO Al音声を検出しました。接続確立を待機中...")
-                await asyncio.sleep(0.5)  # 500ms待機して接続確立を待つ
-        except Exception as voice_error:
-            # 音声情報の取得に失敗しても読み上げは続行
-            log_debug(f"音声情報取得エラー: {voice_error}")
+        if created:
+            # 使用中の音声情報をログに出力（デバッグ用）
+            try:
+                voice_desc = await speech_thread.run(temp_speaker.voice_description)
+                log_debug(f"音声: {voice_desc} ({temp_speaker.name}), 音量: {profile.volume}")
+                
+                # CeVIO Alの場合、接続確立に時間がかかる可能性があるため、少し待機
+                if "CeVIO" in voice_desc or "cevio" in voice_desc.lower():
+                    log_debug("CeVIO Al音声を検出しました。接続確立を待機中...")
+                    await asyncio.sleep(0.5)  # 500ms待機して接続確立を待つ
+            except Exception as voice_error:
+                # 音声情報の取得に失敗しても読み上げは続行
+                log_debug(f"音声情報取得エラー: {voice_error}")
+        else:
+            # 保持していたスピーカーは接続済みのため、待機せずに読み上げる
+            log_debug(f"speak_text: 保持していたスピーカーを再利用します: {profile.voice_name}")
         
-        # 非同期フラグで読み上げを開始
-        # SAPI_SPEAK_ASYNC_FLAGを使用することで、読み上げを非同期で実行
-        log_debug(f"speak_text: Speak()を呼び出します: text='{text[:50]}...'")
+        # 読み上げを開始（完了は待たない）
+        log_debug(f"speak_text: speak()を呼び出します: text='{text[:50]}...'")
         try:
-            result = temp_speaker.Speak(text, config.SAPI_SPEAK_ASYNC_FLAG)
-            log_debug(f"speak_text: Speak()の戻り値: {result}")
+            result = await speech_thread.run(temp_speaker.speak, text)
+            log_debug(f"speak_text: speak()の戻り値: {result}")
         except Exception as speak_error:
-            log_error(f"speak_text: Speak()エラー: {speak_error}")
+            log_error(f"speak_text: speak()エラー: {speak_error}")
             import traceback
             log_error(traceback.format_exc())
+            reusable = False
             return
         
         # 読み上げ開始を確認するため、少し待機（CeVIO Alの場合、接続確立に時間がかかる）
-        await asyncio.sleep(0.3)  # 300ms待機して読み上げ開始を確認
+        # 待機時間はエンジンごとに異なる（SAPIは300ms、null/espeakは待機なし）
+        if temp_speaker.start_delay > 0:
+            await asyncio.sleep(temp_speaker.start_delay)
         
         # 読み上げ開始状態を確認
         try:
-            status = temp_speaker.Status
-            log_debug(f"speak_text: Speak()直後のStatus: RunningState={status.RunningState}, CurrentStreamNumber={status.CurrentStreamNumber}")
+            speaking = await speech_thread.run(temp_speaker.is_speaking)
+            log_debug(f"speak_text: speak()直後の状態: 読み上げ中={speaking}")
         except Exception as status_error:
-            log_debug(f"speak_text: Status取得エラー: {status_error}")
+            log_debug(f"speak_text: 状態取得エラー: {status_error}")
         
         # 読み上げが完了するまで待つ
-        # COMオブジェクトはスレッドセーフではないため、別スレッドで実行
-        loop = asyncio.get_running_loop()
-        await loop.run_in_executor(None, _wait_for_speech_completion, temp_speaker)
+        # ブロッキング待機のため、読み上げスレッドで実行
+        await speech_thread.run(temp_speaker.wait_until_done)
         
         log_debug(f"speak_text: 読み上げ完了")
         
@@ -263,155 +285,42 @@ async def speak_text(text: str):
         import traceback
         error_detail = traceback.format_exc()
         log_error(f"読み上げエラー: {e}\n{error_detail}")
+        reusable = False
     finally:
-        # 読み上げ完了後にSAPIスピーカーを解放（CeVIO Alの接続を切断）
+        # 読み上げ完了後にスピーカーを返却（保持しない場合はCeVIO Alの接続を切断）
         if temp_speaker:
-            try:
-                # 解放前の状態を確認
-                try:
-                    final_status = temp_speaker.Status
-                    log_debug(f"speak_text: 解放前の状態 - RunningState={final_status.RunningState}, CurrentStreamNumber={final_status.CurrentStreamNumber}")
-                except:
-                    pass
-                
-                # COMオブジェクトを明示的に解放
-                # ただし、読み上げ中の場合、少し待機してから解放
-                try:
-                    if temp_speaker.Status.RunningState != 0:
-                        log_debug("speak_text: 読み上げ中のため、解放前に少し待機します")
-                        import time
-                        time.sleep(0.5)  # 500ms待機
-                except:
-                    pass
-                
-                del temp_speaker
-                # ガベージコレクションを促す
-                import gc
-                gc.collect()
-                log_debug("speak_text: SAPIスピーカーを解放しました（CeVIO Al接続を切断）")
-            except Exception as e:
-                log_debug(f"speak_text: SAPIスピーカーの解放中にエラー: {e}")
+            await _release_speaker(temp_speaker, reusable)
 
 
-def _wait_for_speech_completion(speaker_obj):
+async def _release_speaker(speaker, reusable: bool = True):
     """
-    読み上げが完了するまで待つ（別スレッドで実行）
-    
-    SAPI.SpVoiceのWaitUntilDoneメソッドを使用して、
-    読み上げが完了するまでブロッキング待機する
-    
-    Args:
-        speaker_obj: SAPI.SpVoiceオブジェクト
-    
-    Note:
-        この関数は別スレッドで実行されるため、COMオブジェクトへの
-        アクセスが可能。メインスレッドから呼び出される場合は
-        run_in_executorを使用する必要がある
+    スピーカーを返却する（speaker_cache が保持しない場合は解放する）
+
+    close() でCOMオブジェクトへの参照を手放すため、gc.collect() は不要
+    （ヒープ全体を走査するgc.collect()は、履歴が増えるほど1件ごとの停止時間が長くなる）
+    close() はスピーカーを作成した読み上げスレッドで実行する
     """
+    speech_thread = get_speech_thread()
+    cache = get_speaker_cache(create_speaker)
+    keep = cache.enabled and reusable
     try:
-        # 読み上げが開始されているか確認（Statusプロパティをチェック）
-        # Statusが0以外の場合、読み上げ中または待機中
-        import time
-        log_debug("_wait_for_speech_completion: 読み上げ開始確認を開始")
-        max_wait = 5  # 最大5秒待機
-        wait_count = 0
-        running_state_checked = False
-        
-        while wait_count < max_wait:
-            try:
-                status = speaker_obj.Status
-                running_state = status.RunningState
-                current_stream = status.CurrentStreamNumber
-                
-                if not running_state_checked:
-                    log_debug(f"_wait_for_speech_completion: 初期状態 - RunningState={running_state}, CurrentStreamNumber={current_stream}")
-                    running_state_checked = True
-                
-                if running_state != 0:  # 0以外は読み上げ中または待機中
-                    log_debug(f"_wait_for_speech_completion: 読み上げ開始を確認: RunningState={running_state}, CurrentStreamNumber={current_stream}")
-                    break
-            except Exception as status_error:
-                log_debug(f"_wait_for_speech_completion: Status取得エラー: {status_error}")
-            
-            time.sleep(0.1)  # 100ms待機
-            wait_count += 0.1
-        
-        if wait_count >= max_wait:
-            log_error("_wait_for_speech_completion: 読み上げ開始確認がタイムアウトしました")
-        
-        # CeVIO Alの場合、WaitUntilDoneが正しく動作しない可能性があるため、
-        # RunningStateをポーリングして読み上げ完了を確認する
-        log_debug("_wait_for_speech_completion: 読み上げ完了を待機中...")
-        max_completion_wait = 60  # 最大60秒待機
-        completion_wait_count = 0
-        check_interval = 0.1  # 100msごとにチェック
-        last_running_state = None
-        state_change_time = 0
-        state_1_start_time = None  # RunningState=1になった時点を記録
-        state_1_timeout = 2.0  # RunningState=1が2秒続いたら完了とみなす（CeVIO Al対策）
-        completed_by_timeout = False  # タイムアウトで完了とみなしたかどうか
-        
-        while completion_wait_count < max_completion_wait:
-            try:
-                status = speaker_obj.Status
-                running_state = status.RunningState
-                
-                # RunningStateが0になったら読み上げ完了
-                if running_state == 0:
-                    log_debug(f"_wait_for_speech_completion: 読み上げ完了を確認: RunningState={running_state}")
-                    break
-                
-                # 状態が変化したかチェック
-                if running_state != last_running_state:
-                    last_running_state = running_state
-                    state_change_time = completion_wait_count
-                    log_debug(f"_wait_for_speech_completion: RunningStateが変化: {running_state}, 経過時間={completion_wait_count:.1f}秒")
-                    
-                    # RunningState=2から1に変化した時点で、読み上げが開始されたことを記録
-                    if running_state == 1:
-                        state_1_start_time = completion_wait_count
-                        log_debug(f"_wait_for_speech_completion: RunningState=1（読み上げ中）に変化しました。読み上げ開始時刻を記録")
-                
-                # RunningState=1（読み上げ中）が一定時間続いたら、読み上げが完了したとみなす
-                # CeVIO Alの場合、RunningState=2（待機中）から1（読み上げ中）に変化した後、
-                # 1が一定時間続いたら完了とみなす
-                if running_state == 1 and state_1_start_time is not None:
-                    elapsed_since_state_1 = completion_wait_count - state_1_start_time
-                    if elapsed_since_state_1 >= state_1_timeout:
-                        log_debug(f"_wait_for_speech_completion: RunningState=1が{elapsed_since_state_1:.1f}秒続いたため、読み上げ完了とみなします")
-                        completed_by_timeout = True
-                        # 少し追加で待機してから完了とする（読み上げが確実に終わるように）
-                        time.sleep(0.3)
-                        break
-                
-                # 定期的にログを出力（5秒ごと）
-                if int(completion_wait_count * 10) % 50 == 0 and completion_wait_count > 0:
-                    log_debug(f"_wait_for_speech_completion: 読み上げ待機中... RunningState={running_state}, 経過時間={completion_wait_count:.1f}秒")
-            except Exception as status_error:
-                log_debug(f"_wait_for_speech_completion: Status取得エラー: {status_error}")
-            
-            time.sleep(check_interval)
-            completion_wait_count += check_interval
-        
-        # 最終状態を確認
-        try:
-            final_status = speaker_obj.Status
-            final_running_state = final_status.RunningState
-            log_debug(f"_wait_for_speech_completion: 最終状態 - RunningState={final_running_state}, CurrentStreamNumber={final_status.CurrentStreamNumber}, 経過時間={completion_wait_count:.1f}秒")
-            
-            # タイムアウトで完了とみなした場合は、RunningState=1でもエラーとしない
-            if final_running_state != 0 and not completed_by_timeout:
-                log_error(f"_wait_for_speech_completion: 読み上げが完了していません。RunningState={final_running_state}")
-                # WaitUntilDoneも試してみる（念のため）
-                try:
-                    wait_result = speaker_obj.WaitUntilDone(5)
-                    log_debug(f"_wait_for_speech_completion: WaitUntilDone(5)の戻り値: {wait_result}")
-                except Exception as wait_error:
-                    log_debug(f"_wait_for_speech_completion: WaitUntilDoneエラー: {wait_error}")
-            elif completed_by_timeout:
-                log_debug(f"_wait_for_speech_completion: タイムアウトで完了とみなしたため、RunningState={final_running_state}でも正常終了とします")
-        except Exception as final_status_error:
-            log_debug(f"_wait_for_speech_completion: 最終状態取得エラー: {final_status_error}")
+        # 解放する場合、読み上げ中なら、イベントループを止めずに少し待機してから解放
+        if not keep and await speech_thread.run(speaker.is_speaking):
+            log_debug("speak_text: 読み上げ中のため、解放前に少し待機します")
+            await asyncio.sleep(0.5)  # 500ms待機
+    except asyncio.CancelledError:
+        # キャンセルされても解放は読み上げスレッドで必ず行う（完了は待たない）
+        cache.discard(speaker)
+        raise
+    except Exception:
+        pass
+
+    try:
+        await cache.release(speaker, reusable)
+        if not keep:
+            log_debug("speak_text: スピーカーを解放しました（CeVIO Al接続を切断）")
+    except asyncio.CancelledError:
+        cache.discard(speaker)
+        raise
     except Exception as e:
-        # WaitUntilDoneでエラーが発生しても読み上げは続行される可能性がある
-        log_error(f"WaitUntilDoneエラー: {e}")
+        log_debug(f"speak_text: スピーカーの解放中にエラー: {e}")
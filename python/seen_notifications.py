@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+# seen_notifications.py
+# 処理済みの通知の記録（ブリッジの再起動をまたいで保持する）
+#
+# 起動時に通知センターに残っている通知のうち、前回までに送信済みのものを
+# 再び送信しないようにするため、処理済みの通知IDと内容のハッシュをファイルに保存する。
+#
+#   - 直近 SEEN_EXACT_MAX 件: 通知ID -> 内容のハッシュ を正確に保持する
+#   - それより古いもの: ブルームフィルター（2世代をローテーション）で「通知ID:内容のハッシュ」を保持する
+#
+# Windowsは通知IDを再利用するため、どちらも通知IDと内容のハッシュの両方が一致した場合に処理済みとする
+
+import base64
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+import config
+from logger import log_debug, log_error
+
+FILE_VERSION = 1
+
+
+def content_hash(data: dict) -> str:
+    """通知の内容（app_id, title, text）のハッシュ"""
+    source = "\x1f".join((data.get("app_id") or "", data.get("title") or "", data.get("text") or ""))
+    return hashlib.blake2b(source.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class BloomFilter:
+    """固定長のブルームフィルター"""
+
+    def __init__(self, bits: int, hashes: int, data: bytes = None, count: int = 0):
+        self.bits = bits
+        self.hashes = hashes
+        self.array = bytearray(data) if data else bytearray((bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, key: str):
+        # 1回のハッシュ計算から k 個の位置を作る（ダブルハッシュ法）
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.array[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.array[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "data": base64.b64encode(bytes(self.array)).decode("ascii")}
+
+    @classmethod
+    def from_dict(cls, bits: int, hashes: int, value: dict):
+        data = base64.b64decode(value["data"])
+        if len(data) != (bits + 7) // 8:
+            raise ValueError("ブルームフィルターの大きさが設定と一致しません")
+        return cls(bits, hashes, data, value.get("count", 0))
+
+
+class SeenNotifications:
+    """処理済みの通知の記録"""
+
+    def __init__(self, path: str = None):
+        self.path = path or config.SEEN_STATE_PATH
+        self._recent = OrderedDict()  # 通知ID -> 内容のハッシュ（古い順）
+        self._current = self._new_filter()
+        self._previous = self._new_filter()
+        self._dirty = False
+        self._last_saved = 0.0
+
+    @staticmethod
+    def _new_filter() -> BloomFilter:
+        return BloomFilter(config.SEEN_BLOOM_BITS, config.SEEN_BLOOM_HASHES)
+
+    def __len__(self) -> int:
+        return len(self._recent) + self._current.count + self._previous.count
+
+    # ---------- 判定・追加 ----------
+    def seen_content(self, notification_id, data: dict) -> bool:
+        """
+        通知ID + 内容のハッシュが処理済みか
+
+        Windowsは通知IDを再利用するため、通知IDだけでなく内容のハッシュも一致した場合に処理済みとする
+        """
+        key = str(notification_id)
+        hash_value = content_hash(data)
+        if key in self._recent:
+            return self._recent[key] == hash_value
+        key = f"{key}:{hash_value}"
+        return key in self._current or key in self._previous
+
+    def add(self, notification_id, data: dict):
+        """処理済みとして記録する"""
+        key = str(notification_id)
+        self._recent[key] = content_hash(data)
+        self._recent.move_to_end(key)
+        self._dirty = True
+        # 直近の記録からあふれたものはブルームフィルターへ移す
+        while len(self._recent) > config.SEEN_EXACT_MAX:
+            old_key, old_hash = self._recent.popitem(last=False)
+            self._add_to_filter(old_key, old_hash)
+
+    def _add_to_filter(self, key: str, hash_value: str):
+        if self._current.count >= config.SEEN_BLOOM_CAPACITY:
+            # 世代を進める（2世代前の記録は忘れる）
+            self._previous = self._current
+            self._current = self._new_filter()
+        self._current.add(f"{key}:{hash_value}")
+
+    # ---------- 保存・読み込み ----------
+    def load(self) -> bool:
+        """ファイルから読み込む（ファイルがない・壊れている場合は空のまま）"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("version") != FILE_VERSION:
+                raise ValueError(f"未対応のバージョンです: {state.get('version')}")
+            bits, hashes = config.SEEN_BLOOM_BITS, config.SEEN_BLOOM_HASHES
+            current = BloomFilter.from_dict(bits, hashes, state["current"])
+            previous = BloomFilter.from_dict(bits, hashes, state["previous"])
+            recent = OrderedDict((key, value) for key, value in state["recent"])
+        except Exception as e:
+            log_error(f"処理済み通知の記録を読み込めません（作り直します）: {e}")
+            return False
+        self._recent, self._current, self._previous = recent, current, previous
+        return True
+
+    def save(self):
+        """ファイルに保存する（書きかけのファイルが残らないよう、一時ファイルから置き換える）"""
+        state = {
+            "version": FILE_VERSION,
+            "recent": list(self._recent.items()),
+            "current": self._current.to_dict(),
+            "previous": self._previous.to_dict(),
+        }
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, separators=(",", ":"))
+            os.replace(temp_path, self.path)
+            self._dirty = False
+            self._last_saved = time.monotonic()
+        except Exception as e:
+            log_error(f"処理済み通知の記録を保存できません: {e}")
+
+    def save_if_dirty(self, force: bool = False):
+        """変更があれば保存する（前回の保存から SEEN_SAVE_INTERVAL 秒以上経過している場合のみ）"""
+        if not self._dirty or not config.SEEN_STATE_ENABLED:
+            return
+        if force or time.monotonic() - self._last_saved >= config.SEEN_SAVE_INTERVAL:
+            self.save()
+
+
+# 処理済みの通知の記録（プロセスごとに1つ）
+_seen_notifications = None
+
+
+def get_seen_notifications() -> SeenNotifications:
+    """
+    処理済みの通知の記録を取得する（初回呼び出し時にファイルから読み込む）
+    SEEN_REBUILD が True の場合は読み込まずに空から作り直す
+    """
+    global _seen_notifications
+    if _seen_notifications is None:
+        seen = SeenNotifications()
+        if not config.SEEN_STATE_ENABLED:
+            log_debug("処理済み通知の記録は無効です（起動時に過去の通知をすべて送信します）")
+        elif config.SEEN_REBUILD:
+            log_debug("処理済み通知の記録を作り直します")
+            seen._dirty = True
+        elif seen.load():
+            log_debug(f"処理済み通知の記録を読み込みました: {len(seen)}件")
+        _seen_notifications = seen
+    return _seen_notifications
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# speaker_cache.py
+# 音声ごとの読み上げエンジン（セッション）のキャッシュ
+#
+# アプリごとに音声が異なる場合（voice_profiles）、読み上げのたびにエンジンを作成・解放すると
+# 音声の切り替えごとに接続の確立（CeVIO AIでは数百ms）がかかる。
+# 読み上げ後のエンジンを音声ごとに保持しておき、次に同じ音声で読み上げるときに再利用する。
+#
+#   - 保持する数は SPEAKER_CACHE_MAX_SESSIONS まで（超える場合は最も長く使われていないものを解放）
+#   - CeVIO AIの外部連携は同時に1つしか接続できないため、SPEAKER_CACHE_EXCLUSIVE_VOICES に
+#     一致する音声のエンジンは1つだけ保持する（別のCeVIO音声を使う前に解放する）
+#   - SPEAKER_CACHE_IDLE_SECONDS 秒読み上げがなければすべて解放する（他のアプリがCeVIO AIを使えるように）
+#
+# エンジンの作成・設定・解放は読み上げスレッド（speech_thread）で行う
+
+import asyncio
+from collections import OrderedDict
+
+import config
+from logger import log_debug
+from metrics import register_metrics_provider
+from speech_thread import get_speech_thread
+
+
+def _configure_speaker(speaker, volume: int, rate: int):
+    """再利用するエンジンに音量・速度を設定する（読み上げスレッドで実行）"""
+    speaker.set_volume(volume)
+    speaker.set_rate(rate)
+
+
+def is_exclusive_voice(voice_name: str) -> bool:
+    """同時に1つしか接続できない音声（CeVIO AIなど）の場合はTrue"""
+    lowered = (voice_name or "").lower()
+    return any(keyword.lower() in lowered for keyword in config.SPEAKER_CACHE_EXCLUSIVE_VOICES)
+
+
+class SpeakerCache:
+    """
+    音声名 -> 読み上げエンジン のLRUキャッシュ（イベントループのスレッドから使う）
+
+    使い方:
+        speaker, created = await cache.acquire(voice_name, volume, rate)
+        try:
+            ...  # 読み上げ
+        finally:
+            await cache.release(speaker)
+    """
+
+    def __init__(self, factory):
+        """
+        Args:
+            factory: factory(volume, voice_name, rate) でエンジンを作成する関数（読み上げスレッドで実行される。失敗時はNone）
+        """
+        self._factory = factory
+        self._sessions = OrderedDict()  # 音声名 -> エンジン（古い順）
+        self._in_use = {}  # id(エンジン) -> 音声名
+        self._idle_timer = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return config.SPEAKER_CACHE_ENABLED and config.SPEAKER_CACHE_MAX_SESSIONS > 0
+
+    # ---------- 取得・返却 ----------
+    async def acquire(self, voice_name: str, volume: int, rate: int) -> tuple:
+        """
+        音声のエンジンを取得する（保持していない場合は作成する）
+
+        Returns:
+            (エンジン, 新しく作成した場合はTrue)。作成に失敗した場合は (None, True)
+        """
+        speech_thread = get_speech_thread()
+        self._cancel_idle_timer()
+
+        speaker = self._sessions.pop(voice_name, None) if self.enabled else None
+        if speaker is not None:
+            self.hits += 1
+            self._in_use[id(speaker)] = voice_name
+            try:
+                await speech_thread.run(_configure_speaker, speaker, volume, rate)
+                return speaker, False
+            except Exception as e:
+                # 接続が切れているなどで使えない場合は作り直す
+                log_debug(f"speaker_cache: 保持していたエンジンを再利用できません（作り直します）: {e}")
+                self._in_use.pop(id(speaker), None)
+                speech_thread.submit(speaker.close)
+
+        self.misses += 1
+        self._make_room(voice_name)
+        speaker = await speech_thread.run(self._factory, volume, voice_name, rate)
+        if speaker is not None:
+            self._in_use[id(speaker)] = voice_name
+        return speaker, True
+
+    async def release(self, speaker, reusable: bool = True):
+        """
+        読み上げが終わったエンジンを返す
+
+        Args:
+            reusable: Falseの場合（読み上げでエラーが発生した場合など）は保持せずに解放する
+        """
+        voice_name = self._in_use.pop(id(speaker), None)
+        if not self.enabled or not reusable or voice_name is None:
+            await get_speech_thread().run(speaker.close)
+            return
+        # 読み上げ中に同じ音声のエンジンが保持された場合は、古い方を解放する
+        previous = self._sessions.pop(voice_name, None)
+        if previous is not None and previous is not speaker:
+            self._close(previous)
+        self._make_room(voice_name)
+        self._sessions[voice_name] = speaker
+        self._schedule_idle_timer()
+
+    def discard(self, speaker):
+        """読み上げ中のエンジンを保持せずに解放する（キャンセル時など。完了は待たない）"""
+        self._in_use.pop(id(speaker), None)
+        get_speech_thread().submit(speaker.close)
+
+    # ---------- 解放 ----------
+    def _make_room(self, voice_name: str):
+        """voice_name のエンジンを追加できるよう、上限を超える分と同時に接続できない音声を解放する"""
+        if is_exclusive_voice(voice_name):
+            for cached_name in [name for name in self._sessions if is_exclusive_voice(name)]:
+                log_debug(f"speaker_cache: 同時に接続できない音声のため解放します: {cached_name}")
+                self._close(self._sessions.pop(cached_name))
+        while self._sessions and len(self._sessions) + len(self._in_use) >= config.SPEAKER_CACHE_MAX_SESSIONS:
+            cached_name, speaker = self._sessions.popitem(last=False)
+            log_debug(f"speaker_cache: 最も長く使われていない音声を解放します: {cached_name}")
+            self._close(speaker)
+
+    def _close(self, speaker):
+        self.evictions += 1
+        get_speech_thread().submit(speaker.close)
+
+    def close_all(self):
+        """保持しているエンジンをすべて解放する（完了は待たない。読み上げスレッドで順に実行される）"""
+        self._cancel_idle_timer()
+        while self._sessions:
+            _, speaker = self._sessions.popitem(last=False)
+            get_speech_thread().submit(speaker.close)
+
+    def _schedule_idle_timer(self):
+        if config.SPEAKER_CACHE_IDLE_SECONDS <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        self._idle_timer = loop.call_later(config.SPEAKER_CACHE_IDLE_SECONDS, self._on_idle)
+
+    def _cancel_idle_timer(self):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _on_idle(self):
+        self._idle_timer = None
+        if self._sessions:
+            log_debug(f"speaker_cache: {config.SPEAKER_CACHE_IDLE_SECONDS}秒読み上げがないため、エンジンを解放します: {list(self._sessions)}")
+            self.close_all()
+
+    # ---------- メトリクス ----------
+    def snapshot(self) -> dict:
+        """保持しているエンジンとヒット率（metricsメッセージ用）"""
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "sessions": list(self._sessions),
+            "in_use": len(self._in_use),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+            "evictions": self.evictions,
+        }
+
+
+# エンジンのキャッシュ（プロセスごとに1つ）
+_speaker_cache = None
+
+
+def get_speaker_cache(factory=None) -> SpeakerCache:
+    """
+    エンジンのキャッシュを取得する（初回呼び出し時に factory を指定して作成）
+
+    Args:
+        factory: factory(volume, voice_name, rate) でエンジンを作成する関数
+    """
+    global _speaker_cache
+    if _speaker_cache is None:
+        if factory is None:
+            raise RuntimeError("speaker_cache: 初回呼び出し時は factory を指定してください")
+        _speaker_cache = SpeakerCache(factory)
+        register_metrics_provider("speaker_cache", _speaker_cache.snapshot)
+    return _speaker_cache
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+# speech_queue.py
+# 読み上げキュー（読み上げ待ちの件数に応じた速度調整・本文の省略・期限切れの破棄）
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+import config
+from logger import log_debug, log_error
+from metrics import register_metrics_provider
+from speech_throttle import estimate_speech_seconds, get_speech_throttle
+from text_processor import normalize_speech_text
+from voice_profiles import resolve_profile
+
+
+@dataclass
+class Utterance:
+    """読み上げ待ちの1件"""
+    text: str
+    short_text: str = ""  # 読み上げ待ちが多いときに使う短いテキスト（空の場合は短縮しない）
+    app_id: str = ""
+    job_id: int = None  # マルチプロセスモードでsupervisorが付与するID
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+    def age(self, now: float = None) -> float:
+        """キューに入ってからの経過秒数"""
+        return (now if now is not None else time.monotonic()) - self.enqueued_at
+
+
+class SpeechQueue:
+    """
+    読み上げ待ちのキュー（FIFO）
+    イベントループのスレッドから操作する。他のスレッドからは put_threadsafe を使用する
+    """
+
+    def __init__(self):
+        self._items = deque()
+        self._not_empty = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, utterance: Utterance):
+        """読み上げ待ちに追加する"""
+        self._items.append(utterance)
+        self._not_empty.set()
+
+    def put_threadsafe(self, utterance: Utterance):
+        """別スレッドから読み上げ待ちに追加する"""
+        if not config.main_loop:
+            log_error("main_loopがNoneです")
+            return
+        config.main_loop.call_soon_threadsafe(self.put, utterance)
+
+    def get_nowait(self):
+        """先頭の1件を取り出す（空の場合はNone）"""
+        if not self._items:
+            self._not_empty.clear()
+            return None
+        return self._items.popleft()
+
+    async def get(self) -> Utterance:
+        """先頭の1件を取り出す（空の場合は追加されるまで待機）"""
+        while not self._items:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        return self._items.popleft()
+
+    def oldest_age(self) -> float:
+        """最も古い読み上げ待ちの経過秒数（空の場合は0）"""
+        return self._items[0].age() if self._items else 0.0
+
+
+# 読み上げキュー（イベントループごとに1つ）
+_speech_queue = None
+
+
+def get_speech_queue() -> SpeechQueue:
+    """読み上げキューを取得する（初回呼び出し時に作成）"""
+    global _speech_queue
+    if _speech_queue is None:
+        _speech_queue = SpeechQueue()
+    return _speech_queue
+
+
+def normalize_notification_text(text: str, options: dict) -> str:
+    """
+    通知の読み上げテキストを正規化する（Electron側でテンプレート・変換リストを適用した後のテキスト）
+
+    Args:
+        text: 読み上げテキスト
+        options: Electron側の設定（consecutive_min_length, max_length）
+
+    Returns:
+        正規化されたテキスト（空になった場合は SPEECH_EMPTY_NOTIFICATION_TEXT）
+    """
+    return normalize_speech_text(
+        text,
+        consecutive_min_length=options.get("consecutive_min_length") or 0,
+        max_length=options.get("max_length") or 0,
+    ) or config.SPEECH_EMPTY_NOTIFICATION_TEXT
+
+
+def enqueue_speech(
+    text: str,
+    short_text: str = "",
+    app_id: str = "",
+    job_id: int = None,
+    enqueued_at: float = None,
+    normalize: dict = None,
+):
+    """
+    読み上げ待ちに追加する（別スレッドからも呼び出し可能）
+
+    Args:
+        text: 読み上げるテキスト
+        short_text: 読み上げ待ちが多いときに使う短いテキスト（省略可）
+        app_id: 通知元のアプリID（省略可）
+        job_id: マルチプロセスモードのジョブID（省略可）
+        enqueued_at: 受付時刻（time.monotonic()。省略時は現在時刻。プロセスの再起動をまたぐ再送で使用）
+        normalize: 通知の場合は正規化の設定（consecutive_min_length, max_length）。
+            Noneの場合（手動の読み上げ、音声変更のお知らせなど）は正規化しない
+    """
+    if normalize is not None:
+        text = normalize_notification_text(text, normalize)
+        if short_text:
+            short_text = normalize_notification_text(short_text, normalize)
+    utterance = Utterance(text=text, short_text=short_text or "", app_id=app_id or "", job_id=job_id)
+    if enqueued_at is not None:
+        utterance.enqueued_at = enqueued_at
+    speech_queue = get_speech_queue()
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+
+    if running_loop is not None and running_loop is config.main_loop:
+        speech_queue.put(utterance)
+    else:
+        speech_queue.put_threadsafe(utterance)
+
+
+def shorten_for_backlog(utterance: Utterance) -> str:
+    """
+    読み上げ待ちが多いときの短いテキストを返す
+
+    短いテキスト（ユーザーのテンプレートから本文を除いたもの）はテンプレートを適用するElectron側で作成して
+    short_text で送る。short_text が指定されていない場合や、全文より短くない場合は短縮しない
+    （テンプレートが任意のため、読み上げテキストからはどこまでが本文か判断できない）
+    """
+    short_text = utterance.short_text
+    if short_text and len(short_text) < len(utterance.text):
+        return short_text
+    return utterance.text
+
+
+def plan_utterance(utterance: Utterance, backlog: int) -> tuple:
+    """
+    読み上げ待ちの件数から、読み上げるテキストと速度を決める
+
+    Args:
+        utterance: 読み上げる1件
+        backlog: この1件の後ろに残っている読み上げ待ちの件数
+
+    Returns:
+        (読み上げるテキスト, SAPIの速度)
+    """
+    # アプリごとのプロファイルの速度を基準にする
+    base_rate = resolve_profile(utterance.app_id).rate
+    if not config.LATENCY_TARGET_ENABLED:
+        return utterance.text, base_rate
+
+    rate = base_rate
+    for threshold, step_rate in config.LATENCY_RATE_STEPS:
+        if backlog >= threshold:
+            rate = max(rate, step_rate)
+    rate = max(config.SAPI_RATE_MIN, min(config.SAPI_RATE_MAX, rate))
+
+    text = utterance.text
+    if backlog >= config.LATENCY_SHORTEN_BACKLOG:
+        text = shorten_for_backlog(utterance)
+    return text, rate
+
+
+def _is_expired(utterance: Utterance, now: float) -> bool:
+    """遅延目標モードで期限を過ぎているか"""
+    return config.LATENCY_TARGET_ENABLED and utterance.age(now) > config.LATENCY_DEADLINE_SECONDS
+
+
+async def _speak_measured(speak, text: str, rate: int, app_id: str = ""):
+    """読み上げて、かかった秒数を流量制限の集計に記録する"""
+    start = time.monotonic()
+    try:
+        await speak(text, rate, app_id)
+    finally:
+        get_speech_throttle().record_spoken(time.monotonic() - start)
+
+
+async def _next_utterance(speech_queue: SpeechQueue, timeout: float = None):
+    """次の1件を取り出す（timeout秒以内に追加されない場合はNone）"""
+    if timeout is None:
+        return await speech_queue.get()
+    try:
+        return await asyncio.wait_for(speech_queue.get(), timeout)
+    except asyncio.TimeoutError:
+        return None
+
+
+def speech_metrics() -> dict:
+    """読み上げキューと流量制限の状態（metricsメッセージ用）"""
+    speech_queue = get_speech_queue()
+    return {
+        "backlog": len(speech_queue),
+        "oldest_age_seconds": round(speech_queue.oldest_age(), 1),
+        "throttle": get_speech_throttle().snapshot(),
+    }
+
+
+async def speech_worker_loop(speak, on_start=None, on_done=None):
+    """
+    読み上げキューから1件ずつ取り出して読み上げる（読み上げは常に1件ずつ）
+
+    期限を過ぎた読み上げはまとめて破棄し、「N件の通知を省略しました」を読み上げる
+    流量制限（speech_throttle）を超えたアプリの通知は読み上げず、
+    THROTTLE_SUMMARY_INTERVAL秒ごとに省略件数をまとめて読み上げる
+
+    Args:
+        speak: 読み上げ関数 speak(text, rate, app_id) のコルーチン関数
+        on_start: 読み上げ開始時に Utterance を受け取る関数（省略可）
+        on_done: 読み上げ完了・破棄時に Utterance を受け取る関数（省略可）
+    """
+    speech_queue = get_speech_queue()
+    throttle = get_speech_throttle()
+    register_metrics_provider("speech", speech_metrics)
+
+    while True:
+        # 省略件数の要約が控えている場合は、その時刻に起きられるよう待機時間を区切る
+        utterance = await _next_utterance(speech_queue, throttle.summary_due_in())
+
+        # 期限切れの読み上げをまとめて破棄する（キューは古い順に並んでいる）
+        now = time.monotonic()
+        expired = []
+        while utterance is not None and _is_expired(utterance, now):
+            expired.append(utterance)
+            utterance = speech_queue.get_nowait()
+
+        try:
+            if expired:
+                log_debug(f"speech_queue: 期限切れの読み上げを{len(expired)}件破棄しました")
+                for item in expired:
+                    if on_done:
+                        on_done(item)
+                _, rate = plan_utterance(expired[-1], len(speech_queue))
+                await _speak_measured(speak, f"{len(expired)}件の通知を省略しました", rate)
+
+            suppressed = throttle.take_summary()
+            if suppressed:
+                log_debug(f"speech_queue: 流量制限により{suppressed}件の読み上げを省略しました")
+                await _speak_measured(speak, f"{suppressed}件の通知を省略しました", config.SAPI_RATE_DEFAULT)
+
+            if utterance is None:
+                continue
+
+            text, rate = plan_utterance(utterance, len(speech_queue))
+            if not throttle.admit(utterance.app_id, estimate_speech_seconds(text, rate)):
+                if on_done:
+                    on_done(utterance)
+                continue
+
+            if rate != config.SAPI_RATE_DEFAULT or text != utterance.text:
+                log_debug(f"speech_queue: 読み上げ待ち={len(speech_queue)}件, 速度={rate}, 省略={text != utterance.text}")
+            if on_start:
+                on_start(utterance)
+            await _speak_measured(speak, text, rate, utterance.app_id)
+            if on_done:
+                on_done(utterance)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            import traceback
+            error_detail = traceback.format_exc()
+            log_error(f"speech_queue: 読み上げエラー: {e}\n{error_detail}")
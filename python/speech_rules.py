@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+# speech_rules.py
+# 読み上げルール（読ませない通知・変換リスト）の適用と、読み上げを行わない試行（dry_run）
+#
+# ルールはElectron側の設定（ToastLogContext の processNotificationForSpeech）と同じ形式で受け取る:
+#   - blockedApps: [{app, app_id, title, text, appIsRegex, appIdIsRegex, titleIsRegex, textIsRegex}]
+#   - replacements: [{from, to, isRegex}]
+#   - speechTemplate, consecutiveCharMinLength, maxTextLength
+#
+# dry_run() は通知のリストにルール・テンプレート・正規化・片仮名変換を順に適用し、
+# 読み上げエンジンは使わずに、最終的な読み上げテキストと処理段階ごとの所要時間を返す。
+# ルールは1回の呼び出しにつき1度だけコンパイルするため、数千件をまとめて試せる
+#
+# Note:
+#     正規表現はPythonのreで解釈するため、JavaScriptと構文が異なるパターンは結果が異なる場合がある。
+#     置換後の文字列の $1 $& $$ $<name> はJavaScriptと同じく展開する
+
+import re
+import time
+
+import config
+from logger import debug_logs_suppressed, log_debug
+from text_processor import convert_english_to_katakana, normalize_speech_text, render_speech_template
+
+try:
+    from re import _parser as _sre_parse
+except ImportError:  # Python 3.10以前
+    import sre_parse as _sre_parse
+
+# 処理段階（dry_runの所要時間のキー）
+STAGES = ("block", "template", "replacements", "normalize", "katakana")
+
+# 置換後の文字列に含まれるJavaScriptの置換パターン
+_JS_REPLACEMENT_TOKEN = re.compile(r"\$(\$|&|\d{1,2}|<[^>]*>)")
+
+# 繰り返しの演算子（sre_parse の内部表現）
+_REPEAT_OPCODES = {
+    opcode for opcode in (
+        getattr(_sre_parse, "MAX_REPEAT", None),
+        getattr(_sre_parse, "MIN_REPEAT", None),
+        getattr(_sre_parse, "POSSESSIVE_REPEAT", None),
+    ) if opcode is not None
+}
+
+
+# =================================================
+# 正規表現の安全性の確認（ReDoS対策）
+# =================================================
+def _repetition_stats(parsed) -> tuple:
+    """(繰り返しの入れ子の深さの最大, 繰り返しの数) を返す"""
+    max_height = 0
+    repetitions = 0
+    for opcode, value in parsed:
+        height = 0
+        children = []
+        if opcode in _REPEAT_OPCODES:
+            repetitions += 1
+            height = 1
+            children = [value[2]]
+        elif isinstance(value, (list, tuple)):
+            # グループ・先読みなどは値の中に SubPattern を含む。BRANCH は (None, [分岐, ...]) の形
+            for item in value:
+                if isinstance(item, _sre_parse.SubPattern):
+                    children.append(item)
+                elif isinstance(item, list):
+                    children.extend(branch for branch in item if isinstance(branch, _sre_parse.SubPattern))
+        elif isinstance(value, _sre_parse.SubPattern):
+            children = [value]
+        for child in children:
+            child_height, child_repetitions = _repetition_stats(child)
+            max_height = max(max_height, height + child_height)
+            repetitions += child_repetitions
+        max_height = max(max_height, height)
+    return max_height, repetitions
+
+
+def check_pattern(pattern: str):
+    """
+    ユーザー定義の正規表現パターンを確認する（safe-regexと同じ基準）
+
+    Returns:
+        問題がない場合はNone、危険または無効な場合はその理由
+    """
+    if len(pattern) > config.RULE_PATTERN_MAX_LENGTH:
+        return "パターンが長すぎます"
+    try:
+        parsed = _sre_parse.parse(pattern)
+    except re.error as e:
+        return f"無効な正規表現です: {e}"
+    height, repetitions = _repetition_stats(parsed)
+    if height > 1:
+        return "繰り返しが入れ子になっています"
+    if repetitions > config.RULE_PATTERN_MAX_REPETITIONS:
+        return "繰り返しが多すぎます"
+    return None
+
+
+def _js_replacement(template: str):
+    """置換後の文字列（JavaScriptの形式）を re.sub に渡す関数に変換する"""
+    if "$" not in template:
+        return lambda _match: template
+
+    def expand(match):
+        group_count = match.re.groups
+
+        def token(token_match):
+            name = token_match.group(1)
+            if name == "$":
+                return "$"
+            if name == "&":
+                return match.group(0)
+            if name.startswith("<"):
+                if name[1:-1] not in match.re.groupindex:
+                    return token_match.group(0)
+                return match.group(name[1:-1]) or ""
+            # $nn が存在しないグループの場合は $n + 数字として扱う（JavaScriptと同じ）
+            if len(name) == 2 and int(name) > group_count:
+                index, rest = int(name[0]), name[1]
+            else:
+                index, rest = int(name), ""
+            if 1 <= index <= group_count:
+                return (match.group(index) or "") + rest
+            return token_match.group(0)
+
+        return _JS_REPLACEMENT_TOKEN.sub(token, template)
+
+    return expand
+
+
+# =================================================
+# ルール
+# =================================================
+class _FieldMatcher:
+    """読ませない通知の1項目（完全一致、または正規表現の部分一致）"""
+
+    def __init__(self, pattern: str, is_regex: bool):
+        self.pattern = pattern
+        self.regex = None
+        if is_regex:
+            # 危険・無効なパターンは完全一致として扱う（Electron側と同じ）
+            if check_pattern(pattern) is None:
+                self.regex = re.compile(pattern)
+
+    def matches(self, value: str) -> bool:
+        if not value:
+            return False
+        if self.regex is not None:
+            return self.regex.search(value) is not None
+        return value == self.pattern
+
+
+class SpeechRules:
+    """
+    読み上げルール（Electron側の設定から1度だけコンパイルする）
+
+    Attributes:
+        skipped: 危険・無効なため使用しないルール（{"kind", "index", "pattern", "reason"}）
+    """
+
+    # 読ませない通知の項目: (通知のキー, 設定のキー, 正規表現フラグのキー)
+    BLOCK_FIELDS = (
+        ("app", "app", "appIsRegex"),
+        ("app_id", "app_id", "appIdIsRegex"),
+        ("title", "title", "titleIsRegex"),
+        ("text", "text", "textIsRegex"),
+    )
+
+    def __init__(self, settings: dict = None):
+        settings = settings or {}
+        self.template = settings.get("speechTemplate") or config.SPEECH_TEMPLATE_DEFAULT
+        self.consecutive_min_length = int(settings.get("consecutiveCharMinLength") or 0)
+        self.max_length = int(settings.get("maxTextLength") or 0)
+        self.skipped = []
+        self._blocked = []
+        self._replacements = []
+
+        for index, rule in enumerate(settings.get("blockedApps") or []):
+            self._add_block_rule(index, rule or {})
+        for index, rule in enumerate(settings.get("replacements") or []):
+            self._add_replacement(index, rule or {})
+
+    def _skip(self, kind: str, index: int, pattern: str, reason: str):
+        self.skipped.append({"kind": kind, "index": index, "pattern": pattern, "reason": reason})
+
+    def _add_block_rule(self, index: int, rule: dict):
+        matchers = []
+        for log_key, rule_key, regex_key in self.BLOCK_FIELDS:
+            pattern = rule.get(rule_key)
+            if not pattern:
+                continue
+            if rule.get(regex_key):
+                reason = check_pattern(pattern)
+                if reason:
+                    self._skip("blockedApps", index, pattern, f"{reason}（完全一致として扱います）")
+            matchers.append((log_key, _FieldMatcher(pattern, bool(rule.get(regex_key)))))
+        # 少なくとも1つの項目が設定されている必要がある（すべて未設定の場合はブロックしない）
+        if matchers:
+            self._blocked.append((index, matchers))
+
+    def _add_replacement(self, index: int, rule: dict):
+        source, target = rule.get("from"), rule.get("to")
+        if not source or not target:
+            return
+        if len(source) > config.RULE_PATTERN_MAX_LENGTH:
+            self._skip("replacements", index, source, "パターンが長すぎます")
+            return
+        if rule.get("isRegex"):
+            reason = check_pattern(source)
+            if reason and reason.startswith("無効な正規表現"):
+                # 無効な正規表現は文字列として扱う（Electron側と同じ）
+                pattern = re.escape(source)
+            elif reason:
+                self._skip("replacements", index, source, reason)
+                return
+            else:
+                pattern = source
+        else:
+            pattern = re.escape(source)
+        self._replacements.append((re.compile(pattern, re.IGNORECASE), _js_replacement(target)))
+
+    def blocked_by(self, log: dict):
+        """一致した読ませない通知のルールの番号（一致しない場合はNone）"""
+        for index, matchers in self._blocked:
+            # 設定されたすべての項目が一致する必要がある（AND条件）
+            if all(matcher.matches(log.get(log_key) or "") for log_key, matcher in matchers):
+                return index
+        return None
+
+    def apply_replacements(self, text: str) -> str:
+        """変換リストを順に適用する（大文字小文字を区別しない）"""
+        for pattern, replacement in self._replacements:
+            text = pattern.sub(replacement, text)
+        return text
+
+
+# =================================================
+# dry_run
+# =================================================
+def dry_run(notifications: list, settings: dict = None) -> dict:
+    """
+    通知のリストにルールを適用した結果を返す（読み上げエンジンは使用しない）
+
+    Args:
+        notifications: 通知の辞書のリスト（app, app_id, title, text。notification_id は結果にそのまま含める）
+        settings: Electron側の設定（blockedApps, replacements, speechTemplate など）
+
+    Returns:
+        {
+            "results": [{"index", "notification_id", "blocked", "blocked_by", "text", "timings_ms"}],
+            "summary": {"count", "blocked", "elapsed_ms", "per_second", "stage_ms", "skipped_rules"},
+        }
+        text は実際に読み上げるテキスト（テンプレート・変換リスト・正規化・片仮名変換の後）
+    """
+    started = time.perf_counter()
+    rules = SpeechRules(settings)
+    notifications = list(notifications or [])[:config.DRY_RUN_MAX_NOTIFICATIONS]
+    stage_totals = dict.fromkeys(STAGES, 0.0)
+    # 同じテキストの片仮名変換は1回だけ行う（履歴には同じ通知が繰り返し含まれることが多い）
+    katakana_cache = {}
+    results = []
+    blocked_count = 0
+    clock = time.perf_counter
+
+    # 1件ごとのdebugログを出力すると数千件で大幅に遅くなるため、このスレッドでは抑止する
+    with debug_logs_suppressed():
+        for index, log in enumerate(notifications):
+            if not isinstance(log, dict):
+                log = {}
+            timings = {}
+
+            t0 = clock()
+            blocked_by = rules.blocked_by(log)
+            t1 = clock()
+            timings["block"] = t1 - t0
+            if blocked_by is not None:
+                blocked_count += 1
+                results.append(_dry_run_result(index, log, blocked_by, "", timings))
+                stage_totals["block"] += timings["block"]
+                continue
+
+            text = render_speech_template(log, rules.template)
+            t2 = clock()
+            text = rules.apply_replacements(text)
+            t3 = clock()
+            text = normalize_speech_text(
+                text,
+                consecutive_min_length=rules.consecutive_min_length,
+                max_length=rules.max_length,
+            ) or config.SPEECH_EMPTY_NOTIFICATION_TEXT
+            t4 = clock()
+            # speak_text と同じく、正規化したテキストの英語を片仮名に変換する
+            speech_text = katakana_cache.get(text)
+            if speech_text is None:
+                speech_text = convert_english_to_katakana(text)
+                katakana_cache[text] = speech_text
+            t5 = clock()
+
+            timings.update(template=t2 - t1, replacements=t3 - t2, normalize=t4 - t3, katakana=t5 - t4)
+            for stage, seconds in timings.items():
+                stage_totals[stage] += seconds
+            results.append(_dry_run_result(index, log, None, speech_text, timings))
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "count": len(results),
+        "blocked": blocked_count,
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "per_second": round(len(results) / elapsed) if elapsed > 0 else None,
+        "stage_ms": {stage: round(seconds * 1000, 1) for stage, seconds in stage_totals.items()},
+        "skipped_rules": rules.skipped,
+        "e2k_available": bool(config.E2K_AVAILABLE),
+    }
+    log_debug(
+        f"dry_run: {summary['count']}件（うち読ませない通知 {blocked_count}件）, "
+        f"{summary['elapsed_ms']}ms, 使用しないルール {len(rules.skipped)}件"
+    )
+    return {"results": results, "summary": summary}
+
+
+def _dry_run_result(index: int, log: dict, blocked_by, text: str, timings: dict) -> dict:
+    return {
+        "index": index,
+        "notification_id": log.get("notification_id"),
+        "blocked": blocked_by is not None,
+        "blocked_by": blocked_by,
+        "text": text,
+        "timings_ms": {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()},
+    }
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+# speech_thread.py
+# 読み上げエンジンを所有する専用スレッド（COMのシングルスレッドアパートメント）
+#
+# SpVoiceなどのCOMオブジェクトは作成したスレッドのアパートメント（STA）に属し、
+# 別のスレッドから呼び出すとマーシャリングされて遅くなる（アパートメント違反の原因にもなる）。
+# そのため、エンジンの作成・呼び出し・解放はすべてこのスレッドで行う。
+#
+#   - スレッドは最初の使用時に1つだけ起動し、COMを1度だけ初期化する
+#   - 処理はスレッドセーフなキューで受け取り、順番に実行する
+#   - 結果はイベントループの asyncio.Future に call_soon_threadsafe で返す
+#
+# 使い方:
+#     speaker = await get_speech_thread().run(create_speaker, volume, voice_name, rate)
+#     await get_speech_thread().run(speaker.speak, text)
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future as ThreadFuture
+
+from logger import log_debug, log_error
+from metrics import register_metrics_provider
+from tts_engine import com_initialized, pythoncom
+
+# 処理の待機中にCOMのメッセージを処理する間隔（秒）
+# STAのスレッドはウィンドウメッセージを処理しないと、COMからのコールバックが届かない
+MESSAGE_PUMP_INTERVAL = 0.05
+
+# スレッドを終了させるための番兵
+_STOP = object()
+
+
+def _resolve_future(future: asyncio.Future, result, error):
+    """イベントループのスレッドで asyncio.Future に結果を設定する"""
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class SpeechThread:
+    """
+    読み上げエンジンを所有する専用スレッド
+
+    run() はイベントループから、call() はその他のスレッドから使う。
+    どちらも処理はこのスレッドで順番に実行される
+    """
+
+    def __init__(self, name: str = "speech-sta"):
+        self.name = name
+        self._commands = queue.Queue()
+        self._thread = None
+        self._thread_id = None
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+    # ---------- スレッドの起動・停止 ----------
+    def start(self):
+        """スレッドを起動する（起動済みの場合は何もしない）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        register_metrics_provider("speech_thread", self.snapshot)
+
+    def stop(self, timeout: float = 5.0):
+        """キューに残っている処理を実行した後、スレッドを終了する"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._commands.put(_STOP)
+        thread.join(timeout)
+        self._thread = None
+
+    def in_thread(self) -> bool:
+        """現在のスレッドがこのスレッドの場合はTrue"""
+        return threading.get_ident() == self._thread_id
+
+    # ---------- 処理の依頼 ----------
+    def run(self, func, *args) -> asyncio.Future:
+        """
+        func(*args) をこのスレッドで実行する（イベントループから呼び出す）
+
+        Returns:
+            結果（または例外）が設定される asyncio.Future。
+            awaitをキャンセルしても、実行を始めた処理は最後まで実行される
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def deliver(result, error):
+            try:
+                loop.call_soon_threadsafe(_resolve_future, future, result, error)
+            except RuntimeError:
+                # イベントループが終了している
+                pass
+
+        self._submit(func, args, deliver)
+        return future
+
+    def call(self, func, *args, timeout: float = None):
+        """
+        func(*args) をこのスレッドで実行し、完了を待って結果を返す（イベントループ以外のスレッドから呼び出す）
+        このスレッド自身から呼び出した場合は、キューを通さずにその場で実行する
+        """
+        if self.in_thread():
+            return func(*args)
+        future = ThreadFuture()
+
+        def deliver(result, error):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        self._submit(func, args, deliver)
+        return future.result(timeout)
+
+    def submit(self, func, *args):
+        """func(*args) をこのスレッドで実行する（完了を待たない。エラーはログに出力する）"""
+        def deliver(_result, error):
+            if error is not None:
+                log_error(f"speech_thread: {getattr(func, '__qualname__', func)} でエラー: {error}")
+
+        self._submit(func, args, deliver)
+
+    def _submit(self, func, args: tuple, deliver):
+        self.start()
+        self._commands.put((func, args, deliver))
+
+    # ---------- スレッド側 ----------
+    def _run(self):
+        self._thread_id = threading.get_ident()
+        log_debug(f"speech_thread: 読み上げスレッドを開始しました（COM: {'STA' if pythoncom else 'なし'}）")
+        with com_initialized():
+            while True:
+                command = self._next_command()
+                if command is _STOP:
+                    break
+                self._execute(*command)
+        log_debug("speech_thread: 読み上げスレッドを終了しました")
+
+    def _next_command(self):
+        """次の処理を取り出す（待っている間はCOMのメッセージを処理する）"""
+        if pythoncom is None:
+            return self._commands.get()
+        while True:
+            try:
+                return self._commands.get(timeout=MESSAGE_PUMP_INTERVAL)
+            except queue.Empty:
+                pythoncom.PumpWaitingMessages()
+
+    def _execute(self, func, args: tuple, deliver):
+        start = time.perf_counter()
+        result = error = None
+        try:
+            result = func(*args)
+            self.completed += 1
+        except BaseException as e:
+            error = e
+            self.failed += 1
+        self.busy_seconds += time.perf_counter() - start
+        try:
+            deliver(result, error)
+        except Exception as e:
+            log_error(f"speech_thread: 結果の受け渡しに失敗しました: {e}")
+
+    # ---------- メトリクス ----------
+    def snapshot(self) -> dict:
+        """処理件数と待ち件数（metricsメッセージ用）"""
+        return {
+            "alive": self._thread is not None and self._thread.is_alive(),
+            "pending": self._commands.qsize(),
+            "completed": self.completed,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 1),
+        }
+
+
+# 読み上げスレッド（プロセスごとに1つ）
+_speech_thread = None
+_speech_thread_lock = threading.Lock()
+
+
+def get_speech_thread() -> SpeechThread:
+    """読み上げスレッドを取得する（スレッドは最初の処理の依頼時に起動する）"""
+    global _speech_thread
+    with _speech_thread_lock:
+        if _speech_thread is None:
+            _speech_thread = SpeechThread()
+        return _speech_thread
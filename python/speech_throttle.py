@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+# speech_throttle.py
+# 読み上げの流量制限（アプリごとのトークンバケット + 全体の読み上げ秒数の上限）
+#
+# 1つのアプリが通知を出し続けても読み上げを占有しないよう、app_idごとに
+# 読み上げられる件数を制限する。さらに直近1分間の読み上げ秒数の合計にも上限を設ける。
+# 上限を超えた通知は読み上げずに件数だけ数え、一定間隔で要約を読み上げる
+
+import time
+from collections import Counter, deque
+
+import config
+from logger import log_debug, log_error
+
+# 全体の読み上げ秒数を集計する期間（秒）
+GLOBAL_WINDOW_SECONDS = 60.0
+
+
+def estimate_speech_seconds(text: str, rate: int = 0) -> float:
+    """読み上げにかかる秒数を文字数から推定する（SAPIの速度±10はおよそ3倍速〜1/3倍速）"""
+    return len(text) / config.SPOKEN_CHARS_PER_SECOND / (3 ** (rate / 10))
+
+
+class TokenBucket:
+    """
+    トークンバケット
+    capacity 件まで連続で通し、その後は1分あたり per_minute 件の割合で回復する
+    """
+
+    def __init__(self, capacity: float, per_minute: float, now: float = None):
+        self.capacity = float(capacity)
+        self.per_minute = float(per_minute)
+        self.tokens = self.capacity
+        self.updated = now if now is not None else time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.per_minute / 60.0)
+        self.updated = now
+
+    def take(self, now: float = None) -> bool:
+        """トークンを1つ消費する（残っていない場合はFalse）"""
+        self._refill(now if now is not None else time.monotonic())
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+    def reconfigure(self, capacity: float, per_minute: float):
+        """容量と回復速度を変更する（残りのトークンは新しい容量までに切り詰める）"""
+        self.capacity = float(capacity)
+        self.per_minute = float(per_minute)
+        self.tokens = min(self.tokens, self.capacity)
+
+    def state(self, now: float = None) -> dict:
+        self._refill(now if now is not None else time.monotonic())
+        return {
+            "tokens": round(self.tokens, 2),
+            "capacity": self.capacity,
+            "per_minute": self.per_minute,
+        }
+
+
+class SpeechThrottle:
+    """
+    読み上げの流量制限
+
+    app_id のない読み上げ（手動の読み上げ、音声変更のお知らせ、省略件数の要約など）は
+    制限しないが、読み上げた秒数は全体の上限の集計に含める
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._spoken = deque()  # [読み上げ終了時刻（1秒単位）, その1秒間に終わった読み上げの秒数]
+        self._spoken_seconds = 0.0
+        self._suppressed = Counter()  # 要約をまだ読み上げていない省略件数（app_idごと）
+        self._suppressed_total = Counter()  # 起動からの省略件数（app_idごと）
+        self._first_suppressed_at = None
+
+    # ---------- 設定 ----------
+    def _limits_for(self, app_id: str) -> tuple:
+        override = config.THROTTLE_APP_OVERRIDES.get(app_id) or {}
+        return (
+            override.get("capacity", config.THROTTLE_APP_CAPACITY),
+            override.get("per_minute", config.THROTTLE_APP_PER_MINUTE),
+        )
+
+    def _bucket(self, app_id: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(app_id)
+        if bucket is None:
+            bucket = TokenBucket(*self._limits_for(app_id), now=now)
+            self._buckets[app_id] = bucket
+        return bucket
+
+    def apply_limits(self):
+        """設定の変更を既存のバケットに反映する"""
+        for app_id, bucket in self._buckets.items():
+            bucket.reconfigure(*self._limits_for(app_id))
+
+    # ---------- 判定 ----------
+    def _global_seconds(self, now: float) -> float:
+        """直近 GLOBAL_WINDOW_SECONDS 秒間に読み上げた秒数"""
+        while self._spoken and self._spoken[0][0] <= now - GLOBAL_WINDOW_SECONDS:
+            _, seconds = self._spoken.popleft()
+            self._spoken_seconds -= seconds
+        return max(0.0, self._spoken_seconds)
+
+    def admit(self, app_id: str, estimated_seconds: float, now: float = None) -> bool:
+        """
+        読み上げてよいか判定する（読み上げない場合は省略件数に数える）
+
+        Args:
+            app_id: 通知元のアプリID（空の場合は常に読み上げる）
+            estimated_seconds: 読み上げにかかる推定秒数
+        """
+        if not config.THROTTLE_ENABLED or not app_id:
+            return True
+        now = now if now is not None else time.monotonic()
+
+        budget = config.THROTTLE_GLOBAL_SECONDS_PER_MINUTE
+        if budget > 0 and self._global_seconds(now) + estimated_seconds > budget:
+            self._suppress(app_id, now, "1分あたりの読み上げ秒数の上限")
+            return False
+
+        if not self._bucket(app_id, now).take(now):
+            self._suppress(app_id, now, "アプリごとの読み上げ件数の上限")
+            return False
+        return True
+
+    def _suppress(self, app_id: str, now: float, reason: str):
+        if not self._suppressed:
+            self._first_suppressed_at = now
+        self._suppressed[app_id] += 1
+        self._suppressed_total[app_id] += 1
+        log_debug(f"speech_throttle: {reason}に達したため読み上げを省略しました: app_id={app_id}")
+
+    def record_spoken(self, seconds: float, now: float = None):
+        """読み上げた秒数を記録する"""
+        now = now if now is not None else time.monotonic()
+        # 1秒単位にまとめて記録する（読み上げが多くても記録は集計期間の秒数分まで）
+        second = int(now)
+        if self._spoken and self._spoken[-1][0] == second:
+            self._spoken[-1][1] += seconds
+        else:
+            self._spoken.append([second, seconds])
+        self._spoken_seconds += seconds
+        # 集計期間を過ぎた記録を捨てる（流量制限が無効の間も記録がたまり続けないように）
+        self._global_seconds(now)
+
+    # ---------- 要約 ----------
+    def summary_due_in(self, now: float = None):
+        """次の要約までの秒数（省略した通知がない場合はNone）"""
+        if not self._suppressed:
+            return None
+        now = now if now is not None else time.monotonic()
+        return max(0.0, self._first_suppressed_at + config.THROTTLE_SUMMARY_INTERVAL - now)
+
+    def take_summary(self, now: float = None) -> int:
+        """要約の時刻になっていれば省略件数を返してリセットする（それ以外は0）"""
+        due_in = self.summary_due_in(now)
+        if due_in is None or due_in > 0:
+            return 0
+        count = sum(self._suppressed.values())
+        self._suppressed.clear()
+        self._first_suppressed_at = None
+        return count
+
+    # ---------- メトリクス ----------
+    def snapshot(self, now: float = None) -> dict:
+        """バケットの状態と省略件数"""
+        now = now if now is not None else time.monotonic()
+        return {
+            "enabled": config.THROTTLE_ENABLED,
+            "global_seconds_last_minute": round(self._global_seconds(now), 1),
+            "global_seconds_per_minute": config.THROTTLE_GLOBAL_SECONDS_PER_MINUTE,
+            "pending_summary": sum(self._suppressed.values()),
+            "apps": {
+                app_id: {**bucket.state(now), "suppressed": self._suppressed_total.get(app_id, 0)}
+                for app_id, bucket in self._buckets.items()
+            },
+        }
+
+
+# 読み上げの流量制限（プロセスごとに1つ）
+_speech_throttle = None
+
+
+def get_speech_throttle() -> SpeechThrottle:
+    """読み上げの流量制限を取得する（初回呼び出し時に作成）"""
+    global _speech_throttle
+    if _speech_throttle is None:
+        _speech_throttle = SpeechThrottle()
+    return _speech_throttle
+
+
+def apply_throttle_settings(msg: dict):
+    """
+    流量制限の設定を反映する（stdinの set_throttle）
+
+    Args:
+        msg: 以下を含む辞書（省略した項目は変更しない）
+            - enabled: 有効/無効
+            - global_seconds_per_minute: 1分あたりの読み上げ秒数の上限（0で無効）
+            - capacity, per_minute: アプリごとの上限の既定値
+            - apps: {app_id: {"capacity": 件数, "per_minute": 件数}}（値がnullの場合は既定値に戻す）
+    """
+    try:
+        if "enabled" in msg:
+            config.THROTTLE_ENABLED = bool(msg["enabled"])
+        if "global_seconds_per_minute" in msg:
+            config.THROTTLE_GLOBAL_SECONDS_PER_MINUTE = max(0.0, float(msg["global_seconds_per_minute"]))
+        if "capacity" in msg:
+            config.THROTTLE_APP_CAPACITY = max(1, int(msg["capacity"]))
+        if "per_minute" in msg:
+            config.THROTTLE_APP_PER_MINUTE = max(0.0, float(msg["per_minute"]))
+        for app_id, limits in (msg.get("apps") or {}).items():
+            if limits is None:
+                config.THROTTLE_APP_OVERRIDES.pop(app_id, None)
+                continue
+            override = dict(config.THROTTLE_APP_OVERRIDES.get(app_id) or {})
+            if "capacity" in limits:
+                override["capacity"] = max(1, int(limits["capacity"]))
+            if "per_minute" in limits:
+                override["per_minute"] = max(0.0, float(limits["per_minute"]))
+            config.THROTTLE_APP_OVERRIDES[app_id] = override
+        get_speech_throttle().apply_limits()
+        log_debug(
+            f"流量制限: 有効={config.THROTTLE_ENABLED}, "
+            f"全体={config.THROTTLE_GLOBAL_SECONDS_PER_MINUTE}秒/分, "
+            f"アプリごと={config.THROTTLE_APP_CAPACITY}件 + {config.THROTTLE_APP_PER_MINUTE}件/分, "
+            f"個別設定={config.THROTTLE_APP_OVERRIDES}"
+        )
+    except Exception as e:
+        log_error(f"流量制限の設定エラー: {e}")
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# startup.py
+# 起動処理の依存関係グラフ（独立した処理を並行実行し、所要時間を記録する）
+
+import asyncio
+import time
+
+from logger import log_error
+
+
+class StartupGraph:
+    """
+    起動フェーズを依存関係付きで登録し、依存関係のないフェーズを並行実行する
+
+    - blocking=True のフェーズは別スレッドで実行し、イベントループを止めない
+    - 各フェーズの関数には、依存するフェーズの結果が deps の順に引数として渡される
+    - フェーズで例外が発生した場合は結果をNoneとして記録し、後続のフェーズは続行する
+
+    Examples:
+        >>> graph = StartupGraph()
+        >>> graph.add("voices", get_available_voices, blocking=True)
+        >>> graph.add("listener", get_listener)
+        >>> graph.add("past", get_past_notifications, deps=("listener",))
+        >>> results = await graph.run()
+    """
+
+    def __init__(self, origin: float = None):
+        """
+        Args:
+            origin: 経過時間の基準となる time.perf_counter() の値（Noneの場合はrun開始時刻）
+        """
+        self._phases = {}
+        self._timings = {}
+        self._origin = origin
+
+    def add(self, name: str, func, deps: tuple = (), blocking: bool = False):
+        """
+        フェーズを登録する
+
+        Args:
+            name: フェーズ名（startup_reportに出力される）
+            func: 実行する関数（blocking=Falseの場合はコルーチン関数）
+            deps: 先に完了している必要があるフェーズ名のタプル
+            blocking: 同期関数を別スレッドで実行する場合はTrue
+        """
+        for dep in deps:
+            if dep not in self._phases:
+                raise ValueError(f"未登録のフェーズに依存しています: {name} -> {dep}")
+        self._phases[name] = (func, tuple(deps), blocking)
+
+    def record(self, name: str, start: float, end: float, ok: bool = True):
+        """グラフ外で計測した区間（モジュールのimportなど）を記録する"""
+        self._timings[name] = (start, end, ok)
+
+    async def run(self) -> dict:
+        """
+        すべてのフェーズを実行する
+
+        Returns:
+            フェーズ名 -> 結果 の辞書
+        """
+        if self._origin is None:
+            self._origin = time.perf_counter()
+
+        tasks = {}
+        for name, (func, deps, blocking) in self._phases.items():
+            dep_tasks = [tasks[dep] for dep in deps]
+            tasks[name] = asyncio.create_task(self._run_phase(name, func, dep_tasks, blocking))
+
+        await asyncio.gather(*tasks.values())
+        return {name: task.result() for name, task in tasks.items()}
+
+    async def _run_phase(self, name: str, func, dep_tasks: list, blocking: bool):
+        """依存するフェーズの完了を待ってから1つのフェーズを実行する"""
+        args = [await task for task in dep_tasks]
+
+        start = time.perf_counter()
+        ok = True
+        try:
+            if blocking:
+                result = await asyncio.to_thread(func, *args)
+            else:
+                result = await func(*args)
+        except Exception as e:
+            log_error(f"起動フェーズ '{name}' でエラーが発生しました: {e}")
+            result = None
+            ok = False
+        self._timings[name] = (start, time.perf_counter(), ok)
+        return result
+
+    def report(self) -> dict:
+        """
+        startup_reportメッセージ用に各フェーズの所要時間をまとめる
+
+        Returns:
+            phases（開始時刻順のリスト）と total_ms を含む辞書
+        """
+        origin = self._origin or time.perf_counter()
+        phases = [
+            {
+                "name": name,
+                "start_ms": round((start - origin) * 1000, 1),
+                "duration_ms": round((end - start) * 1000, 1),
+                "ok": ok,
+            }
+            for name, (start, end, ok) in sorted(self._timings.items(), key=lambda item: item[1][0])
+        ]
+        end = max((end for _, end, _ in self._timings.values()), default=origin)
+        return {
+            "phases": phases,
+            "total_ms": round((end - origin) * 1000, 1),
+        }
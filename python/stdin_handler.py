@@ -5,71 +5,238 @@
 import json
 import sys
 import asyncio
-import pythoncom
+from concurrent.futures import ThreadPoolExecutor
 
 import config
-from logger import log_debug, log_error
-from sapi_speaker import speak_text, change_voice
+from logger import describe_message, log_debug, log_error, send_json
+from sapi_speaker import change_voice
+from history_store import get_history_store
+from pronunciation_dict import apply_pronunciation_settings
+from speech_rules import dry_run
+from speech_queue import enqueue_speech
+from speech_throttle import apply_throttle_settings
+from voice_profiles import apply_profile_settings
 
+# 読み上げルールの試行を実行するスレッド（数千件の試行中もstdinのコマンドを受け付けるため、
+# stdinを読み取るスレッドとは分ける。試行は1件ずつ順番に実行する）
+_dry_run_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dry-run")
 
-def blocking_read():
+
+def iter_stdin_messages():
+    """
+    stdinからJSONメッセージを1行ずつ読み取り、辞書として返すジェネレーター
+    JSONとして解釈できない行は読み飛ばす（EOFで終了）
+    """
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            msg = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+
+        if isinstance(msg, dict):
+            yield msg
+
+
+def handle_message(msg: dict):
+    """
+    stdinから受け取った1件のメッセージを処理する
+
+    Args:
+        msg: JSONメッセージを解釈した辞書
+    """
+    msg_type = msg.get("type")
+    log_debug(f"stdin受信: type={msg_type}, msg={describe_message(msg)}")
+
+    if msg_type == "speak":
+        # 手動読み上げリクエスト
+        text = msg.get("text", "")
+        log_debug(f"読み上げリクエスト: text={text}, main_loop={config.main_loop is not None}")
+        if text and config.main_loop:
+            log_debug(f"読み上げ待ちに追加: {text[:50]}...")
+            # short_text: 読み上げ待ちが多いときに代わりに読み上げる短いテキスト（省略可）
+            # normalize: 通知の場合のみ指定される正規化の設定（省略時は正規化しない）
+            enqueue_speech(
+                text,
+                short_text=msg.get("short_text", ""),
+                app_id=msg.get("app_id", ""),
+                normalize=msg.get("normalize"),
+            )
+        elif not text:
+            log_error("読み上げテキストが空です")
+        elif not config.main_loop:
+            log_error("main_loopがNoneです")
+
+    elif msg_type == "set_volume":
+        # 音量設定（同期処理）
+        volume = msg.get("volume", config.VOLUME_LEVEL)
+        try:
+            clamped_volume = max(config.VOLUME_MIN, min(config.VOLUME_MAX, int(volume)))
+            config.current_volume = clamped_volume
+            log_debug(f"音量設定: {clamped_volume}")
+        except Exception as e:
+            log_error(f"音量設定エラー: {e}")
+
+    elif msg_type == "set_latency_target":
+        # 遅延目標モードの設定（enabled: 有効/無効, deadline_seconds: 読み上げの期限）
+        apply_latency_target(msg)
+
+    elif msg_type == "set_throttle":
+        # 流量制限の設定（アプリごとの件数、1分あたりの読み上げ秒数）
+        # 読み上げキューと同じイベントループのスレッドで反映する
+        if config.main_loop:
+            config.main_loop.call_soon_threadsafe(apply_throttle_settings, msg)
+        else:
+            apply_throttle_settings(msg)
+
+    elif msg_type == "set_app_profiles":
+        # アプリごとの音声・音量・速度（apps: {app_id: {voice_name, volume, rate}}, replace）
+        # 読み上げキューと同じイベントループのスレッドで反映する
+        if config.main_loop:
+            config.main_loop.call_soon_threadsafe(apply_profile_settings, msg)
+        else:
+            apply_profile_settings(msg)
+
+    elif msg_type == "set_pronunciations":
+        # ユーザー辞書の登録（entries: {表記: 読み方}, replace, path）
+        # 英語→片仮名変換と同じイベントループのスレッドで反映する
+        if config.main_loop:
+            config.main_loop.call_soon_threadsafe(apply_pronunciation_settings, msg)
+        else:
+            apply_pronunciation_settings(msg)
+
+    elif msg_type == "set_voice":
+        # 音声設定（非同期処理）
+        voice_name = msg.get("voice_name", None)
+        # 空文字列の場合はNoneに変換（デフォルト音声を使用）
+        if voice_name == "":
+            voice_name = None
+        if config.main_loop:
+            log_debug(f"音声変更リクエスト: voice_name={voice_name or 'デフォルト（CeVIO）'}")
+            # メインスレッドで音声を変更する必要がある
+            asyncio.run_coroutine_threadsafe(change_voice(voice_name), config.main_loop)
+        elif not config.main_loop:
+            log_error("main_loopがNoneです")
+
+    elif msg_type == "history_query":
+        # 通知履歴の検索（1ページ分だけ返す）
+        handle_history_query(msg)
+
+    elif msg_type == "dry_run":
+        # 読み上げルールの試行（読み上げは行わない。結果は完了後に dry_run_result で送る）
+        submit_dry_run(msg)
+
+
+def handle_history_query(msg: dict):
+    """
+    通知履歴を検索し、結果を history_page メッセージとして送信する
+
+    Args:
+        msg: request_id（応答の照合用）、query（検索文字列）、app_id、cursor（前のページのnext_cursor）、limit を含む辞書
+    """
+    request_id = msg.get("request_id")
+    try:
+        page = get_history_store().query(
+            text=msg.get("query", ""),
+            app_id=msg.get("app_id", ""),
+            cursor=msg.get("cursor"),
+            limit=msg.get("limit"),
+        )
+    except Exception as e:
+        log_error(f"通知履歴の検索エラー: {e}")
+        page = {"items": [], "next_cursor": None, "error": str(e)}
+
+    send_json({
+        "type": "history_page",
+        "source": "toast_bridge",
+        "request_id": request_id,
+        # Falseの場合は新しい通知が保存されない（UIは受信した通知をメモリに保持する）
+        "enabled": config.HISTORY_ENABLED,
+        **page,
+    })
+
+
+def _load_history_for_dry_run(spec: dict) -> list:
+    """dry_run の対象にする通知を通知履歴から新しい順に取得する"""
+    store = get_history_store()
+    limit = max(1, min(config.DRY_RUN_MAX_NOTIFICATIONS, int(spec.get("limit") or config.DRY_RUN_MAX_NOTIFICATIONS)))
+    items = []
+    cursor = None
+    while len(items) < limit:
+        page = store.query(
+            text=spec.get("query", ""),
+            app_id=spec.get("app_id", ""),
+            cursor=cursor,
+            limit=min(config.HISTORY_PAGE_SIZE_MAX, limit - len(items)),
+        )
+        items.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    return items
+
+
+def handle_dry_run(msg: dict):
     """
-    stdinからJSONメッセージを読み取り、処理する
-    別スレッドで実行されるため、このスレッド内でCOMを初期化する必要がある
+    読み上げルールを通知に適用した結果を dry_run_result メッセージとして送信する（読み上げは行わない）
+
+    Args:
+        msg: 以下を含む辞書
+            - request_id: 応答の照合用
+            - settings: Electron側の設定（blockedApps, replacements, speechTemplate など）
+            - notifications: 試行する通知のリスト（省略時は history の条件で通知履歴から取得）
+            - history: {"query", "app_id", "limit"}（通知履歴から取得する場合）
     """
-    
-    pythoncom.CoInitialize()
+    request_id = msg.get("request_id")
     try:
-        for line in sys.stdin:
-            line = line.strip()
-            if not line:
-                continue
-            
-            try:
-                msg = json.loads(line)
-                msg_type = msg.get("type")
-                log_debug(f"stdin受信: type={msg_type}, msg={msg}")
-                
-                if msg_type == "speak":
-                    # 手動読み上げリクエスト
-                    text = msg.get("text", "")
-                    log_debug(f"読み上げリクエスト: text={text}, main_loop={config.main_loop is not None}")
-                    if text and config.main_loop:
-                        log_debug(f"読み上げ開始: {text[:50]}...")
-                        asyncio.run_coroutine_threadsafe(speak_text(text), config.main_loop)
-                    elif not text:
-                        log_error("読み上げテキストが空です")
-                    elif not config.main_loop:
-                        log_error("main_loopがNoneです")
-                
-                elif msg_type == "set_volume":
-                    # 音量設定（同期処理）
-                    volume = msg.get("volume", config.VOLUME_LEVEL)
-                    try:
-                        clamped_volume = max(config.VOLUME_MIN, min(config.VOLUME_MAX, int(volume)))
-                        config.current_volume = clamped_volume
-                        log_debug(f"音量設定: {clamped_volume}")
-                    except Exception as e:
-                        log_error(f"音量設定エラー: {e}")
-                
-                elif msg_type == "set_voice":
-                    # 音声設定（非同期処理）
-                    voice_name = msg.get("voice_name", None)
-                    # 空文字列の場合はNoneに変換（デフォルト音声を使用）
-                    if voice_name == "":
-                        voice_name = None
-                    if config.main_loop:
-                        log_debug(f"音声変更リクエスト: voice_name={voice_name or 'デフォルト（CeVIO）'}")
-                        # メインスレッドで音声を変更する必要がある
-                        asyncio.run_coroutine_threadsafe(change_voice(voice_name), config.main_loop)
-                    elif not config.main_loop:
-                        log_error("main_loopがNoneです")
-            
-            except json.JSONDecodeError:
-                continue
-    
-    finally:
-        pythoncom.CoUninitialize()
+        notifications = msg.get("notifications")
+        if notifications is None:
+            notifications = _load_history_for_dry_run(msg.get("history") or {})
+        result = dry_run(notifications, msg.get("settings") or {})
+    except Exception as e:
+        log_error(f"読み上げルールの試行エラー: {e}")
+        result = {"results": [], "summary": None, "error": str(e)}
+
+    send_json({
+        "type": "dry_run_result",
+        "source": "toast_bridge",
+        "request_id": request_id,
+        **result,
+    })
+
+
+def submit_dry_run(msg: dict):
+    """読み上げルールの試行を専用のスレッドで実行する（完了を待たない）"""
+    _dry_run_executor.submit(handle_dry_run, msg)
+
+
+def apply_latency_target(msg: dict):
+    """
+    遅延目標モードの設定を反映する
+
+    Args:
+        msg: enabled（bool）、deadline_seconds（秒）を含む辞書（省略した項目は変更しない）
+    """
+    try:
+        if "enabled" in msg:
+            config.LATENCY_TARGET_ENABLED = bool(msg["enabled"])
+        if "deadline_seconds" in msg:
+            config.LATENCY_DEADLINE_SECONDS = max(1.0, float(msg["deadline_seconds"]))
+        log_debug(f"遅延目標モード: 有効={config.LATENCY_TARGET_ENABLED}, 期限={config.LATENCY_DEADLINE_SECONDS}秒")
+    except Exception as e:
+        log_error(f"遅延目標モードの設定エラー: {e}")
+
+
+def blocking_read():
+    """
+    stdinからJSONメッセージを読み取り、処理する（別スレッドで実行）
+    COMの呼び出しは読み上げスレッド（speech_thread）で行うため、このスレッドではCOMを初期化しない
+    """
+    for msg in iter_stdin_messages():
+        handle_message(msg)
 
 
 async def stdin_loop():
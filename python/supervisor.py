@@ -0,0 +1,601 @@
+# -*- coding: utf-8 -*-
+# supervisor.py
+# マルチプロセスモード（supervisor + 通知監視プロセス + 読み上げプロセス）
+#
+# supervisor（親プロセス）がstdin/stdoutを担当し、通知監視と読み上げは
+# それぞれ別プロセスで実行する。COM呼び出しのハングや読み上げエンジンの
+# クラッシュが通知の取り込みに影響しないようにするため。
+#
+#   Electron --stdin--> supervisor --jobs--> 読み上げプロセス
+#   Electron <-stdout-- supervisor <-events-- 読み上げプロセス / 通知監視プロセス
+
+import asyncio
+import itertools
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from multiprocessing.connection import wait as wait_for_sentinels
+
+import config
+from logger import describe_message, log_debug, log_error, send_json, set_output_sink
+
+# 監視プロセスが通知へのアクセスを拒否された場合の終了コード（再起動しない）
+EXIT_CODE_FATAL = 2
+
+
+# =================================================
+# ワーカープロセス側
+# =================================================
+def _attach_output(events):
+    """send_jsonの出力をsupervisorへのイベントキューに切り替える"""
+    set_output_sink(lambda data: events.put(("out", data)))
+
+
+def _parent_alive() -> bool:
+    """親プロセス（supervisor）が生存しているか確認する"""
+    parent = multiprocessing.parent_process()
+    return parent is None or parent.is_alive()
+
+
+def _monitor_process_main(events, initial: bool):
+    """通知監視プロセスのエントリーポイント"""
+    _attach_output(events)
+    try:
+        asyncio.run(_monitor_main(initial))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _monitor_main(initial: bool):
+    """
+    通知監視プロセスのメイン処理
+
+    Args:
+        initial: 初回起動の場合はTrue（過去の通知と準備完了メッセージを送信する）
+    """
+    from loop_watchdog import loop_watchdog
+    from notification_monitor import get_listener, get_past_notifications, notification_loop
+
+    # 記録の作り直しは初回起動時のみ行う（監視プロセスの再起動では前回までの記録を使う）
+    if not initial:
+        config.SEEN_REBUILD = False
+
+    config.main_loop = asyncio.get_running_loop()
+    # WinRTの通知リスナーの呼び出しはこのプロセスのイベントループで行うため、停止をここでも監視する
+    watchdog = asyncio.create_task(loop_watchdog("通知監視プロセス"))
+    try:
+        listener = await get_listener()
+        if not listener:
+            sys.exit(EXIT_CODE_FATAL)
+
+        # 初回起動時は通知センターに残っている通知を「過去の通知」としてまとめて送信する（読み上げない）
+        processed_ids, past_notifications = await get_past_notifications(listener, send=initial)
+
+        if not initial:
+            _forward_missed_notifications(past_notifications)
+
+        if initial:
+            send_json({
+                "type": "ready",
+                "source": "toast_bridge",
+                "title": "お知らせ",
+                "text": "ToSpeak の起動を完了しました",
+                "timestamp": datetime.now().isoformat(),
+                "volume": config.VOLUME_LEVEL,
+            })
+
+        await notification_loop(listener, processed_ids)
+    finally:
+        watchdog.cancel()
+
+
+def _forward_missed_notifications(notifications: list):
+    """
+    監視プロセスの再起動までの間に届いた通知を、通常の通知として送信する（読み上げの対象にする）
+
+    Args:
+        notifications: get_past_notifications が返した未処理の通知
+            （再起動前に送信済みの通知は処理済みの通知の記録で除かれている）
+    """
+    if not notifications:
+        return
+    if not config.SEEN_STATE_ENABLED:
+        # 処理済みの通知の記録がない場合は、再起動前に送信済みの通知と区別できないため送信しない
+        log_debug(f"処理済みの通知の記録が無効のため、再起動中の通知 {len(notifications)}件 は送信しません")
+        return
+    log_debug(f"監視プロセスの再起動中に届いた通知 {len(notifications)}件 を送信します")
+    for notification in notifications:
+        send_json({"type": "notification", "source": "toast_bridge", **notification})
+
+
+def _speech_process_main(jobs, events, initial: bool):
+    """読み上げプロセスのエントリーポイント"""
+    _attach_output(events)
+    try:
+        asyncio.run(_speech_main(jobs, events, initial))
+    except KeyboardInterrupt:
+        pass
+
+
+def _get_job(jobs):
+    """
+    ジョブキューから次のジョブを取り出す（別スレッドで実行）
+    supervisorが終了した場合はNoneを返す
+    """
+    while True:
+        try:
+            return jobs.get(timeout=1.0)
+        except queue.Empty:
+            if not _parent_alive():
+                return None
+
+
+async def _speech_main(jobs, events, initial: bool):
+    """
+    読み上げプロセスのメイン処理
+    supervisorから届いたジョブを読み上げキューに追加し、1件ずつ読み上げる
+
+    Args:
+        jobs: supervisorからのジョブキュー
+        events: supervisorへのイベントキュー
+        initial: 初回起動の場合はTrue（利用可能な音声リストを送信する）
+    """
+    from sapi_speaker import get_available_voices_async, speak_text, change_voice
+    from loop_watchdog import loop_watchdog
+    from metrics import metrics_loop
+    from speech_queue import enqueue_speech, speech_worker_loop
+    from pronunciation_dict import apply_pronunciation_settings
+    from speech_throttle import apply_throttle_settings
+    from stdin_handler import apply_latency_target
+    from voice_profiles import apply_profile_settings
+
+    loop = asyncio.get_running_loop()
+    config.main_loop = loop
+
+    # e2kは最初の読み上げまでに別スレッドで読み込んでおく
+    loop.run_in_executor(None, config.load_e2k)
+
+    if initial:
+        available_voices = await get_available_voices_async()
+        send_json({
+            "type": "available_voices",
+            "source": "toast_bridge",
+            "voices": available_voices,
+            "timestamp": datetime.now().isoformat(),
+        })
+        log_debug(f"利用可能な音声数: {len(available_voices)}")
+
+    def on_start(utterance):
+        if utterance.job_id is not None:
+            events.put(("started", utterance.job_id))
+
+    def on_done(utterance):
+        if utterance.job_id is not None:
+            events.put(("done", utterance.job_id))
+
+    worker = asyncio.create_task(speech_worker_loop(speak_text, on_start=on_start, on_done=on_done))
+    # 読み上げキュー・流量制限の状態は読み上げプロセスにあるため、metricsはこのプロセスから送信する
+    metrics = asyncio.create_task(metrics_loop())
+    watchdog = asyncio.create_task(loop_watchdog("読み上げプロセス"))
+
+    while True:
+        job = await loop.run_in_executor(None, _get_job, jobs)
+        if job is None:
+            break
+
+        kind = job.get("kind")
+        if kind == "speak":
+            enqueue_speech(
+                job["text"],
+                short_text=job.get("short_text", ""),
+                app_id=job.get("app_id", ""),
+                job_id=job["job_id"],
+                normalize=job.get("normalize"),
+                enqueued_at=job.get("enqueued_at"),
+            )
+        elif kind == "set_volume":
+            config.current_volume = job["volume"]
+            log_debug(f"音量設定: {job['volume']}")
+        elif kind == "set_latency_target":
+            apply_latency_target(job)
+        elif kind == "set_throttle":
+            apply_throttle_settings(job)
+        elif kind == "set_pronunciations":
+            apply_pronunciation_settings(job)
+        elif kind == "set_app_profiles":
+            apply_profile_settings(job)
+        elif kind == "set_voice":
+            if job.get("announce"):
+                await change_voice(job["voice_name"])
+            else:
+                # 再起動時の状態復元（読み上げによる通知は行わない）
+                config.current_voice_name = job["voice_name"] or ""
+
+    worker.cancel()
+    metrics.cancel()
+    watchdog.cancel()
+
+
+# =================================================
+# supervisor側
+# =================================================
+class _WorkerHandle:
+    """ワーカープロセス1つ分の状態（プロセス、キュー、再起動の待機時間）"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.process = None
+        self.events = None
+        self.jobs = None
+        self.generation = 0
+        self.started_at = 0.0
+        self.backoff = config.WORKER_RESTART_BACKOFF_INITIAL
+        self.next_start_at = 0.0
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+
+class Supervisor:
+    """
+    通知監視プロセスと読み上げプロセスを起動・監視する
+
+    - クラッシュしたワーカーは指数バックオフで再起動する
+    - 読み上げ完了の通知を受け取るまでジョブを保持し、読み上げプロセスの
+      再起動時には未完了のジョブを新しいプロセスへ再送する
+    - 1件の読み上げがSPEECH_JOB_TIMEOUTを超えた場合はハングとみなして再起動する
+    """
+
+    def __init__(self):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._emit_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._fatal = False
+
+        self._monitor = _WorkerHandle("monitor")
+        self._speech = _WorkerHandle("speech")
+
+        # 未完了の読み上げジョブ（job_id -> job）。受信順を保持する
+        self._pending = OrderedDict()
+        self._job_ids = itertools.count(1)
+        self._in_flight = None  # (job_id, 開始時刻)
+
+        # 読み上げプロセス再起動時に復元する状態
+        self._volume = config.current_volume
+        self._voice_name = config.current_voice_name
+        self._latency_target = {}
+        self._throttle_settings = {}
+        # ユーザー辞書はsupervisorにも反映しておき（dry_run用）、再起動時はその内容をすべて送る
+        self._pronunciations_changed = False
+        self._app_profiles = {}  # app_id -> プロファイル（差分で届くため累積する）
+
+    # ---------- 起動・停止 ----------
+    def run(self) -> int:
+        """supervisorを実行する（stdinがEOFになるまで戻らない）"""
+        send_json({
+            "type": "info",
+            "source": "toast_bridge",
+            "title": "お知らせ",
+            "text": "ToSpeak の起動を準備中",
+            "timestamp": datetime.now().isoformat()
+        })
+        log_debug(f"Pythonバージョン: {sys.version}")
+        log_debug("マルチプロセスモードで起動します（通知監視・読み上げを別プロセスで実行）")
+
+        self._start_worker(self._speech)
+        self._start_worker(self._monitor)
+
+        reader = threading.Thread(target=self._read_stdin, name="stdin-reader", daemon=True)
+        reader.start()
+
+        try:
+            self._supervise()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._shutdown()
+
+        return 1 if self._fatal else 0
+
+    def _shutdown(self):
+        """ワーカーを停止する"""
+        self._stopping.set()
+        if self._speech.jobs is not None:
+            try:
+                self._speech.jobs.put(None)
+            except Exception:
+                pass
+
+        for handle in (self._monitor, self._speech):
+            if handle.process is None:
+                continue
+            handle.process.join(timeout=3)
+            if handle.process.is_alive():
+                handle.process.terminate()
+                handle.process.join(timeout=3)
+        log_debug("Toast Bridge: 終了しました")
+
+    def _start_worker(self, handle: _WorkerHandle):
+        """ワーカープロセスを起動する（再起動時は新しいキューを作成する）"""
+        initial = handle.generation == 0
+        handle.generation += 1
+        # 異常終了したプロセスが書き込み途中だった可能性があるため、キューは毎回作り直す
+        handle.events = self._ctx.Queue()
+
+        if handle is self._speech:
+            handle.jobs = self._ctx.Queue()
+            target = _speech_process_main
+            args = (handle.jobs, handle.events, initial)
+        else:
+            target = _monitor_process_main
+            args = (handle.events, initial)
+
+        handle.process = self._ctx.Process(
+            target=target,
+            args=args,
+            name=f"toast-bridge-{handle.name}",
+            daemon=True,
+        )
+        handle.process.start()
+        handle.started_at = time.monotonic()
+
+        threading.Thread(
+            target=self._pump_events,
+            args=(handle, handle.process, handle.events),
+            name=f"{handle.name}-events-{handle.generation}",
+            daemon=True,
+        ).start()
+
+        if handle is self._speech:
+            self._replay_speech_state(initial)
+
+        log_debug(f"supervisor: {handle.name}プロセスを起動しました (pid={handle.process.pid}, 世代={handle.generation})")
+
+    def _replay_speech_state(self, initial: bool):
+        """読み上げプロセスへ音量・音声の状態と未完了のジョブを送る"""
+        with self._lock:
+            self._in_flight = None
+            if not initial:
+                self._speech.jobs.put({"kind": "set_volume", "volume": self._volume})
+                self._speech.jobs.put({"kind": "set_voice", "voice_name": self._voice_name, "announce": False})
+                if self._latency_target:
+                    self._speech.jobs.put({"kind": "set_latency_target", **self._latency_target})
+                if self._throttle_settings:
+                    self._speech.jobs.put({"kind": "set_throttle", **self._throttle_settings})
+                if self._app_profiles:
+                    self._speech.jobs.put({"kind": "set_app_profiles", "apps": self._app_profiles, "replace": True})
+                if self._pronunciations_changed:
+                    from pronunciation_dict import get_pronunciation_dict
+                    self._speech.jobs.put({
+                        "kind": "set_pronunciations",
+                        "entries": get_pronunciation_dict().entries(),
+                        "replace": True,
+                    })
+                if self._pending:
+                    log_debug(f"supervisor: 未完了の読み上げ {len(self._pending)}件 を再送します")
+            for job in self._pending.values():
+                self._speech.jobs.put(job)
+
+    # ---------- 監視 ----------
+    def _supervise(self):
+        """ワーカーの終了を監視し、必要に応じて再起動する"""
+        while not self._stopping.is_set():
+            sentinels = [h.process.sentinel for h in (self._monitor, self._speech) if h.is_alive()]
+            if sentinels:
+                wait_for_sentinels(sentinels, timeout=0.5)
+            else:
+                time.sleep(0.5)
+
+            self._check_speech_hang()
+
+            for handle in (self._monitor, self._speech):
+                if self._stopping.is_set():
+                    break
+                if handle.is_alive():
+                    continue
+                self._handle_worker_exit(handle)
+
+    def _handle_worker_exit(self, handle: _WorkerHandle):
+        """終了したワーカーの再起動をスケジュールし、待機時間を過ぎていれば再起動する"""
+        now = time.monotonic()
+
+        if handle.next_start_at == 0.0:
+            exitcode = handle.process.exitcode
+            if handle is self._monitor and exitcode == EXIT_CODE_FATAL:
+                log_error("supervisor: 通知へのアクセスが拒否されたため終了します")
+                self._fatal = True
+                self._stopping.set()
+                return
+
+            # 読み上げ中にプロセスが終了した場合、そのジョブが原因の可能性があるため試行回数を数える
+            # （数えないと、クラッシュの原因になるジョブを再起動のたびに再送し続ける）
+            if handle is self._speech:
+                with self._lock:
+                    if self._in_flight is not None:
+                        self._count_failed_attempt(self._in_flight[0], "読み上げプロセスの異常終了")
+                        self._in_flight = None
+
+            # 一定時間以上動作していた場合は待機時間をリセット
+            if now - handle.started_at >= config.WORKER_STABLE_SECONDS:
+                handle.backoff = config.WORKER_RESTART_BACKOFF_INITIAL
+
+            handle.next_start_at = now + handle.backoff
+            log_error(f"supervisor: {handle.name}プロセスが終了しました (exitcode={exitcode})。{handle.backoff:.1f}秒後に再起動します")
+            handle.backoff = min(handle.backoff * 2, config.WORKER_RESTART_BACKOFF_MAX)
+
+        if now >= handle.next_start_at:
+            handle.next_start_at = 0.0
+            self._start_worker(handle)
+
+    def _check_speech_hang(self):
+        """読み上げ中のジョブがタイムアウトした場合、読み上げプロセスを停止する"""
+        with self._lock:
+            in_flight = self._in_flight
+            if in_flight is None:
+                return
+            job_id, started = in_flight
+            if time.monotonic() - started < config.SPEECH_JOB_TIMEOUT:
+                return
+
+            self._in_flight = None
+            self._count_failed_attempt(job_id, "タイムアウト")
+
+        log_error(f"supervisor: 読み上げが{config.SPEECH_JOB_TIMEOUT:.0f}秒を超えたため、読み上げプロセスを再起動します")
+        if self._speech.is_alive():
+            self._speech.process.terminate()
+
+    def _count_failed_attempt(self, job_id: int, reason: str):
+        """
+        読み上げ中に失敗したジョブの試行回数を数え、SPEECH_JOB_MAX_ATTEMPTS に達した場合は破棄する
+        （再送しても同じように失敗する可能性が高いため。self._lock を取得した状態で呼び出す）
+        """
+        job = self._pending.get(job_id)
+        if job is None:
+            return
+        job["attempts"] += 1
+        if job["attempts"] >= config.SPEECH_JOB_MAX_ATTEMPTS:
+            del self._pending[job_id]
+            log_error(f"supervisor: 読み上げが繰り返し失敗したため破棄します（{reason}）: {job['text'][:50]}...")
+
+    # ---------- イベント・stdin ----------
+    def _pump_events(self, handle: _WorkerHandle, process, events):
+        """ワーカーからのイベントを受け取り、stdoutへの出力やジョブ完了を処理する"""
+        while True:
+            try:
+                kind, payload = events.get(timeout=0.5)
+            except queue.Empty:
+                if not process.is_alive():
+                    break
+                continue
+            except (EOFError, OSError, ValueError):
+                break
+
+            if kind == "out":
+                with self._emit_lock:
+                    send_json(payload)
+            elif kind == "started":
+                with self._lock:
+                    self._in_flight = (payload, time.monotonic())
+            elif kind == "done":
+                with self._lock:
+                    self._pending.pop(payload, None)
+                    if self._in_flight and self._in_flight[0] == payload:
+                        self._in_flight = None
+
+    def _read_stdin(self):
+        """stdinを読み取り、ワーカーへ振り分ける（EOFで停止）"""
+        from stdin_handler import iter_stdin_messages
+
+        try:
+            for msg in iter_stdin_messages():
+                self.handle_message(msg)
+        finally:
+            self._stopping.set()
+
+    def _send_speech_job(self, job: dict):
+        """読み上げプロセスへジョブを送る（停止中の場合は再起動時に送られる）"""
+        if self._speech.jobs is not None and self._speech.is_alive():
+            self._speech.jobs.put(job)
+
+    def handle_message(self, msg: dict):
+        """
+        stdinから受け取った1件のメッセージを処理する
+
+        Args:
+            msg: JSONメッセージを解釈した辞書
+        """
+        msg_type = msg.get("type")
+        log_debug(f"stdin受信: type={msg_type}, msg={describe_message(msg)}")
+
+        if msg_type == "speak":
+            text = msg.get("text", "")
+            if not text:
+                log_error("読み上げテキストが空です")
+                return
+            with self._lock:
+                job_id = next(self._job_ids)
+                job = {
+                    "kind": "speak",
+                    "job_id": job_id,
+                    "text": text,
+                    "short_text": msg.get("short_text", ""),
+                    "app_id": msg.get("app_id", ""),
+                    "normalize": msg.get("normalize"),
+                    # time.monotonic()はプロセス間で共通のため、再送時も受付時刻から期限を判定できる
+                    "enqueued_at": time.monotonic(),
+                    "attempts": 0,
+                }
+                self._pending[job_id] = job
+                self._send_speech_job(job)
+
+        elif msg_type == "set_volume":
+            volume = msg.get("volume", config.VOLUME_LEVEL)
+            try:
+                clamped_volume = max(config.VOLUME_MIN, min(config.VOLUME_MAX, int(volume)))
+            except Exception as e:
+                log_error(f"音量設定エラー: {e}")
+                return
+            with self._lock:
+                self._volume = clamped_volume
+                self._send_speech_job({"kind": "set_volume", "volume": clamped_volume})
+
+        elif msg_type == "set_latency_target":
+            with self._lock:
+                self._latency_target.update({k: msg[k] for k in ("enabled", "deadline_seconds") if k in msg})
+                self._send_speech_job({"kind": "set_latency_target", **self._latency_target})
+
+        elif msg_type == "set_throttle":
+            settings = {k: v for k, v in msg.items() if k != "type"}
+            with self._lock:
+                # アプリごとの設定は差分で届くため、再起動時に復元できるよう累積する
+                apps = {**self._throttle_settings.get("apps", {}), **(settings.get("apps") or {})}
+                self._throttle_settings.update(settings)
+                if apps:
+                    self._throttle_settings["apps"] = apps
+                self._send_speech_job({"kind": "set_throttle", **settings})
+
+        elif msg_type == "set_app_profiles":
+            settings = {k: v for k, v in msg.items() if k != "type"}
+            with self._lock:
+                if settings.get("replace"):
+                    self._app_profiles = {}
+                for app_id, profile in (settings.get("apps") or {}).items():
+                    if profile is None:
+                        self._app_profiles.pop(app_id, None)
+                    else:
+                        self._app_profiles[app_id] = {**self._app_profiles.get(app_id, {}), **profile}
+                self._send_speech_job({"kind": "set_app_profiles", **settings})
+
+        elif msg_type == "set_pronunciations":
+            from pronunciation_dict import apply_pronunciation_settings
+            settings = {k: v for k, v in msg.items() if k != "type"}
+            with self._lock:
+                apply_pronunciation_settings(settings)
+                self._pronunciations_changed = True
+                self._send_speech_job({"kind": "set_pronunciations", **settings})
+
+        elif msg_type == "set_voice":
+            voice_name = msg.get("voice_name", None) or None
+            with self._lock:
+                self._voice_name = voice_name or ""
+                self._send_speech_job({"kind": "set_voice", "voice_name": voice_name, "announce": True})
+
+        elif msg_type == "history_query":
+            # 通知履歴は監視プロセスが書き込み、検索はsupervisorが別の接続で行う
+            from stdin_handler import handle_history_query
+            handle_history_query(msg)
+
+        elif msg_type == "dry_run":
+            # 読み上げルールの試行は読み上げエンジンを使わないため、supervisorで処理する
+            from stdin_handler import submit_dry_run
+            submit_dry_run(msg)
+
+
+def run_supervisor() -> int:
+    """マルチプロセスモードでブリッジを実行する"""
+    return Supervisor().run()
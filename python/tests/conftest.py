@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# conftest.py
+# Pythonブリッジのテストの共通設定（Windowsの読み上げエンジンを使わない純粋な処理のみを対象にする）
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 通知履歴・ユーザー辞書などのファイルは一時ディレクトリに置く（config の読み込み前に設定する）
+os.environ.setdefault("TOSPEAK_DATA_DIR", tempfile.mkdtemp(prefix="tospeak-test-"))
+
+# config は読み込み時に標準入出力をUTF-8のラッパーに置き換えるため、pytestの出力の取り込みと競合しないよう元に戻す
+# （置き換えたラッパーは破棄されると元のファイルを閉じるため、参照を保持しておく）
+_original_streams = (sys.stdin, sys.stdout, sys.stderr)
+import config  # noqa: E402,F401
+_config_streams = (sys.stdin, sys.stdout, sys.stderr)
+sys.stdin, sys.stdout, sys.stderr = _original_streams
+
+from logger import set_output_sink  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def discard_logs():
+    """ログ（stdoutへのJSON出力）を捨てる"""
+    set_output_sink(lambda _data: None)
+    yield
+    set_output_sink(None)
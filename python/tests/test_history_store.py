@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# test_history_store.py
+# 通知履歴（SQLite + FTS5 trigram）の保存・検索・カーソルによるページングのテスト
+
+import sqlite3
+
+import pytest
+
+import config
+from history_store import HistoryStore, _detect_fts_tokenizer
+
+
+def _trigram_available() -> bool:
+    conn = sqlite3.connect(":memory:")
+    try:
+        return _detect_fts_tokenizer(conn) == "trigram"
+    finally:
+        conn.close()
+
+
+# 通知履歴はFTS5 trigramを前提にするため、使用できないSQLiteではテストしない
+pytestmark = pytest.mark.skipif(not _trigram_available(), reason="SQLiteがFTS5 trigramに対応していません")
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # 書き込みをまとめる待ち時間を短くする
+    monkeypatch.setattr(config, "HISTORY_FLUSH_INTERVAL", 0.01)
+    history = HistoryStore(str(tmp_path / "history.sqlite3"))
+    yield history
+    history.close()
+
+
+def _add(store, count, app_id="app.a", start=0, **fields):
+    for n in range(start, start + count):
+        store.add({
+            "notification_id": f"{app_id}-{n}",
+            "app": fields.get("app", "Slack"),
+            "app_id": app_id,
+            "title": fields.get("title", f"タイトル{n}"),
+            "text": fields.get("text", f"本文{n}"),
+            "timestamp": f"2026-01-01T00:00:{n:02d}",
+        })
+    assert store.flush()
+
+
+def test_insert_and_query_newest_first(store):
+    _add(store, 3)
+    # 同じ通知IDは1件だけ保存する
+    _add(store, 1)
+    page = store.query()
+    assert store.fts_tokenizer == "trigram"
+    assert [item["title"] for item in page["items"]] == ["タイトル2", "タイトル1", "タイトル0"]
+    assert page["next_cursor"] is None
+    assert page["items"][0]["notification_id"] == "app.a-2"
+    assert store.count() == 3
+
+
+def test_paging_with_next_cursor(store):
+    _add(store, 7)
+    titles = []
+    cursor = None
+    pages = 0
+    while True:
+        page = store.query(cursor=cursor, limit=3)
+        titles.extend(item["title"] for item in page["items"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert pages == 3
+    assert titles == [f"タイトル{n}" for n in range(6, -1, -1)]
+
+
+def test_paging_last_page_exactly_full(store):
+    _add(store, 4)
+    first = store.query(limit=2)
+    second = store.query(cursor=first["next_cursor"], limit=2)
+    assert len(second["items"]) == 2
+    assert second["next_cursor"] is None
+
+
+def test_app_id_filter(store):
+    _add(store, 3, app_id="app.a")
+    _add(store, 4, app_id="app.b")
+    page = store.query(app_id="app.b", limit=3)
+    assert {item["app_id"] for item in page["items"]} == {"app.b"}
+    rest = store.query(app_id="app.b", cursor=page["next_cursor"], limit=3)
+    assert [item["notification_id"] for item in rest["items"]] == ["app.b-0"]
+    assert store.query(app_id="app.none")["items"] == []
+
+
+def test_full_text_search(store):
+    _add(store, 1, app_id="app.a", text="明日の会議の資料を共有しました")
+    _add(store, 1, app_id="app.b", start=1, text="ビルドが失敗しました")
+    _add(store, 1, app_id="app.b", start=2, text="会議室の予約が完了しました")
+
+    assert [item["notification_id"] for item in store.query("会議の資料")["items"]] == ["app.a-0"]
+    assert [item["notification_id"] for item in store.query("会議", app_id="app.b")["items"]] == ["app.b-2"]
+    # trigramで検索できない2文字以下は部分一致で検索する
+    assert {item["notification_id"] for item in store.query("会議")["items"]} == {"app.a-0", "app.b-2"}
+    # FTSの演算子・引用符は文字列として扱う
+    assert store.query('"会議" OR ビルド')["items"] == []
+
+
+def test_retention_max_entries(store, monkeypatch):
+    _add(store, 5)
+    monkeypatch.setattr(config, "HISTORY_RETENTION_DAYS", 0)
+    monkeypatch.setattr(config, "HISTORY_MAX_ENTRIES", 2)
+    assert store.apply_retention() == 3
+    assert [item["notification_id"] for item in store.query()["items"]] == ["app.a-4", "app.a-3"]
+    # 削除した履歴は全文検索の索引からも消える
+    assert store.query("本文0")["items"] == []
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# test_pronunciation_dict.py
+# ユーザー辞書（最長一致のトライ木）のテスト
+
+from pronunciation_dict import PronunciationDictionary, load_dictionary_file
+
+
+def _dictionary(**entries):
+    dictionary = PronunciationDictionary()
+    dictionary.update(entries)
+    return dictionary
+
+
+def test_longest_match():
+    dictionary = PronunciationDictionary()
+    dictionary.add("Visual Studio", "ビジュアルスタジオ")
+    dictionary.add("Visual Studio Code", "ビジュアルスタジオコード")
+    assert dictionary.split("Visual Studio Codeを起動") == [
+        ("Visual Studio Code", "ビジュアルスタジオコード"),
+        ("を起動", None),
+    ]
+    assert dictionary.split("Visual Studioを起動") == [
+        ("Visual Studio", "ビジュアルスタジオ"),
+        ("を起動", None),
+    ]
+
+
+def test_case_insensitive():
+    dictionary = _dictionary(GitHub="ギットハブ")
+    assert dictionary.split("github と GITHUB") == [
+        ("github", "ギットハブ"),
+        (" と ", None),
+        ("GITHUB", "ギットハブ"),
+    ]
+
+
+def test_case_insensitive_with_length_changing_characters():
+    # 「İ」は小文字にすると2文字になるが、その他の部分は大文字小文字を区別せずに一致する
+    dictionary = _dictionary(github="ギットハブ")
+    assert dictionary.split("İstanbul GitHub") == [("İstanbul ", None), ("GitHub", "ギットハブ")]
+
+
+def test_word_boundaries():
+    dictionary = _dictionary(Code="コード")
+    assert dictionary.split("Codex") == [("Codex", None)]
+    assert dictionary.split("VSCode") == [("VSCode", None)]
+    assert dictionary.split("Code、Codex") == [("Code", "コード"), ("、Codex", None)]
+    # 日本語との境界では一致する
+    assert dictionary.split("新しいCodeです") == [("新しい", None), ("Code", "コード"), ("です", None)]
+
+
+def test_japanese_surface_matches_inside_text():
+    dictionary = _dictionary(**{"東京都": "とうきょうと"})
+    assert dictionary.split("東京都庁") == [("東京都", "とうきょうと"), ("庁", None)]
+
+
+def test_no_match_and_empty():
+    dictionary = _dictionary(GitHub="ギットハブ")
+    assert dictionary.split("新しいメッセージ") == [("新しいメッセージ", None)]
+    assert dictionary.split("") == [("", None)]
+    assert PronunciationDictionary().split("GitHub") == [("GitHub", None)]
+
+
+def test_add_replaces_reading():
+    dictionary = _dictionary(GitHub="ギットハブ")
+    dictionary.add("github", "ギッハブ")
+    assert len(dictionary) == 1
+    assert dictionary.split("GitHub") == [("GitHub", "ギッハブ")]
+
+
+def test_remove_prunes_trie():
+    dictionary = PronunciationDictionary()
+    dictionary.add("Visual Studio", "ビジュアルスタジオ")
+    dictionary.add("Visual Studio Code", "ビジュアルスタジオコード")
+
+    assert dictionary.remove("Visual Studio Code")
+    assert not dictionary.remove("Visual Studio Code")
+    assert dictionary.split("Visual Studio Code") == [("Visual Studio", "ビジュアルスタジオ"), (" Code", None)]
+
+    assert dictionary.remove("visual studio")
+    assert len(dictionary) == 0
+    assert dictionary._root == {}
+
+
+def test_remove_keeps_shared_prefix():
+    dictionary = _dictionary(Git="ギット", GitHub="ギットハブ")
+    dictionary.remove("GitHub")
+    assert dictionary.split("Git GitHub") == [("Git", "ギット"), (" GitHub", None)]
+
+
+def test_update_removes_empty_readings():
+    dictionary = _dictionary(GitHub="ギットハブ", Slack="スラック")
+    dictionary.update({"GitHub": None, "Slack": ""})
+    assert dictionary.entries() == {}
+
+
+def test_load_dictionary_file(tmp_path):
+    path = tmp_path / "pronunciations.txt"
+    path.write_text("# コメント\nGitHub\tギットハブ\n\n不正な行\nVS Code\tブイエスコード\n", encoding="utf-8")
+    assert load_dictionary_file(str(path)) == {"GitHub": "ギットハブ", "VS Code": "ブイエスコード"}
+
+    json_path = tmp_path / "pronunciations.json"
+    json_path.write_text('{"GitHub": "ギットハブ", "空": ""}', encoding="utf-8")
+    assert load_dictionary_file(str(json_path)) == {"GitHub": "ギットハブ"}
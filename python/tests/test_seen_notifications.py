@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# test_seen_notifications.py
+# 処理済みの通知の記録（直近の通知ID・ブルームフィルターの世代・保存と読み込み）のテスト
+
+import json
+
+import pytest
+
+import config
+from seen_notifications import BloomFilter, SeenNotifications
+
+
+@pytest.fixture(autouse=True)
+def small_limits(monkeypatch):
+    monkeypatch.setattr(config, "SEEN_EXACT_MAX", 3)
+    monkeypatch.setattr(config, "SEEN_BLOOM_BITS", 1 << 12)
+    monkeypatch.setattr(config, "SEEN_BLOOM_CAPACITY", 4)
+
+
+def _data(n):
+    return {"app_id": "app.a", "title": f"タイトル{n}", "text": f"本文{n}"}
+
+
+def test_seen_recent():
+    seen = SeenNotifications()
+    seen.add(1, _data(1))
+    assert seen.seen_content(1, _data(1))
+    assert seen.seen_content("1", _data(1))
+    assert not seen.seen_content(2, _data(1))
+
+
+def test_recycled_id_with_different_content_is_not_seen():
+    # Windowsは通知IDを再利用する。直近の記録に同じIDがあっても内容が異なれば新しい通知
+    seen = SeenNotifications()
+    seen.add(1, _data(1))
+    assert not seen.seen_content(1, _data(2))
+    seen.add(1, _data(2))
+    assert seen.seen_content(1, _data(2))
+    assert not seen.seen_content(1, _data(1))
+
+
+def test_overflow_moves_to_bloom_filter():
+    seen = SeenNotifications()
+    for n in range(1, 5):
+        seen.add(n, _data(n))
+    # 最も古い通知はブルームフィルターへ移る（通知IDと内容のハッシュで確認する）
+    assert seen.seen_content(1, _data(1))
+    assert not seen.seen_content(1, _data(99))
+    assert seen.seen_content(4, _data(4))
+    assert len(seen) == 4  # 直近3件 + ブルームフィルターの1件
+
+
+def test_generation_rotation_forgets_oldest():
+    seen = SeenNotifications()
+    # 直近3件を超えた分がブルームフィルターへ（1世代に4件）
+    for n in range(1, 11):
+        seen.add(n, _data(n))
+    assert seen.seen_content(1, _data(1))
+    for n in range(11, 15):
+        seen.add(n, _data(n))
+    # 2世代前になった記録は忘れる
+    assert not seen.seen_content(1, _data(1))
+    assert seen.seen_content(8, _data(8))
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "seen.json")
+    seen = SeenNotifications(path)
+    for n in range(1, 6):
+        seen.add(n, _data(n))
+    seen.save()
+
+    loaded = SeenNotifications(path)
+    assert loaded.load()
+    assert loaded.seen_content(5, _data(5))
+    assert loaded.seen_content(1, _data(1))
+    assert not loaded.seen_content(6, _data(6))
+    assert list(loaded._recent) == ["3", "4", "5"]
+
+
+def test_load_missing_or_broken(tmp_path):
+    path = tmp_path / "seen.json"
+    assert not SeenNotifications(str(path)).load()
+    path.write_text(json.dumps({"version": 999}), encoding="utf-8")
+    assert not SeenNotifications(str(path)).load()
+    path.write_text("{壊れたファイル", encoding="utf-8")
+    seen = SeenNotifications(str(path))
+    assert not seen.load()
+    assert len(seen) == 0
+
+
+def test_bloom_filter_size_mismatch():
+    value = BloomFilter(64, 2).to_dict()
+    with pytest.raises(ValueError):
+        BloomFilter.from_dict(128, 2, value)
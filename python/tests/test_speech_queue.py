@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# test_speech_queue.py
+# 読み上げ待ちの件数に応じた速度・本文の省略（plan_utterance, shorten_for_backlog）と、追加時の通知の正規化のテスト
+
+import asyncio
+
+import pytest
+
+import config
+import speech_queue
+from speech_queue import Utterance, enqueue_speech, plan_utterance, shorten_for_backlog
+
+
+@pytest.fixture(autouse=True)
+def latency_settings(monkeypatch):
+    monkeypatch.setattr(config, "LATENCY_TARGET_ENABLED", True)
+    monkeypatch.setattr(config, "LATENCY_RATE_STEPS", ((2, 2), (4, 4), (6, 6)))
+    monkeypatch.setattr(config, "LATENCY_SHORTEN_BACKLOG", 6)
+    monkeypatch.setattr(config, "SAPI_RATE_DEFAULT", 0)
+    monkeypatch.setattr(config, "APP_VOICE_PROFILES", {})
+
+
+def test_shorten_uses_short_text():
+    utterance = Utterance(text="Slack、山田さん、明日の会議について", short_text="Slack、山田さん")
+    assert shorten_for_backlog(utterance) == "Slack、山田さん"
+
+
+def test_shorten_ignores_short_text_not_shorter():
+    # テンプレートに本文がない場合など、短いテキストが全文より短くない場合は全文を読み上げる
+    utterance = Utterance(text="山田さん", short_text="Slack、山田さん")
+    assert shorten_for_backlog(utterance) == "山田さん"
+    assert shorten_for_backlog(Utterance(text="Slack", short_text="Slack")) == "Slack"
+
+
+@pytest.mark.parametrize("text", [
+    "Slack、山田さん、明日の会議について",
+    # アプリ名・タイトルに「、」を含む場合や任意のテンプレートでも、推測して切り詰めない
+    "山田、佐藤、鈴木からのメッセージ",
+])
+def test_shorten_without_short_text_keeps_text(text):
+    assert shorten_for_backlog(Utterance(text=text)) == text
+
+
+@pytest.mark.parametrize("backlog, expected_rate", [(0, 0), (1, 0), (2, 2), (3, 2), (4, 4), (6, 6), (20, 6)])
+def test_rate_steps(backlog, expected_rate):
+    _, rate = plan_utterance(Utterance(text="本文"), backlog)
+    assert rate == expected_rate
+
+
+def test_shorten_only_above_threshold():
+    utterance = Utterance(text="Slack、山田さん、長い本文", short_text="Slack、山田さん")
+    assert plan_utterance(utterance, 5)[0] == "Slack、山田さん、長い本文"
+    assert plan_utterance(utterance, 6)[0] == "Slack、山田さん"
+
+
+def test_profile_rate_is_base(monkeypatch):
+    monkeypatch.setattr(config, "APP_VOICE_PROFILES", {"app.fast": {"rate": 5}, "app.slow": {"rate": -3}})
+    assert plan_utterance(Utterance(text="本文", app_id="app.fast"), 2)[1] == 5
+    assert plan_utterance(Utterance(text="本文", app_id="app.slow"), 2)[1] == 2
+    assert plan_utterance(Utterance(text="本文", app_id="app.slow"), 0)[1] == -3
+
+
+def test_rate_clamped(monkeypatch):
+    monkeypatch.setattr(config, "LATENCY_RATE_STEPS", ((1, 15),))
+    assert plan_utterance(Utterance(text="本文"), 1)[1] == config.SAPI_RATE_MAX
+
+
+def test_disabled_keeps_text_and_base_rate(monkeypatch):
+    monkeypatch.setattr(config, "LATENCY_TARGET_ENABLED", False)
+    utterance = Utterance(text="Slack、山田さん、本文", short_text="Slack、山田さん")
+    assert plan_utterance(utterance, 50) == ("Slack、山田さん、本文", 0)
+
+
+def _enqueue(monkeypatch, **kwargs):
+    """イベントループのスレッドから読み上げ待ちに追加し、追加された1件を返す"""
+    monkeypatch.setattr(speech_queue, "_speech_queue", None)
+
+    async def run():
+        monkeypatch.setattr(config, "main_loop", asyncio.get_running_loop(), raising=False)
+        enqueue_speech(**kwargs)
+        return speech_queue.get_speech_queue().get_nowait()
+
+    return asyncio.run(run())
+
+
+def test_enqueue_normalizes_notification_text(monkeypatch):
+    utterance = _enqueue(
+        monkeypatch,
+        text="Slack、、 詳細は https://example.com/a を参照ーーーーー",
+        short_text="Slack、、",
+        normalize={"consecutive_min_length": 4, "max_length": 0},
+    )
+    assert utterance.text == f"Slack、詳細は {config.SPEECH_URL_TEXT} を参照ーーー"
+    assert utterance.short_text == "Slack"
+
+
+def test_enqueue_empty_notification_text(monkeypatch):
+    utterance = _enqueue(monkeypatch, text="、、 ", normalize={})
+    assert utterance.text == config.SPEECH_EMPTY_NOTIFICATION_TEXT
+
+
+def test_enqueue_without_normalize_keeps_text(monkeypatch):
+    # 手動の読み上げ・音声変更のお知らせは正規化しない（URLや長い数字も変更しない）
+    text = "https://example.com/a 12345678 を読み上げ"
+    assert _enqueue(monkeypatch, text=text).text == text
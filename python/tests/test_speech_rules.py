@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# test_speech_rules.py
+# 読み上げルール（読ませない通知・変換リスト・正規表現の確認）と dry_run のテスト
+
+import re
+
+import pytest
+
+import config
+from speech_rules import SpeechRules, _js_replacement, check_pattern, dry_run
+
+
+@pytest.mark.parametrize("pattern", [r"\d+円", r"(foo|bar)baz", r"^Slack$", r"a+b*c?"])
+def test_check_pattern_accepts_safe(pattern):
+    assert check_pattern(pattern) is None
+
+
+@pytest.mark.parametrize("pattern, reason", [
+    (r"(a+)+$", "繰り返しが入れ子になっています"),
+    (r"(?:x*)*", "繰り返しが入れ子になっています"),
+    (r"(a|b+)+", "繰り返しが入れ子になっています"),
+    ("a+" * 30, "繰り返しが多すぎます"),
+    ("x" * 1001, "パターンが長すぎます"),
+])
+def test_check_pattern_rejects_dangerous(pattern, reason):
+    assert check_pattern(pattern) == reason
+
+
+def test_check_pattern_invalid():
+    assert check_pattern("(abc").startswith("無効な正規表現です")
+
+
+@pytest.mark.parametrize("template, text, expected", [
+    ("$1えん", "100円", "100えん"),
+    ("[$&]", "100円", "[100円]"),
+    ("$$1", "100円", "$1"),
+    ("$<num>えん", "100円", "100えん"),
+    ("$2", "100円", "$2"),  # 存在しないグループはそのまま
+    ("$10", "100円", "1000"),  # $10 が存在しない場合は $1 + "0"
+])
+def test_js_replacement(template, text, expected):
+    pattern = re.compile(r"(?P<num>\d+)円")
+    assert pattern.sub(_js_replacement(template), text) == expected
+
+
+def test_replacements_are_case_insensitive_and_ordered():
+    rules = SpeechRules({"replacements": [
+        {"from": "github", "to": "ギットハブ"},
+        {"from": "ギットハブ", "to": "ギットハブさん"},
+        {"from": "a.b", "to": "エービー"},  # 正規表現でない場合は文字列として扱う
+    ]})
+    assert rules.apply_replacements("GitHub axb a.b") == "ギットハブさん axb エービー"
+
+
+def test_dangerous_replacement_is_skipped():
+    rules = SpeechRules({"replacements": [{"from": "(a+)+$", "to": "x", "isRegex": True}]})
+    assert rules.apply_replacements("aaaa") == "aaaa"
+    assert [(rule["kind"], rule["index"]) for rule in rules.skipped] == [("replacements", 0)]
+
+
+def test_invalid_regex_replacement_is_literal():
+    rules = SpeechRules({"replacements": [{"from": "(笑", "to": "わら", "isRegex": True}]})
+    assert rules.apply_replacements("面白い(笑") == "面白いわら"
+    assert rules.skipped == []
+
+
+def test_blocked_by_requires_all_fields():
+    rules = SpeechRules({"blockedApps": [
+        {"app": "Slack", "title": "bot", "titleIsRegex": True},
+        {"app_id": "com.example.ads"},
+        {},  # 項目が設定されていないルールはブロックしない
+    ]})
+    assert rules.blocked_by({"app": "Slack", "title": "ci-bot"}) == 0
+    assert rules.blocked_by({"app": "Slack", "title": "山田"}) is None
+    assert rules.blocked_by({"app": "Slackbot", "title": "bot"}) is None
+    assert rules.blocked_by({"app_id": "com.example.ads"}) == 1
+    assert rules.blocked_by({}) is None
+
+
+def test_dry_run():
+    settings = {
+        "blockedApps": [{"app": "広告"}],
+        "replacements": [{"from": "山田", "to": "やまだ"}],
+        "speechTemplate": "{app}、{title}、{text}",
+    }
+    notifications = [
+        {"app": "スラック", "title": "山田", "text": "こんにちは", "notification_id": 7},
+        {"app": "広告", "title": "セール"},
+        "不正な通知",
+    ]
+    result = dry_run(notifications, settings)
+    results = result["results"]
+    assert results[0]["text"] == "スラック、やまだ、こんにちは"
+    assert results[0]["notification_id"] == 7
+    assert results[1]["blocked"] and results[1]["blocked_by"] == 0 and results[1]["text"] == ""
+    assert results[2]["text"] == "通知があります"
+    assert result["summary"]["count"] == 3
+    assert result["summary"]["blocked"] == 1
+    assert set(result["summary"]["stage_ms"]) == {"block", "template", "replacements", "normalize", "katakana"}
+
+
+def test_dry_run_limits_count(monkeypatch):
+    monkeypatch.setattr(config, "DRY_RUN_MAX_NOTIFICATIONS", 2)
+    assert dry_run([{"text": "本文"}] * 5)["summary"]["count"] == 2
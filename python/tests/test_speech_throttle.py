@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# test_speech_throttle.py
+# 読み上げの流量制限（トークンバケット・全体の読み上げ秒数の上限・省略件数の要約）のテスト
+
+import pytest
+
+import config
+from speech_throttle import SpeechThrottle, TokenBucket, apply_throttle_settings
+
+
+@pytest.fixture(autouse=True)
+def throttle_settings(monkeypatch):
+    monkeypatch.setattr(config, "THROTTLE_ENABLED", True)
+    monkeypatch.setattr(config, "THROTTLE_APP_CAPACITY", 3)
+    monkeypatch.setattr(config, "THROTTLE_APP_PER_MINUTE", 6.0)
+    monkeypatch.setattr(config, "THROTTLE_APP_OVERRIDES", {})
+    monkeypatch.setattr(config, "THROTTLE_GLOBAL_SECONDS_PER_MINUTE", 0.0)
+    monkeypatch.setattr(config, "THROTTLE_SUMMARY_INTERVAL", 30.0)
+
+
+def test_token_bucket_burst_and_refill():
+    bucket = TokenBucket(2, 6, now=0.0)
+    assert bucket.take(0.0)
+    assert bucket.take(0.0)
+    assert not bucket.take(0.0)
+    # 1分あたり6件 = 10秒で1件回復する
+    assert not bucket.take(9.0)
+    assert bucket.take(10.0)
+    # 容量を超えては回復しない
+    assert bucket.state(1000.0)["tokens"] == 2
+
+
+def test_token_bucket_reconfigure_truncates_tokens():
+    bucket = TokenBucket(5, 6, now=0.0)
+    bucket.reconfigure(2, 6)
+    assert bucket.state(0.0)["tokens"] == 2
+
+
+def test_admit_limits_each_app_separately():
+    throttle = SpeechThrottle()
+    assert [throttle.admit("app.a", 1.0, now=0.0) for _ in range(4)] == [True, True, True, False]
+    assert throttle.admit("app.b", 1.0, now=0.0)
+    # app_id のない読み上げは制限しない
+    assert throttle.admit("", 1.0, now=0.0)
+
+
+def test_admit_disabled(monkeypatch):
+    monkeypatch.setattr(config, "THROTTLE_ENABLED", False)
+    throttle = SpeechThrottle()
+    assert all(throttle.admit("app.a", 1.0, now=0.0) for _ in range(10))
+
+
+def test_app_override():
+    apply_throttle_settings({"apps": {"app.a": {"capacity": 1}}})
+    throttle = SpeechThrottle()
+    assert throttle.admit("app.a", 1.0, now=0.0)
+    assert not throttle.admit("app.a", 1.0, now=0.0)
+    assert throttle.admit("app.b", 1.0, now=0.0)
+
+
+def test_global_budget(monkeypatch):
+    monkeypatch.setattr(config, "THROTTLE_GLOBAL_SECONDS_PER_MINUTE", 10.0)
+    throttle = SpeechThrottle()
+    throttle.record_spoken(8.0, now=0.0)
+    assert not throttle.admit("app.a", 3.0, now=1.0)
+    assert throttle.admit("app.a", 2.0, now=1.0)
+    # 集計期間を過ぎた読み上げは上限に含めない
+    throttle.record_spoken(2.0, now=1.0)
+    assert throttle.admit("app.b", 5.0, now=61.0)
+
+
+def test_summary_after_interval():
+    throttle = SpeechThrottle()
+    for _ in range(5):
+        throttle.admit("app.a", 1.0, now=0.0)
+    assert throttle.summary_due_in(now=10.0) == 20.0
+    assert throttle.take_summary(now=10.0) == 0
+    assert throttle.take_summary(now=30.0) == 2
+    assert throttle.summary_due_in(now=30.0) is None
+    assert throttle.snapshot(now=30.0)["apps"]["app.a"]["suppressed"] == 2
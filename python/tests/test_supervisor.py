@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+# test_supervisor.py
+# 読み上げプロセスの異常終了時のジョブの再送と、通知監視プロセスの再起動時の通知の送信
+# （プロセスは起動せずに状態だけを確認する。WinRTの通知リスナーは偽物に置き換える）
+
+import asyncio
+import importlib
+import sys
+import time
+from types import ModuleType, SimpleNamespace
+
+import pytest
+
+import config
+import loop_watchdog
+import seen_notifications
+from logger import set_output_sink
+from seen_notifications import SeenNotifications
+from supervisor import Supervisor, _monitor_main
+
+
+def _make_supervisor(monkeypatch):
+    supervisor = Supervisor()
+    started = []
+    monkeypatch.setattr(supervisor, "_start_worker", lambda handle: started.append(handle.name))
+    handle = supervisor._speech
+    handle.process = SimpleNamespace(exitcode=1, is_alive=lambda: False)
+    handle.backoff = 0.0
+    handle.started_at = time.monotonic()
+    return supervisor, started
+
+
+def _crash_during(supervisor, job_id):
+    """job_id の読み上げ中に読み上げプロセスが終了した状態にして、終了を処理する"""
+    supervisor._in_flight = (job_id, time.monotonic())
+    supervisor._handle_worker_exit(supervisor._speech)
+
+
+def test_job_dropped_after_repeated_crashes(monkeypatch):
+    supervisor, started = _make_supervisor(monkeypatch)
+    supervisor._pending[1] = {"job_id": 1, "text": "クラッシュする通知", "attempts": 0}
+    supervisor._pending[2] = {"job_id": 2, "text": "次の通知", "attempts": 0}
+
+    for _ in range(config.SPEECH_JOB_MAX_ATTEMPTS - 1):
+        _crash_during(supervisor, 1)
+        assert 1 in supervisor._pending
+        assert supervisor._in_flight is None
+
+    _crash_during(supervisor, 1)
+    assert list(supervisor._pending) == [2]
+    assert supervisor._pending[2]["attempts"] == 0
+    assert started == ["speech"] * config.SPEECH_JOB_MAX_ATTEMPTS
+
+
+def test_exit_while_idle_keeps_pending_jobs(monkeypatch):
+    supervisor, started = _make_supervisor(monkeypatch)
+    supervisor._pending[1] = {"job_id": 1, "text": "通知", "attempts": 0}
+
+    supervisor._handle_worker_exit(supervisor._speech)
+
+    assert supervisor._pending[1]["attempts"] == 0
+    assert started == ["speech"]
+
+
+# =================================================
+# 通知監視プロセスの再起動
+# =================================================
+def _toast(notification_id, title, text, app="Slack"):
+    """UserNotification の偽物（_extract_notification_data が参照する属性のみ）"""
+    elements = [SimpleNamespace(text=title), SimpleNamespace(text=text)]
+    binding = SimpleNamespace(get_text_elements=lambda: elements)
+    return SimpleNamespace(
+        id=notification_id,
+        app_info=SimpleNamespace(display_info=SimpleNamespace(display_name=app), app_user_model_id=f"app.{app}"),
+        notification=SimpleNamespace(visual=SimpleNamespace(bindings=[binding])),
+    )
+
+
+@pytest.fixture
+def monitor(monkeypatch, tmp_path):
+    """winsdk を偽物に置き換えて notification_monitor を読み込み、送信したメッセージを集める"""
+    management = ModuleType("winsdk.windows.ui.notifications.management")
+    management.UserNotificationListener = None
+    management.UserNotificationListenerAccessStatus = SimpleNamespace(ALLOWED=1)
+    notifications = ModuleType("winsdk.windows.ui.notifications")
+    notifications.NotificationKinds = SimpleNamespace(TOAST=1)
+    for name in ("winsdk", "winsdk.windows", "winsdk.windows.ui"):
+        monkeypatch.setitem(sys.modules, name, ModuleType(name))
+    monkeypatch.setitem(sys.modules, "winsdk.windows.ui.notifications", notifications)
+    monkeypatch.setitem(sys.modules, "winsdk.windows.ui.notifications.management", management)
+    monkeypatch.delitem(sys.modules, "notification_monitor", raising=False)
+    module = importlib.import_module("notification_monitor")
+
+    toasts = []
+    listener = SimpleNamespace(get_notifications_async=lambda _kind: asyncio.sleep(0, result=list(toasts)))
+
+    async def get_listener():
+        return listener
+
+    async def notification_loop(_listener, _processed_ids):
+        return None
+
+    monkeypatch.setattr(module, "get_listener", get_listener)
+    monkeypatch.setattr(module, "notification_loop", notification_loop)
+    monkeypatch.setattr(module, "record_notification", lambda _log: None)
+    monkeypatch.setattr(config, "SEEN_STATE_ENABLED", True)
+    monkeypatch.setattr(config, "SEEN_REBUILD", False)
+    monkeypatch.setattr(config, "main_loop", None, raising=False)
+    seen = SeenNotifications(str(tmp_path / "seen.json"))
+    monkeypatch.setattr(seen_notifications, "_seen_notifications", seen)
+
+    sent = []
+    set_output_sink(sent.append)
+    return SimpleNamespace(toasts=toasts, seen=seen, sent=sent)
+
+
+def _sent_of_type(sent, message_type):
+    return [message for message in sent if message.get("type") == message_type]
+
+
+def test_restart_forwards_toast_that_arrived_while_down(monitor):
+    # 再起動前に送信済みの通知
+    monitor.toasts.append(_toast(1, "山田さん", "送信済み"))
+    monitor.seen.add(1, {"app": "Slack", "app_id": "app.Slack", "title": "山田さん", "text": "送信済み"})
+    # 監視プロセスが停止している間に届いた通知
+    monitor.toasts.append(_toast(2, "佐藤さん", "停止中に届いた通知"))
+
+    asyncio.run(_monitor_main(False))
+
+    forwarded = _sent_of_type(monitor.sent, "notification")
+    assert len(forwarded) == 1
+    assert forwarded[0]["notification_id"] == "2"
+    assert forwarded[0]["text"] == "停止中に届いた通知"
+    assert _sent_of_type(monitor.sent, "past_notifications") == []
+    assert _sent_of_type(monitor.sent, "ready") == []
+
+
+def test_initial_start_replays_silently(monitor):
+    monitor.toasts.append(_toast(1, "山田さん", "起動前の通知"))
+
+    asyncio.run(_monitor_main(True))
+
+    assert _sent_of_type(monitor.sent, "notification") == []
+    assert len(_sent_of_type(monitor.sent, "past_notifications")) == 1
+    assert len(_sent_of_type(monitor.sent, "ready")) == 1
+
+
+def test_monitor_runs_loop_watchdog(monitor, monkeypatch):
+    # 通知監視プロセスのイベントループ（WinRTの呼び出しを行う）も停止を監視する
+    labels = []
+    cancelled = []
+
+    async def fake_watchdog(label=""):
+        labels.append(label)
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            cancelled.append(label)
+            raise
+
+    monkeypatch.setattr(loop_watchdog, "loop_watchdog", fake_watchdog)
+
+    async def run():
+        await _monitor_main(False)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert labels == ["通知監視プロセス"]
+    assert cancelled == ["通知監視プロセス"]
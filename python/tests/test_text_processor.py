@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# test_text_processor.py
+# 読み上げテキストの正規化（normalize_speech_text）と、英単語の片仮名変換（キャッシュ・スレッド間の直列化）のテスト
+
+import threading
+import time
+
+import pytest
+
+import config
+from text_processor import _convert_single_english_word, _e2k_convert_word, normalize_speech_text
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("詳細は https://example.com/a?b=1 を参照", "詳細は URL省略 を参照"),
+    # URLの直後の日本語はURLに含めない
+    ("詳細はhttps://example.com/xをご覧ください", "詳細はURL省略をご覧ください"),
+    ("URL: https://a.jp/b。次へ", "URL: URL省略。次へ"),
+    ("www.example.com/path、確認してください", "URL省略、確認してください"),
+])
+def test_url(text, expected):
+    assert normalize_speech_text(text) == expected
+
+
+def test_separators():
+    assert normalize_speech_text("  新着メール\n\n件名:  テスト！！！ , , ") == "新着メール 件名: テスト！"
+    assert normalize_speech_text("A，B,,C、、D") == "A、B、C、D"
+    assert normalize_speech_text("、、先頭と末尾、、") == "先頭と末尾"
+
+
+def test_emoji_removed():
+    assert normalize_speech_text("完了🎉🎉 です👍🏻") == "完了 です"
+    assert normalize_speech_text("🎉") == ""
+
+
+def test_long_digits():
+    assert normalize_speech_text("注文番号 1234567890") == f"注文番号 {config.SPEECH_LONG_DIGIT_TEXT}"
+    assert normalize_speech_text("注文番号 1234567") == "注文番号 1234567"
+    assert normalize_speech_text("1234567890", long_digit_run=0) == "1234567890"
+
+
+def test_consecutive_chars():
+    assert normalize_speech_text("wwwwwwww", consecutive_min_length=4) == "www"
+    assert normalize_speech_text("www", consecutive_min_length=4) == "www"
+    assert normalize_speech_text("wwwwwwww") == "wwwwwwww"
+
+
+def test_max_length():
+    assert normalize_speech_text("あいうえおかきくけこ", max_length=5) == "あいうえお" + config.SPEECH_TRUNCATED_SUFFIX
+    assert normalize_speech_text("あいうえお", max_length=5) == "あいうえお"
+
+
+def test_empty():
+    assert normalize_speech_text("") == ""
+    assert normalize_speech_text(None) == ""
+
+
+class _FlakyNGram:
+    """1回目の呼び出しだけ失敗するe2kのNGramの偽物"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, word):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("一時的な失敗")
+        return True
+
+
+def test_e2k_failure_is_not_cached(monkeypatch):
+    ngram = _FlakyNGram()
+    monkeypatch.setattr(config, "e2k_ngram", ngram)
+    monkeypatch.setattr(config, "e2k_c2k", lambda word: "ハロー")
+    _e2k_convert_word.cache_clear()
+    try:
+        assert _convert_single_english_word("hello") == "hello"
+        assert _convert_single_english_word("hello") == "ハロー"
+        # 成功した結果はキャッシュし、e2kのモデルを再び呼び出さない
+        assert _convert_single_english_word("hello") == "ハロー"
+        assert ngram.calls == 2
+    finally:
+        _e2k_convert_word.cache_clear()
+
+
+def test_e2k_calls_are_serialized(monkeypatch):
+    # 読み上げとdry_runのスレッドから同時に変換しても、e2kのモデルは1つずつ呼び出す
+    active = []
+    overlaps = []
+
+    def ngram(word):
+        active.append(word)
+        overlaps.append(len(active))
+        time.sleep(0.01)
+        active.remove(word)
+        return True
+
+    monkeypatch.setattr(config, "e2k_ngram", ngram)
+    monkeypatch.setattr(config, "e2k_c2k", lambda word: word.upper())
+    _e2k_convert_word.cache_clear()
+    try:
+        words = [f"word{'x' * i}" for i in range(8)]
+        threads = [threading.Thread(target=_convert_single_english_word, args=(word,)) for word in words]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(overlaps) == len(words)
+        assert max(overlaps) == 1
+    finally:
+        _e2k_convert_word.cache_clear()
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# test_tts_engine.py
+# WAVファイルへの書き出し（WavFileEngine）のテスト
+
+import os
+
+from tts_engine import NullEngine, WavFileEngine
+
+
+def _speak_with_new_engine(output_dir: str, text: str) -> str:
+    with WavFileEngine(NullEngine(seconds_per_char=0.0), output_dir) as engine:
+        engine.speak(text)
+        return engine.last_path
+
+
+def test_new_engine_does_not_overwrite_previous_file(tmp_path):
+    # 話者キャッシュを使わない場合や破棄された後のように、読み上げごとにエンジンを作り直す
+    first = _speak_with_new_engine(str(tmp_path), "一つ目")
+    second = _speak_with_new_engine(str(tmp_path), "二つ目")
+    assert first != second
+    assert sorted(os.listdir(tmp_path)) == ["000001.wav", "000002.wav"]
+
+
+def test_numbering_continues_from_existing_files(tmp_path):
+    (tmp_path / "000007.wav").write_bytes(b"")
+    (tmp_path / "memo.txt").write_text("", encoding="utf-8")
+    path = _speak_with_new_engine(str(tmp_path), "続き")
+    assert os.path.basename(path) == "000008.wav"
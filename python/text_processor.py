@@ -2,42 +2,287 @@
 # text_processor.py
 # テキスト処理機能（英語→片仮名変換、通知処理など）
 
-from config import E2K_AVAILABLE, e2k_ngram, e2k_c2k
+import re
+import threading
+from functools import lru_cache
+
+import config
 from logger import log_debug, log_error
+from pronunciation_dict import get_pronunciation_dict
 
 
-def _convert_single_english_word(word: str) -> str:
+# =================================================
+# 読み上げテキストの正規化
+# =================================================
+# 読み上げない絵文字・記号（異体字セレクタ・ゼロ幅接合子などの構成要素を含む）
+_EMOJI_CLASS = (
+    "\U0001F000-\U0001FAFF"  # 絵文字・記号・国旗など
+    "\u2600-\u27BF"          # その他の記号・装飾記号
+    "\u2B00-\u2BFF"          # 矢印・図形（⭐ など）
+    "\uFE00-\uFE0F"          # 異体字セレクタ
+    "\u200D\u20E3"           # ゼロ幅接合子・囲み記号（キーキャップ）
+    "\U000E0020-\U000E007F"  # タグ文字（地域旗の構成要素）
+)
+
+
+def _build_separator_translation_table() -> dict:
     """
-    単一の英単語を片仮名に変換する
-    
+    区切り文字の変換テーブルを作成する（モジュール読み込み時に1回だけ実行）
+
+    - 改行・タブ・全角スペースなどの空白文字 → 半角スペース
+    - 全角カンマ・半角カンマ → 「、」
+    - 絵文字 → 削除
+    """
+    table = {}
+    for ch in "\r\n\t\v\f\u3000\u00a0\u2028\u2029":
+        table[ord(ch)] = " "
+    for ch in "，,":
+        table[ord(ch)] = "、"
+    for start, end in ((0x1F000, 0x1FAFF), (0x2600, 0x27BF), (0x2B00, 0x2BFF),
+                       (0xFE00, 0xFE0F), (0xE0020, 0xE007F)):
+        for code in range(start, end + 1):
+            table[code] = None
+    table[0x200D] = None
+    table[0x20E3] = None
+    return table
+
+
+_SEPARATOR_TRANSLATION_TABLE = _build_separator_translation_table()
+
+# 読み上げテンプレートのプレースホルダー
+_TEMPLATE_PLACEHOLDER_PATTERN = re.compile(r"\{(app|title|text)\}")
+
+# 繰り返しを1文字にまとめる記号
+_REPEATABLE_PUNCTUATION = "!?！？。．・…‥〜~"
+
+
+@lru_cache(maxsize=16)
+def _get_normalize_pattern(consecutive_min_length: int, long_digit_run: int):
+    """
+    正規化に使用する正規表現を作成する（設定値ごとにキャッシュ）
+
+    1回の走査で以下をすべて検出できるように、1つの選択パターンにまとめる
+    （先に書いたものが優先される）
+        url:    URL
+        sep:    空白・カンマ・「、」・絵文字の連続（整理が必要なもののみ）
+        digits: 長い数字の連続
+        punct:  同じ種類の記号の連続
+        rep:    同じ文字の連続（consecutive_min_length > 1 の場合のみ）
+    """
+    sep = rf"[\s、，,{_EMOJI_CLASS}]"
+    punct = re.escape(_REPEATABLE_PUNCTUATION)
+    alternatives = [
+        # URLに使える文字（ASCII）だけを対象にする（「https://a.jp/bをご覧ください」の日本語を含めない）
+        r"(?P<url>(?:https?://|www\.)[A-Za-z0-9\-._~:/?#\[\]@!$&'()*+,;=%]+)",
+        # 単独の半角スペース・「、」は変更不要のため、2文字以上の連続と変換が必要な1文字のみを対象にする
+        # （先頭・末尾の区切りは走査後に削除する）
+        rf"(?P<sep>{sep}{{2,}}|[^\S ]|[，,{_EMOJI_CLASS}])",
+    ]
+    if long_digit_run > 0:
+        alternatives.append(rf"(?P<digits>\d{{{long_digit_run},}})")
+    alternatives.append(rf"(?P<punct>[{punct}]{{2,}})")
+    if consecutive_min_length > 1:
+        alternatives.append(rf"(?P<rep>(?P<ch>.)(?P=ch){{{consecutive_min_length - 1},}})")
+    return re.compile("|".join(alternatives))
+
+
+def normalize_speech_text(
+    text: str,
+    consecutive_min_length: int = 0,
+    max_length: int = 0,
+    long_digit_run: int = None,
+) -> str:
+    """
+    読み上げ用テキストを正規化する
+
+    従来は改行の置換、連続文字の短縮、空白の整理、区切り文字の整理、先頭・末尾の
+    区切り文字の削除をそれぞれ別の置換で行っていたが、1回の正規表現走査でまとめて処理する
+    （検出した区切り文字の連続は、事前に作成した変換テーブルで変換する）
+
+    処理内容:
+    1. URLは SPEECH_URL_TEXT に置き換える
+    2. 空白・カンマ・「、」・絵文字の連続は1つにまとめる（カンマ・「、」を含む場合は「、」、
+       空白を含む場合は半角スペース、絵文字のみの場合は削除）。先頭と末尾の区切りは削除する
+    3. long_digit_run 桁以上の数字は SPEECH_LONG_DIGIT_TEXT に置き換える
+    4. 「！！！」「。。。」などの記号の連続は1文字にする
+    5. 同じ文字が consecutive_min_length 文字以上連続する場合は3文字に短縮する
+    6. max_length を超える場合は切り詰めて SPEECH_TRUNCATED_SUFFIX を付ける
+
     Args:
-        word: 変換する英単語（アルファベットのみ）
-    
+        text: 正規化するテキスト
+        consecutive_min_length: 連続文字を短縮する最小文字数（0の場合は短縮しない）
+        max_length: 最大文字数（0の場合は切り詰めない）
+        long_digit_run: 省略する数字の桁数（Noneの場合はSPEECH_LONG_DIGIT_RUN、0で無効）
+
     Returns:
-        片仮名に変換された単語。変換に失敗した場合は元の単語を返す
+        正規化されたテキスト
+
+    Examples:
+        >>> normalize_speech_text("  新着メール\n\n件名:  テスト！！！ , , ")
+        "新着メール 件名: テスト！"
+        >>> normalize_speech_text("詳細は https://example.com/a?b=1 を参照🎉")
+        "詳細は URL省略 を参照"
     """
-    try:
+    if not text:
+        return ""
+
+    if long_digit_run is None:
+        long_digit_run = config.SPEECH_LONG_DIGIT_RUN
+
+    def replace(match):
+        kind = match.lastgroup
+        if kind == "sep":
+            separator = match.group().translate(_SEPARATOR_TRANSLATION_TABLE)
+            if "、" in separator:
+                return "、"
+            return " " if separator else ""
+        if kind == "url":
+            return config.SPEECH_URL_TEXT
+        if kind == "digits":
+            return config.SPEECH_LONG_DIGIT_TEXT
+        if kind == "punct":
+            return match.group()[0]
+        # rep（名前付きグループchの後に終わるため lastgroup は rep になる）
+        return match.group()[0] * config.SPEECH_CONSECUTIVE_CHAR_MAX
+
+    pattern = _get_normalize_pattern(max(0, int(consecutive_min_length or 0)), max(0, int(long_digit_run)))
+    # 先頭と末尾の区切り文字を削除
+    text = pattern.sub(replace, text).strip(" 、")
+
+    if max_length and max_length > 0 and len(text) > max_length:
+        text = text[:max_length] + config.SPEECH_TRUNCATED_SUFFIX
+
+    return text
+
+
+def render_speech_template(log: dict, template: str = None) -> str:
+    """
+    読み上げテンプレートの {app} {title} {text} を通知の内容で置き換える（1回の走査）
+
+    Args:
+        log: 通知ログ辞書（app, title, text）
+        template: 読み上げテンプレート（Noneの場合はSPEECH_TEMPLATE_DEFAULT）
+
+    Returns:
+        置き換え後のテキスト（空白・区切り文字の整理は normalize_speech_text で行う）
+    """
+    values = {
+        "app": (log.get("app") or "").strip(),
+        "title": (log.get("title") or "").strip(),
+        "text": (log.get("text") or "").strip(),
+    }
+    return _TEMPLATE_PLACEHOLDER_PATTERN.sub(
+        lambda match: values[match.group(1)],
+        template or config.SPEECH_TEMPLATE_DEFAULT,
+    )
+
+
+def build_speech_text(
+    log: dict,
+    template: str = None,
+    consecutive_min_length: int = 0,
+    max_length: int = 0,
+) -> str:
+    """
+    通知からテンプレートを使って読み上げ用テキストを生成し、正規化する
+
+    Args:
+        log: 通知ログ辞書（app, title, text）
+        template: 読み上げテンプレート（Noneの場合はSPEECH_TEMPLATE_DEFAULT）
+        consecutive_min_length: 連続文字を短縮する最小文字数（0の場合は短縮しない）
+        max_length: 最大文字数（0の場合は切り詰めない）
+
+    Returns:
+        読み上げ用テキスト。空になった場合は「通知があります」
+    """
+    text = normalize_speech_text(
+        render_speech_template(log, template),
+        consecutive_min_length=consecutive_min_length,
+        max_length=max_length,
+    )
+    return text or "通知があります"
+
+
+# =================================================
+# 英語→片仮名変換
+# =================================================
+# 全角英数字（Ｇｏｏｇｌｅ、１２３）。NFKC正規化のうち英数字だけを半角にする
+# （片仮名・記号などの幅は読み上げに影響するため変えない）
+_FULLWIDTH_ALNUM_PATTERN = re.compile("[０-９Ａ-Ｚａ-ｚ]")
+_FULLWIDTH_ALNUM_TABLE = {
+    code: code - 0xFEE0
+    for start, end in ((0xFF10, 0xFF19), (0xFF21, 0xFF3A), (0xFF41, 0xFF5A))
+    for code in range(start, end + 1)
+}
+
+# 変換対象の英字を含むかどうかの事前確認
+_LATIN_LETTER_PATTERN = re.compile("[A-Za-z]")
+
+# 「英字の連続」と「それ以外（日本語、スペース、記号、数字など）」への分割
+_ENGLISH_SPLIT_PATTERN = re.compile(r"([a-zA-Z]+)|([^a-zA-Z]+)")
+
+
+def normalize_alnum_width(text: str) -> str:
+    """
+    全角英数字を半角にする（含まない場合は同じ文字列をそのまま返す）
+
+    Examples:
+        >>> normalize_alnum_width("Ｇｏｏｇｌｅの通知１件")
+        "Googleの通知1件"
+    """
+    if _FULLWIDTH_ALNUM_PATTERN.search(text) is None:
+        return text
+    return text.translate(_FULLWIDTH_ALNUM_TABLE)
+
+
+# e2kのモデル（NGram, C2K）の呼び出しを直列化するロック（モデルはスレッドセーフではない）
+_e2k_model_lock = threading.Lock()
+
+
+@lru_cache(maxsize=config.E2K_WORD_CACHE_SIZE)
+def _e2k_convert_word(word: str) -> str:
+    """
+    単一の英単語をe2kで片仮名に変換する（同じ単語は2回目以降e2kのモデルを使わずに前回の結果を返す）
+
+    変換中の例外はそのまま送出する（一時的な失敗の結果をキャッシュに残さないため）
+    """
+    # e2kのモデルは読み上げとdry_run（別スレッド）から同時に呼び出されるため、1つずつ実行する
+    with _e2k_model_lock:
         # スペル読みか綴り読みかを判定
         # NGramモデルを使用して、単語が一般的なスペル読みかどうかを判定
-        is_spell_reading = e2k_ngram(word)
-        log_debug(f"_convert_single_english_word: 単語 '{word}' - スペル読み判定: {is_spell_reading}")
-        
+        is_spell_reading = config.e2k_ngram(word)
+
         if is_spell_reading:
             # スペル読み: 一般的な単語として発音に基づいて変換
             # 例: "Hello" → "ハロー", "Google" → "グーグル"
-            converted = e2k_c2k(word)
+            converted = config.e2k_c2k(word)
         else:
             # 綴り読み: 略語や固有名詞など、1文字ずつ読み上げる
             # 例: "MVP" → "エムブイピー", "API" → "エーピーアイ"
-            converted = e2k_ngram.as_is(word.lower())
-        
-        # 変換結果が空の場合は元の単語を返す
-        if converted and converted.strip():
-            log_debug(f"_convert_single_english_word: 単語 '{word}' → '{converted}'")
-            return converted
-        else:
-            log_debug(f"_convert_single_english_word: 単語 '{word}' - 変換結果が空のため元のまま")
-            return word
+            converted = config.e2k_ngram.as_is(word.lower())
+    log_debug(f"_convert_single_english_word: 単語 '{word}' - スペル読み判定: {is_spell_reading}")
+
+    # 変換結果が空の場合は元の単語を返す
+    if converted and converted.strip():
+        log_debug(f"_convert_single_english_word: 単語 '{word}' → '{converted}'")
+        return converted
+    log_debug(f"_convert_single_english_word: 単語 '{word}' - 変換結果が空のため元のまま")
+    return word
+
+
+def _convert_single_english_word(word: str) -> str:
+    """
+    単一の英単語を片仮名に変換する
+    同じ単語は2回目以降e2kのモデルを使わずに前回の結果を返す（通知には同じアプリ名・単語が繰り返し現れる）
+    
+    Args:
+        word: 変換する英単語（アルファベットのみ）
+    
+    Returns:
+        片仮名に変換された単語。変換に失敗した場合は元の単語を返す（次回は再び変換を試みる）
+    """
+    try:
+        return _e2k_convert_word(word)
     except Exception as e:
         # 変換エラーが発生した場合は元の単語を返す
         import traceback
@@ -52,10 +297,13 @@ def convert_english_to_katakana(text: str) -> str:
     日本語と英語が混在している場合、英語部分だけを抽出して変換する
     
     処理の流れ:
-    1. テキストを「英字の連続」と「それ以外（日本語、スペース、記号など）」に分割
-    2. 英字部分のみをe2kで片仮名に変換
-    3. それ以外の部分はそのまま保持
-    4. すべての部分を結合して返す
+    1. 全角英数字を半角にする（「Ｇｏｏｇｌｅ」を1文字ずつ読み上げないように）
+    2. ユーザー辞書（pronunciation_dict）の登録表記を最長一致で登録した読み方に置き換える
+    3. 残りの部分に英字がなければそのまま返す（日本語だけの通知は分割もe2kの読み込みも行わない）
+    4. 残りの部分を「英字の連続」と「それ以外（日本語、スペース、記号など）」に分割
+    5. 英字部分のみをe2kで片仮名に変換
+    6. それ以外の部分はそのまま保持
+    7. すべての部分を結合して返す
     
     Args:
         text: 変換するテキスト
@@ -68,27 +316,47 @@ def convert_english_to_katakana(text: str) -> str:
         "ハロー、世界"
         >>> convert_english_to_katakana("Google Chrome、Notification #7")
         "グーグル クローム、ノーティフィケーション #7"
+        >>> convert_english_to_katakana("Ｇｏｏｇｌｅ")
+        "グーグル"
     """
     # 空文字列の場合はそのまま返す
     if not text:
         log_debug("convert_english_to_katakana: テキストが空です")
         return text
-    
-    # e2kが利用できない場合は元のテキストを返す
-    if not E2K_AVAILABLE:
+
+    text = normalize_alnum_width(text)
+
+    # ユーザー辞書に一致した部分は、e2kのモデルを使わずに登録した読み方を使う
+    # （e2kが利用できない場合も辞書は適用する）
+    parts = get_pronunciation_dict().split(text)
+    if len(parts) > 1 or parts[0][1] is not None:
+        log_debug(f"convert_english_to_katakana: ユーザー辞書に一致: {[part for part, reading in parts if reading is not None]}")
+        return "".join(
+            reading if reading is not None else _convert_english_runs(part)
+            for part, reading in parts
+        )
+    return _convert_english_runs(text)
+
+
+def _convert_english_runs(text: str) -> str:
+    """テキスト中の英字の連続をe2kで片仮名に変換する（ユーザー辞書の適用後に呼び出す）"""
+    # 英字を含まない場合は変換するものがないため、分割せずにそのまま返す（通知の大半は日本語のみ）
+    if _LATIN_LETTER_PATTERN.search(text) is None:
+        return text
+
+    # e2kが利用できない場合は元のテキストを返す（未読み込みの場合はここで読み込む）
+    if not config.load_e2k():
         log_debug(f"convert_english_to_katakana: e2kが利用できません。元のテキストを返します: {text[:50]}...")
         return text
     
     try:
-        import re
         log_debug(f"convert_english_to_katakana: 変換前テキスト: {text[:100]}...")
         
         # 正規表現で「英字の連続」と「それ以外」に分割
         # グループ1: [a-zA-Z]+ → 英字の連続（1文字以上）
         # グループ2: [^a-zA-Z]+ → それ以外（日本語、スペース、記号、数字など）
         # この正規表現により、テキスト全体が交互に「英字」と「非英字」に分割される
-        pattern = re.compile(r'([a-zA-Z]+)|([^a-zA-Z]+)')
-        parts = pattern.findall(text)
+        parts = _ENGLISH_SPLIT_PATTERN.findall(text)
         
         # 変換結果を格納するリスト
         converted_parts = []
@@ -157,10 +425,8 @@ def process_notification_for_speech(log: dict) -> str:
     
     # 本文を追加（存在する場合）
     if log.get("text"):
-        # 改行を空白に置換（読み上げ時の区切りを明確にするため）
-        text = log["text"].replace("\n", " ")
-        parts.append(text)
+        parts.append(log["text"])
     
-    # すべての要素を「、」で結合
+    # すべての要素を「、」で結合し、改行・空白・区切り文字などを正規化する
     # 要素が1つもない場合はデフォルトメッセージを返す
-    return "、".join(parts) if parts else "通知があります"
+    return normalize_speech_text("、".join(parts)) or "通知があります"
@@ -3,7 +3,14 @@
 # pip install -r requirements.txt
 # WindowsのToast通知を取得してElectronに送信し、自動で読み上げる統合スクリプト
 
+import time
+
+# 起動時間計測の基準（importにかかった時間もstartup_reportに含める）
+_PROCESS_T0 = time.perf_counter()
+
 import asyncio
+import multiprocessing
+import os
 import sys
 from datetime import datetime
 
@@ -12,9 +19,50 @@ import config
 
 # その後、loggerをインポート（configの後に）
 from logger import log_debug, log_error, send_json
-from sapi_speaker import get_available_voices
+from sapi_speaker import get_available_voices_async, speak_text
+from speech_queue import speech_worker_loop
+from metrics import metrics_loop
+from loop_watchdog import loop_watchdog
 from notification_monitor import get_listener, get_past_notifications, notification_loop
 from stdin_handler import stdin_loop
+from startup import StartupGraph
+
+_IMPORTS_DONE = time.perf_counter()
+
+
+def _load_e2k():
+    """e2kを読み込み、初期化状態をログに出力する（別スレッドで実行）"""
+    config.load_e2k()
+
+    if config.E2K_AVAILABLE:
+        log_debug("e2k (English to Katakana Translator) が利用可能です")
+    else:
+        if config.E2K_IMPORT_ERROR:
+            log_error(f"e2kのインポートに失敗しました: {config.E2K_IMPORT_ERROR}")
+        else:
+            log_error("e2kが利用できません。英語は片仮名に変換されません。")
+        log_debug(f"e2kをインストールするには: {sys.executable} -m pip install e2k")
+        log_debug(f"または: py -m pip install e2k (Pythonランチャーを使用)")
+
+
+async def _load_voices():
+    """利用可能な音声リストを取得して送信する（COMの呼び出しは読み上げスレッドで実行）"""
+    available_voices = await get_available_voices_async()
+    send_json({
+        "type": "available_voices",
+        "source": "toast_bridge",
+        "voices": available_voices,
+        "timestamp": datetime.now().isoformat(),
+    })
+    log_debug(f"利用可能な音声数: {len(available_voices)}")
+    return available_voices
+
+
+async def _load_past_notifications(listener):
+    """過去の通知を取得して送信する（リスナーの取得に失敗した場合は何もしない）"""
+    if not listener:
+        return set(), []
+    return await get_past_notifications(listener)
 
 
 async def main():
@@ -22,10 +70,15 @@ async def main():
     メイン関数
     通知監視、stdinループを同時に実行する
     CeVIO Alの同時アクセス制限対策のため、SAPI接続は読み上げ時のみ確立される
+
+    起動処理は依存関係グラフとして実行する:
+        e2k読み込み ─────────────┐
+        音声リスト取得 ───────────┤
+        通知リスナー取得 → 過去の通知 ┴→ startup_report → ready
     """
     # メインイベントループへの参照を保存
     config.main_loop = asyncio.get_running_loop()
-    
+
     # 1. 起動メッセージ
     send_json({
       "type": "info",
@@ -38,27 +91,6 @@ async def main():
     # Pythonバージョン情報をログに出力
     log_debug(f"Pythonバージョン: {sys.version}")
     log_debug(f"Python実行パス: {sys.executable}")
-    
-    # e2kの初期化状態をログに出力
-    if config.E2K_AVAILABLE:
-        log_debug("e2k (English to Katakana Translator) が利用可能です")
-    else:
-        if config.E2K_IMPORT_ERROR:
-            log_error(f"e2kのインポートに失敗しました: {config.E2K_IMPORT_ERROR}")
-        else:
-            log_error("e2kが利用できません。英語は片仮名に変換されません。")
-        log_debug(f"e2kをインストールするには: {sys.executable} -m pip install e2k")
-        log_debug(f"または: py -m pip install e2k (Pythonランチャーを使用)")
-    
-    # 利用可能な音声リストを取得して送信
-    available_voices = get_available_voices()
-    send_json({
-        "type": "available_voices",
-        "source": "toast_bridge",
-        "voices": available_voices,
-        "timestamp": datetime.now().isoformat(),
-    })
-    log_debug(f"利用可能な音声数: {len(available_voices)}")
 
     # 音声設定の確認（CeVIO Alの同時アクセス制限対策のため、接続は読み上げ時のみ確立）
     # 起動時は音声設定を待機する（Electron側から送られてくるまで待機）
@@ -68,13 +100,31 @@ async def main():
         # 起動時は音声設定を待機するだけ（メッセージ送信なし）
         log_debug("音声が設定されていません。Electron側からの音声設定を待機中...")
 
-    # 通知リスナーを取得
-    listener = await get_listener()
+    # 2. 互いに独立した起動処理を並行実行する
+    # e2kの読み込みは同期処理のため別スレッドで、COMによる音声列挙は読み上げスレッドで実行する
+    graph = StartupGraph(origin=_PROCESS_T0)
+    graph.record("imports", _PROCESS_T0, _IMPORTS_DONE)
+    graph.add("e2k", _load_e2k, blocking=True)
+    graph.add("voices", _load_voices)
+    graph.add("listener", get_listener)
+    graph.add("past_notifications", _load_past_notifications, deps=("listener",))
+    results = await graph.run()
+
+    report = graph.report()
+    send_json({
+        "type": "startup_report",
+        "source": "toast_bridge",
+        **report,
+        "timestamp": datetime.now().isoformat(),
+    })
+    log_debug(f"起動処理の所要時間: {report['total_ms']}ms")
+
+    # 通知リスナーを取得できなかった場合は終了
+    listener = results["listener"]
     if not listener:
         sys.exit(1)
 
-    # 2. 過去の通知を取得して送信
-    processed_ids, _ = await get_past_notifications(listener)
+    processed_ids, _ = results["past_notifications"] or (set(), [])
 
     # 準備完了メッセージを送信（Electron側で初期音量を送信するタイミングを検知するため）
     send_json({
@@ -86,15 +136,31 @@ async def main():
         "volume": config.VOLUME_LEVEL,
     })
 
-    # 通知監視とstdinループを同時に実行
+    # 通知監視、stdinループ、読み上げキュー、メトリクスの送信、イベントループの監視を同時に実行
     await asyncio.gather(
         notification_loop(listener, processed_ids),
         stdin_loop(),
+        speech_worker_loop(speak_text),
+        metrics_loop(),
+        loop_watchdog(),
         return_exceptions=True
     )
 
 
 if __name__ == "__main__":
+    # PyInstallerでビルドしたexeから子プロセスを起動するために必要
+    multiprocessing.freeze_support()
+
+    if "--rebuild-seen" in sys.argv:
+        # 処理済みの通知の記録を作り直す（マルチプロセスモードの子プロセスにも環境変数で伝える）
+        os.environ["TOSPEAK_SEEN_REBUILD"] = "1"
+        config.SEEN_REBUILD = True
+
+    if config.MULTIPROCESS_MODE or "--multiprocess" in sys.argv:
+        # マルチプロセスモード: 通知監視と読み上げを別プロセスで実行し、supervisorが監視する
+        from supervisor import run_supervisor
+        sys.exit(run_supervisor())
+
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
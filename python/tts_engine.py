@@ -0,0 +1,679 @@
+# -*- coding: utf-8 -*-
+# tts_engine.py
+# 読み上げエンジンの共通インターフェイスと実装
+#
+#   SapiEngine    : Windows SAPI (SAPI.SpVoice)。CeVIO AIなどのSAPI音声もこちら
+#   EspeakEngine  : espeak-ng / espeak（インストールされている場合のみ。Linuxでも動作）
+#   NullEngine    : 音を出さず、文字数に応じた時間だけ読み上げ中になる（負荷試験用）
+#   WavFileEngine : 別のエンジンで読み上げた音声をWAVファイルに書き出す
+#
+# エンジンは環境変数 TOSPEAK_TTS_ENGINE（sapi / espeak / null / wav）で選択する。
+# 未指定の場合はWindowsではsapi、それ以外ではespeak（未インストールの場合はnull）
+
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import wave
+from contextlib import contextmanager
+
+import config
+from logger import log_debug, log_error
+
+try:
+    import pythoncom
+except ImportError:
+    pythoncom = None
+
+
+@contextmanager
+def com_initialized():
+    """
+    現在のスレッドでCOMを初期化し、終了時に解放する
+    pywin32がない環境（Linuxなど）では何もしない
+    """
+    if pythoncom is None:
+        yield
+        return
+    pythoncom.CoInitialize()
+    try:
+        yield
+    finally:
+        pythoncom.CoUninitialize()
+
+
+# 作成済みで close() されていないエンジンの数（リソースの解放漏れの確認用）
+_open_engines = 0
+_open_engines_lock = threading.Lock()
+
+
+def open_engine_count() -> int:
+    """作成済みで close() されていないエンジンの数"""
+    return _open_engines
+
+
+class TTSEngine:
+    """
+    読み上げエンジンの共通インターフェイス
+
+    speak() は読み上げを開始してすぐに戻り、完了は wait_until_done() で待つ。
+    wait_until_done() はブロッキングのため、イベントループからは別スレッドで呼び出す。
+
+    エンジンが保持するリソース（COMオブジェクトなど）は close() で解放する。
+    with文で使用した場合はブロックを抜けるときに close() される
+    """
+
+    name = "base"
+    # speak() の直後、読み上げの開始を確認するまでに待つ秒数
+    start_delay = 0.0
+
+    def __init__(self):
+        # サブクラスはリソースの確保に成功した後に呼び出す
+        global _open_engines
+        self._closed = False
+        with _open_engines_lock:
+            _open_engines += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _mark_closed(self) -> bool:
+        """close() の1回目だけTrueを返す"""
+        global _open_engines
+        if getattr(self, "_closed", True):
+            return False
+        self._closed = True
+        with _open_engines_lock:
+            _open_engines -= 1
+        return True
+
+    def list_voices(self) -> list:
+        """利用可能な音声名のリストを返す"""
+        raise NotImplementedError
+
+    def select_voice(self, voice_name: str):
+        """
+        音声を選択する（完全一致、または部分一致）
+
+        Returns:
+            選択した音声名。見つからない場合はNone（標準音声のまま）
+        """
+        raise NotImplementedError
+
+    def voice_description(self) -> str:
+        """現在の音声名を返す"""
+        return ""
+
+    def set_volume(self, volume: int):
+        """音量を設定する (0〜100)"""
+        raise NotImplementedError
+
+    def set_rate(self, rate: int):
+        """読み上げ速度を設定する (-10〜10、SAPIと同じ尺度)"""
+        raise NotImplementedError
+
+    def speak(self, text: str):
+        """読み上げを開始する（完了を待たない）"""
+        raise NotImplementedError
+
+    def is_speaking(self) -> bool:
+        """読み上げ中の場合はTrue"""
+        raise NotImplementedError
+
+    def wait_until_done(self, timeout: float = 60.0) -> bool:
+        """
+        読み上げが完了するまで待つ（ブロッキング）
+
+        Returns:
+            timeout 以内に完了した場合はTrue
+        """
+        raise NotImplementedError
+
+    def cancel(self):
+        """読み上げを中止する"""
+        raise NotImplementedError
+
+    def render_to_wav(self, text: str, path: str):
+        """読み上げた音声をWAVファイルに書き出す（ブロッキング）"""
+        raise NotImplementedError(f"{self.name} はWAVファイルへの書き出しに対応していません")
+
+    def close(self):
+        """エンジンが保持しているリソースを解放する（2回目以降は何もしない）"""
+        self._mark_closed()
+
+
+def _clamp(value: int, minimum: int, maximum: int) -> int:
+    return max(minimum, min(maximum, int(value)))
+
+
+# =================================================
+# SAPI
+# =================================================
+class SapiEngine(TTSEngine):
+    """Windows SAPI (SAPI.SpVoice) による読み上げ"""
+
+    name = "sapi"
+    # CeVIO AIなどは読み上げの開始までに時間がかかるため、開始の確認まで少し待つ
+    start_delay = 0.3
+
+    SVSF_PURGE_BEFORE_SPEAK = 2      # 読み上げ中の音声を破棄してから読み上げる
+    SSFM_CREATE_FOR_WRITE = 3        # SpFileStreamを書き込み用に作成
+    SAFT_22KHZ_16BIT_MONO = 22       # WAVファイルの形式
+
+    def __init__(self):
+        import win32com.client
+        self._dispatch = win32com.client.Dispatch
+        self._voice = self._dispatch("SAPI.SpVoice")
+        super().__init__()
+
+    def list_voices(self) -> list:
+        voice_names = []
+        for voice in self._voice.GetVoices():
+            try:
+                desc = voice.GetDescription()
+                if desc:
+                    voice_names.append(desc)
+            except Exception:
+                # 個別の音声情報取得に失敗しても続行
+                continue
+        return voice_names
+
+    def select_voice(self, voice_name: str):
+        for voice in self._voice.GetVoices():
+            try:
+                desc = voice.GetDescription()
+                # 音声名が完全一致、または部分一致する場合は使用
+                if desc == voice_name or voice_name in desc:
+                    self._voice.Voice = voice
+                    return desc
+            except Exception:
+                # 個別の音声情報取得に失敗しても続行
+                continue
+        return None
+
+    def voice_description(self) -> str:
+        current_voice = self._voice.Voice
+        return current_voice.GetDescription() if current_voice else "None"
+
+    def set_volume(self, volume: int):
+        self._voice.Volume = _clamp(volume, config.VOLUME_MIN, config.VOLUME_MAX)
+
+    def set_rate(self, rate: int):
+        self._voice.Rate = _clamp(rate, config.SAPI_RATE_MIN, config.SAPI_RATE_MAX)
+
+    def speak(self, text: str):
+        # 非同期フラグで読み上げを開始
+        # SAPI_SPEAK_ASYNC_FLAGを使用することで、読み上げを非同期で実行
+        return self._voice.Speak(text, config.SAPI_SPEAK_ASYNC_FLAG)
+
+    def status(self) -> tuple:
+        """(RunningState, CurrentStreamNumber) を返す"""
+        status = self._voice.Status
+        return status.RunningState, status.CurrentStreamNumber
+
+    def is_speaking(self) -> bool:
+        return self._voice.Status.RunningState != 0
+
+    def cancel(self):
+        self._voice.Speak("", self.SVSF_PURGE_BEFORE_SPEAK)
+
+    def render_to_wav(self, text: str, path: str):
+        stream = self._dispatch("SAPI.SpFileStream")
+        audio_format = self._dispatch("SAPI.SpAudioFormat")
+        audio_format.Type = self.SAFT_22KHZ_16BIT_MONO
+        stream.Format = audio_format
+        stream.Open(os.path.abspath(path), self.SSFM_CREATE_FOR_WRITE)
+        previous_output = self._voice.AudioOutputStream
+        try:
+            self._voice.AudioOutputStream = stream
+            self._voice.Speak(text, 0)  # 同期で書き出す
+        finally:
+            stream.Close()
+            self._voice.AudioOutputStream = previous_output
+            del stream, audio_format, previous_output
+
+    def close(self):
+        """
+        SpVoiceへの参照を手放す
+
+        SpVoiceを参照しているのはこのオブジェクトだけのため、参照を外した時点で
+        参照カウントが0になりCOMのReleaseが呼ばれる（CeVIO AIとの接続もここで切断される）。
+        gc.collect() を待つ必要はない
+        """
+        if not self._mark_closed():
+            return
+        voice, self._voice = self._voice, None
+        try:
+            if voice is not None and voice.Status.RunningState != 0:
+                # 読み上げ中のまま解放しないよう、残っている音声を破棄する
+                voice.Speak("", self.SVSF_PURGE_BEFORE_SPEAK)
+        except Exception as e:
+            log_debug(f"SapiEngine.close: 読み上げの停止に失敗しました: {e}")
+        del voice
+
+    def wait_until_done(self, timeout: float = 60.0) -> bool:
+        """
+        読み上げが完了するまで待つ（別スレッドで実行）
+
+        CeVIO Alの場合、WaitUntilDoneが正しく動作しない可能性があるため、
+        RunningStateをポーリングして読み上げ完了を確認する
+        """
+        speaker_obj = self._voice
+        completed = False
+        try:
+            # 読み上げが開始されているか確認（Statusプロパティをチェック）
+            # Statusが0以外の場合、読み上げ中または待機中
+            log_debug("wait_until_done: 読み上げ開始確認を開始")
+            max_wait = 5  # 最大5秒待機
+            wait_count = 0
+            running_state_checked = False
+
+            while wait_count < max_wait:
+                try:
+                    status = speaker_obj.Status
+                    running_state = status.RunningState
+                    current_stream = status.CurrentStreamNumber
+
+                    if not running_state_checked:
+                        log_debug(f"wait_until_done: 初期状態 - RunningState={running_state}, CurrentStreamNumber={current_stream}")
+                        running_state_checked = True
+
+                    if running_state != 0:  # 0以外は読み上げ中または待機中
+                        log_debug(f"wait_until_done: 読み上げ開始を確認: RunningState={running_state}, CurrentStreamNumber={current_stream}")
+                        break
+                except Exception as status_error:
+                    log_debug(f"wait_until_done: Status取得エラー: {status_error}")
+
+                time.sleep(0.1)  # 100ms待機
+                wait_count += 0.1
+
+            if wait_count >= max_wait:
+                log_error("wait_until_done: 読み上げ開始確認がタイムアウトしました")
+
+            log_debug("wait_until_done: 読み上げ完了を待機中...")
+            max_completion_wait = timeout
+            completion_wait_count = 0
+            check_interval = 0.1  # 100msごとにチェック
+            last_running_state = None
+            state_1_start_time = None  # RunningState=1になった時点を記録
+            state_1_timeout = 2.0  # RunningState=1が2秒続いたら完了とみなす（CeVIO Al対策）
+            completed_by_timeout = False  # タイムアウトで完了とみなしたかどうか
+
+            while completion_wait_count < max_completion_wait:
+                try:
+                    status = speaker_obj.Status
+                    running_state = status.RunningState
+
+                    # RunningStateが0になったら読み上げ完了
+                    if running_state == 0:
+                        log_debug(f"wait_until_done: 読み上げ完了を確認: RunningState={running_state}")
+                        break
+
+                    # 状態が変化したかチェック
+                    if running_state != last_running_state:
+                        last_running_state = running_state
+                        log_debug(f"wait_until_done: RunningStateが変化: {running_state}, 経過時間={completion_wait_count:.1f}秒")
+
+                        # RunningState=2から1に変化した時点で、読み上げが開始されたことを記録
+                        if running_state == 1:
+                            state_1_start_time = completion_wait_count
+                            log_debug("wait_until_done: RunningState=1（読み上げ中）に変化しました。読み上げ開始時刻を記録")
+
+                    # RunningState=1（読み上げ中）が一定時間続いたら、読み上げが完了したとみなす
+                    # CeVIO Alの場合、RunningState=2（待機中）から1（読み上げ中）に変化した後、
+                    # 1が一定時間続いたら完了とみなす
+                    if running_state == 1 and state_1_start_time is not None:
+                        elapsed_since_state_1 = completion_wait_count - state_1_start_time
+                        if elapsed_since_state_1 >= state_1_timeout:
+                            log_debug(f"wait_until_done: RunningState=1が{elapsed_since_state_1:.1f}秒続いたため、読み上げ完了とみなします")
+                            completed_by_timeout = True
+                            # 少し追加で待機してから完了とする（読み上げが確実に終わるように）
+                            time.sleep(0.3)
+                            break
+
+                    # 定期的にログを出力（5秒ごと）
+                    if int(completion_wait_count * 10) % 50 == 0 and completion_wait_count > 0:
+                        log_debug(f"wait_until_done: 読み上げ待機中... RunningState={running_state}, 経過時間={completion_wait_count:.1f}秒")
+                except Exception as status_error:
+                    log_debug(f"wait_until_done: Status取得エラー: {status_error}")
+
+                time.sleep(check_interval)
+                completion_wait_count += check_interval
+
+            # 最終状態を確認
+            try:
+                final_status = speaker_obj.Status
+                final_running_state = final_status.RunningState
+                log_debug(f"wait_until_done: 最終状態 - RunningState={final_running_state}, CurrentStreamNumber={final_status.CurrentStreamNumber}, 経過時間={completion_wait_count:.1f}秒")
+
+                # タイムアウトで完了とみなした場合は、RunningState=1でもエラーとしない
+                if final_running_state != 0 and not completed_by_timeout:
+                    log_error(f"wait_until_done: 読み上げが完了していません。RunningState={final_running_state}")
+                    # WaitUntilDoneも試してみる（念のため）
+                    try:
+                        wait_result = speaker_obj.WaitUntilDone(5)
+                        log_debug(f"wait_until_done: WaitUntilDone(5)の戻り値: {wait_result}")
+                        completed = bool(wait_result)
+                    except Exception as wait_error:
+                        log_debug(f"wait_until_done: WaitUntilDoneエラー: {wait_error}")
+                else:
+                    completed = True
+                    if completed_by_timeout:
+                        log_debug(f"wait_until_done: タイムアウトで完了とみなしたため、RunningState={final_running_state}でも正常終了とします")
+            except Exception as final_status_error:
+                log_debug(f"wait_until_done: 最終状態取得エラー: {final_status_error}")
+        except Exception as e:
+            # WaitUntilDoneでエラーが発生しても読み上げは続行される可能性がある
+            log_error(f"WaitUntilDoneエラー: {e}")
+        return completed
+
+
+# =================================================
+# espeak-ng
+# =================================================
+class EspeakEngine(TTSEngine):
+    """espeak-ng（またはespeak）のコマンドによる読み上げ"""
+
+    name = "espeak"
+
+    BASE_WORDS_PER_MINUTE = 175  # 速度0のときの1分あたりの単語数（espeakの標準値）
+
+    def __init__(self, executable: str = None):
+        self._executable = executable or find_espeak()
+        if not self._executable:
+            raise RuntimeError("espeak-ng / espeak が見つかりません")
+        self._voice = "ja"
+        self._volume = config.VOLUME_LEVEL
+        self._rate = config.SAPI_RATE_DEFAULT
+        self._process = None
+        super().__init__()
+
+    def list_voices(self) -> list:
+        result = subprocess.run(
+            [self._executable, "--voices"],
+            capture_output=True, text=True, encoding="utf-8", errors="replace", check=False,
+        )
+        voice_names = []
+        # 1行目は見出し。列: Pty Language Age/Gender VoiceName File Other Languages
+        for line in result.stdout.splitlines()[1:]:
+            columns = line.split()
+            if len(columns) >= 4:
+                voice_names.append(columns[3])
+        return voice_names
+
+    def select_voice(self, voice_name: str):
+        for name in self.list_voices():
+            if name == voice_name or voice_name in name:
+                self._voice = name
+                return name
+        return None
+
+    def voice_description(self) -> str:
+        return self._voice
+
+    def set_volume(self, volume: int):
+        self._volume = _clamp(volume, config.VOLUME_MIN, config.VOLUME_MAX)
+
+    def set_rate(self, rate: int):
+        self._rate = _clamp(rate, config.SAPI_RATE_MIN, config.SAPI_RATE_MAX)
+
+    def _command(self, text: str, extra: list = ()) -> list:
+        # SAPIの速度±10はおよそ3倍速〜1/3倍速に相当する
+        words_per_minute = int(self.BASE_WORDS_PER_MINUTE * (3 ** (self._rate / 10)))
+        # espeakの振幅は0〜200（標準100）
+        amplitude = self._volume * 2
+        return [
+            self._executable, "-v", self._voice, "-a", str(amplitude),
+            "-s", str(words_per_minute), *extra, "--", text,
+        ]
+
+    def speak(self, text: str):
+        self.cancel()
+        self._process = subprocess.Popen(
+            self._command(text), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+    def is_speaking(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def wait_until_done(self, timeout: float = 60.0) -> bool:
+        if self._process is None:
+            return True
+        try:
+            self._process.wait(timeout=timeout)
+            return True
+        except subprocess.TimeoutExpired:
+            return False
+
+    def cancel(self):
+        if self.is_speaking():
+            self._process.terminate()
+            self._process.wait()
+        self._process = None
+
+    def render_to_wav(self, text: str, path: str):
+        subprocess.run(
+            self._command(text, ["-w", path]),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True,
+        )
+
+    def close(self):
+        if self._mark_closed():
+            self.cancel()
+
+
+def find_espeak():
+    """espeak-ng（なければespeak）の実行ファイルのパスを返す（見つからない場合はNone）"""
+    return shutil.which("espeak-ng") or shutil.which("espeak")
+
+
+# =================================================
+# Null（負荷試験用）
+# =================================================
+class NullEngine(TTSEngine):
+    """
+    音を出さないエンジン
+    文字数 × seconds_per_char 秒（読み上げ速度に応じて短縮）だけ読み上げ中の状態になる
+    """
+
+    name = "null"
+
+    SAMPLE_RATE = 22050
+
+    def __init__(self, seconds_per_char: float = None):
+        if seconds_per_char is None:
+            seconds_per_char = config.NULL_ENGINE_SECONDS_PER_CHAR
+        self.seconds_per_char = seconds_per_char
+        self._voice = "Null Voice"
+        self._volume = config.VOLUME_LEVEL
+        self._rate = config.SAPI_RATE_DEFAULT
+        self._deadline = 0.0
+        self._done = threading.Event()
+        self._done.set()
+        super().__init__()
+
+    def duration_for(self, text: str) -> float:
+        """読み上げにかかる時間（秒）を返す"""
+        return len(text) * self.seconds_per_char / (3 ** (self._rate / 10))
+
+    def list_voices(self) -> list:
+        return [self._voice]
+
+    def select_voice(self, voice_name: str):
+        return self._voice if voice_name in self._voice else None
+
+    def voice_description(self) -> str:
+        return self._voice
+
+    def set_volume(self, volume: int):
+        self._volume = _clamp(volume, config.VOLUME_MIN, config.VOLUME_MAX)
+
+    def set_rate(self, rate: int):
+        self._rate = _clamp(rate, config.SAPI_RATE_MIN, config.SAPI_RATE_MAX)
+
+    def speak(self, text: str):
+        self._deadline = time.monotonic() + self.duration_for(text)
+        self._done.clear()
+
+    def is_speaking(self) -> bool:
+        if self._done.is_set():
+            return False
+        if time.monotonic() >= self._deadline:
+            self._done.set()
+            return False
+        return True
+
+    def wait_until_done(self, timeout: float = 60.0) -> bool:
+        remaining = self._deadline - time.monotonic()
+        if remaining <= 0:
+            self._done.set()
+            return True
+        if self._done.wait(min(remaining, timeout)):
+            # cancel() された
+            return True
+        if remaining > timeout:
+            return False
+        self._done.set()
+        return True
+
+    def cancel(self):
+        self._deadline = 0.0
+        self._done.set()
+
+    def close(self):
+        if self._mark_closed():
+            self.cancel()
+
+    def render_to_wav(self, text: str, path: str):
+        # 読み上げ時間分の無音を書き出す
+        frames = int(self.duration_for(text) * self.SAMPLE_RATE)
+        with wave.open(path, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.SAMPLE_RATE)
+            wav.writeframes(b"\x00\x00" * frames)
+
+
+# =================================================
+# WAVファイル出力
+# =================================================
+# 出力先ディレクトリごとの最後の連番（エンジンを作り直しても番号を続け、既存のファイルを上書きしない）
+_wav_sequences = {}
+_wav_sequences_lock = threading.Lock()
+
+
+def _next_wav_path(output_dir: str) -> str:
+    """
+    出力先ディレクトリの次の連番のWAVファイルのパスを返す
+    初回はディレクトリ内の既存のファイル（000001.wav など）の最大の番号から続ける
+    """
+    key = os.path.realpath(output_dir)
+    with _wav_sequences_lock:
+        sequence = _wav_sequences.get(key)
+        if sequence is None:
+            sequence = 0
+            for file_name in os.listdir(output_dir):
+                stem, ext = os.path.splitext(file_name)
+                if ext.lower() == ".wav" and stem.isdigit():
+                    sequence = max(sequence, int(stem))
+        sequence += 1
+        _wav_sequences[key] = sequence
+    return os.path.join(output_dir, f"{sequence:06d}.wav")
+
+
+class WavFileEngine(TTSEngine):
+    """
+    読み上げた音声を output_dir に連番のWAVファイルとして書き出す
+    音声の生成は inner のエンジン（render_to_wav に対応しているもの）が行う
+    連番はプロセス全体で出力先ごとに続けるため、エンジンを作り直しても前のファイルを上書きしない
+    """
+
+    name = "wav"
+
+    def __init__(self, inner: TTSEngine, output_dir: str):
+        self._inner = inner
+        self._output_dir = output_dir
+        self.last_path = None
+        os.makedirs(output_dir, exist_ok=True)
+        super().__init__()
+
+    def list_voices(self) -> list:
+        return self._inner.list_voices()
+
+    def select_voice(self, voice_name: str):
+        return self._inner.select_voice(voice_name)
+
+    def voice_description(self) -> str:
+        return self._inner.voice_description()
+
+    def set_volume(self, volume: int):
+        self._inner.set_volume(volume)
+
+    def set_rate(self, rate: int):
+        self._inner.set_rate(rate)
+
+    def speak(self, text: str):
+        # 書き出しは同期で行うため、speak() から戻った時点で完了している
+        self.last_path = _next_wav_path(self._output_dir)
+        self._inner.render_to_wav(text, self.last_path)
+
+    def is_speaking(self) -> bool:
+        return False
+
+    def wait_until_done(self, timeout: float = 60.0) -> bool:
+        return True
+
+    def cancel(self):
+        pass
+
+    def render_to_wav(self, text: str, path: str):
+        self._inner.render_to_wav(text, path)
+
+    def close(self):
+        if self._mark_closed():
+            self._inner.close()
+
+
+# =================================================
+# エンジンの選択
+# =================================================
+def default_engine_name() -> str:
+    """TOSPEAK_TTS_ENGINE が未指定の場合に使用するエンジン名"""
+    if sys.platform == "win32":
+        return "sapi"
+    return "espeak" if find_espeak() else "null"
+
+
+def create_engine(name: str = None) -> TTSEngine:
+    """
+    読み上げエンジンを作成する
+
+    Args:
+        name: sapi / espeak / null / wav（Noneの場合は config.TTS_ENGINE、未指定なら環境に応じて選択）
+
+    Returns:
+        TTSEngine
+
+    Note:
+        wav の場合は config.TTS_WAV_INNER_ENGINE のエンジンで生成した音声を
+        config.TTS_WAV_OUTPUT_DIR に書き出す
+    """
+    name = (name or config.TTS_ENGINE or default_engine_name()).lower()
+    if name == "sapi":
+        return SapiEngine()
+    if name == "espeak":
+        return EspeakEngine()
+    if name == "null":
+        return NullEngine()
+    if name == "wav":
+        inner_name = (config.TTS_WAV_INNER_ENGINE or default_engine_name()).lower()
+        if inner_name == "wav":
+            raise ValueError("wav エンジンの内部エンジンに wav は指定できません")
+        return WavFileEngine(create_engine(inner_name), config.TTS_WAV_OUTPUT_DIR)
+    raise ValueError(f"不明な読み上げエンジンです: {name}")
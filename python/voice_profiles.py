@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# voice_profiles.py
+# アプリごとの音声・音量・速度（プロファイル）
+#
+# 通知元のアプリ（app_id）ごとに音声・音量・速度を指定できるようにする。
+# 指定していない項目・アプリは、全体の設定（current_voice_name, current_volume, SAPI_RATE_DEFAULT）を使う。
+# 全体の音声が未設定（読み上げ無効）の場合は、プロファイルがあっても読み上げない
+
+from dataclasses import dataclass
+
+import config
+from logger import log_debug, log_error
+
+
+@dataclass(frozen=True)
+class VoiceProfile:
+    """読み上げに使う音声・音量・速度"""
+    voice_name: str
+    volume: int
+    rate: int
+
+
+def _clamp(value, minimum: int, maximum: int) -> int:
+    return max(minimum, min(maximum, int(value)))
+
+
+def resolve_profile(app_id: str = "") -> VoiceProfile:
+    """
+    アプリの読み上げに使う音声・音量・速度を返す
+
+    Args:
+        app_id: 通知元のアプリID（空の場合は全体の設定）
+    """
+    override = config.APP_VOICE_PROFILES.get(app_id) if app_id else None
+    override = override or {}
+    return VoiceProfile(
+        voice_name=override.get("voice_name") or config.current_voice_name,
+        volume=override.get("volume", config.current_volume),
+        rate=override.get("rate", config.SAPI_RATE_DEFAULT),
+    )
+
+
+def apply_profile_settings(msg: dict):
+    """
+    アプリごとのプロファイルを反映する（stdinの set_app_profiles）
+
+    Args:
+        msg: 以下を含む辞書
+            - apps: {app_id: {"voice_name": 音声名, "volume": 0〜100, "rate": -10〜10}}
+              （値がnullの場合はそのアプリのプロファイルを削除する。省略した項目は全体の設定を使う）
+            - replace: Trueの場合は既存のプロファイルをすべて削除してから反映する
+    """
+    try:
+        if msg.get("replace"):
+            config.APP_VOICE_PROFILES.clear()
+        for app_id, profile in (msg.get("apps") or {}).items():
+            if profile is None:
+                config.APP_VOICE_PROFILES.pop(app_id, None)
+                continue
+            override = dict(config.APP_VOICE_PROFILES.get(app_id) or {})
+            if "voice_name" in profile:
+                if profile["voice_name"]:
+                    override["voice_name"] = str(profile["voice_name"])
+                else:
+                    override.pop("voice_name", None)
+            if "volume" in profile:
+                if profile["volume"] is None:
+                    override.pop("volume", None)
+                else:
+                    override["volume"] = _clamp(profile["volume"], config.VOLUME_MIN, config.VOLUME_MAX)
+            if "rate" in profile:
+                if profile["rate"] is None:
+                    override.pop("rate", None)
+                else:
+                    override["rate"] = _clamp(profile["rate"], config.SAPI_RATE_MIN, config.SAPI_RATE_MAX)
+            config.APP_VOICE_PROFILES[app_id] = override
+        log_debug(f"アプリごとのプロファイル: {config.APP_VOICE_PROFILES}")
+    except Exception as e:
+        log_error(f"アプリごとのプロファイルの設定エラー: {e}")
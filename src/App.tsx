@@ -11,7 +11,7 @@ import { useSettings } from "./contexts/use-settings";
 import "./App.css";
 
 function App() {
-  const { logs, setVolume, availableVoices, setVoice } = useToastLogs();
+  const { logs, hasMoreHistory, loadMoreHistory, setVolume, availableVoices, setVoice } = useToastLogs();
   const { settings } = useSettings();
 
   // 起動時に保存された音声設定を適用（初回のみ）
@@ -58,7 +58,7 @@ function App() {
           </h2>
           <SettingsDrawer />
         </section>
-        <NotificationLog logs={logs} />
+        <NotificationLog logs={logs} hasMore={hasMoreHistory} onLoadMore={loadMoreHistory} />
       </main>
       <Toaster theme="dark" richColors />
       <UpdateNotification />
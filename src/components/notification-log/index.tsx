@@ -1,4 +1,5 @@
 import { Bell, AlertCircle, CheckCircle2, Info, HelpCircle, History } from "lucide-react";
+import { Button } from "@/components/ui/button";
 import { ScrollArea } from "@/components/ui/scroll-area";
 import type { ToastLog } from "@/types/toast-log";
 import { NotificationCard } from "./card";
@@ -7,6 +8,8 @@ import { NotificationPopover } from "./popover";
 
 interface NotificationLogProps {
   logs: ToastLog[];
+  hasMore?: boolean; // 通知履歴にさらに古い通知がある
+  onLoadMore?: () => void; // 通知履歴から次の（古い）ページを読み込む
 }
 
 function getLogConfig(log: { type: string; app?: string }) {
@@ -44,11 +47,18 @@ function getLogConfig(log: { type: string; app?: string }) {
   }
 }
 
-export function NotificationLog({ logs }: NotificationLogProps) {
+export function NotificationLog({ logs, hasMore, onLoadMore }: NotificationLogProps) {
   console.log("NotificationLog - logs:", logs);
   return (
     <ScrollArea className="flex-1 min-h-0 border rounded-md" type="always">
       <div className="flex flex-col-reverse gap-2 p-2 pr-4">
+        {/* flex-col-reverse のため、最初の要素が一番下（最も古い通知の下）に表示される */}
+        {hasMore && onLoadMore && (
+          <Button variant="outline" size="sm" onClick={onLoadMore}>
+            <History aria-hidden="true" />
+            さらに古い通知を読み込む
+          </Button>
+        )}
         {logs.map((log, index) => {
           const { icon: Icon, title: logTitle } = getLogConfig(log);
           const { app, app_id, notification_id, text, timestamp, title, type, notifications } = log;
@@ -2,17 +2,20 @@ import {
   useState,
   useRef,
   useEffect,
+  useMemo,
   ReactNode,
 } from "react";
 import safeRegex from "safe-regex";
 import { ToastLogContext } from "./toast-log-context";
 import type { Settings } from "./SettingsContext";
 import type { BlockedApp, Replacement } from "@/types/settings";
-import type { ToastLog } from "@/types/toast-log";
+import type { HistoryPage, SpeechNormalizeOptions, ToastLog } from "@/types/toast-log";
 import type { IpcRendererEvent } from "electron";
 
 export interface ToastLogContextType {
   logs: ToastLog[];
+  hasMoreHistory: boolean; // 通知履歴にさらに古い通知がある
+  loadMoreHistory: () => void; // 通知履歴から次の（古い）ページを読み込む
   clearLogs: () => void;
   speak: (text: string) => void;
   setVolume: (volume: number) => void;
@@ -32,6 +35,23 @@ const setAvailableVoicesRef = {
   current: null as ((voices: string[]) => void) | null,
 };
 const settingsRef = { current: null as Settings | null };
+// 受信した通知を表示中の通知履歴に追加する（ToastLogProviderで設定）
+const addNotificationRef = {
+  current: null as ((message: ToastLog) => void) | null,
+};
+// 読み上げプロセスの準備完了時に通知履歴を読み込み直す（ToastLogProviderで設定）
+const reloadHistoryRef = {
+  current: null as (() => void) | null,
+};
+
+// 通知以外のログ（情報・エラーなど）の最大件数
+const MAX_STATUS_LOGS = 100;
+// 通知履歴の1ページの件数
+const HISTORY_PAGE_SIZE = 50;
+// 表示する通知の最大件数（Python側の HISTORY_PAGE_SIZE_MAX と同じ）
+const MAX_VISIBLE_NOTIFICATIONS = 500;
+// 受信した通知が通知履歴に書き込まれるのを待ってから、最新のページを読み込み直すまでの時間（ミリ秒）
+const HISTORY_REFRESH_DELAY_MS = 1000;
 
 // 最後に読み上げた通知の情報を保持（重複チェック用）
 interface LastSpokenNotification {
@@ -81,7 +101,9 @@ function safeRegexReplace(
 }
 
 // 通知データを加工して読み上げ用テキストを生成
-const processNotificationForSpeech = (log: ToastLog): string => {
+// shortFormがtrueの場合は、読み上げ待ちが多いときに使う短いテキスト（ユーザーのテンプレートから本文を除いたもの）を生成
+// （短いテキストが空になる場合は空文字を返す）
+const processNotificationForSpeech = (log: ToastLog, shortForm = false): string => {
   if (log.type === "notification") {
     const settings = settingsRef.current;
     if (!settings) {
@@ -89,11 +111,12 @@ const processNotificationForSpeech = (log: ToastLog): string => {
       const parts: string[] = [];
       if (log.app) parts.push(log.app);
       if (log.title) parts.push(log.title);
-      if (log.text) {
+      if (log.text && !shortForm) {
         const text = log.text.replace(/\n/g, " ");
         parts.push(text);
       }
-      return parts.join("、") || "通知があります";
+      const joined = parts.join("、");
+      return shortForm ? joined : joined || "通知があります";
     }
 
     // 除外アプリのチェック
@@ -167,7 +190,9 @@ const processNotificationForSpeech = (log: ToastLog): string => {
     }
 
     // テンプレートを使用してテキストを生成
-    let text = settings.speechTemplate || "{app}、{title}、{text}";
+    // 短いテキストはユーザーのテンプレートから本文（{text}）を除いて作る（変換リストも同じく適用する）
+    const template = settings.speechTemplate || "{app}、{title}、{text}";
+    let text = shortForm ? template.replace(/{text}/g, "") : template;
 
     // プレースホルダーを置換（空の場合は空文字列を挿入）
     const appText = (log.app || "").trim();
@@ -206,46 +231,80 @@ const processNotificationForSpeech = (log: ToastLog): string => {
       }
     });
 
-    // 連続文字の短縮処理
-    // consecutiveCharMaxLengthは3でハードコーディング
-    const CONSECUTIVE_CHAR_MAX_LENGTH = 3;
-    const consecutiveMinLength = settings.consecutiveCharMinLength || 0;
-    if (consecutiveMinLength > 0) {
-      // 同じ文字がn文字以上連続している場合、3文字に短縮
-      // 正規表現: (.)\1{n-1,} で同じ文字がn文字以上連続している箇所を検出
-      // ReDoS対策: パターンの安全性をチェック
-      const pattern = `(.)\\1{${consecutiveMinLength - 1},}`;
-      if (safeRegex(pattern)) {
-        const regex = new RegExp(pattern, "g");
-        text = text.replace(regex, (match) => {
-          // 最初の文字を取得して、3文字分だけ繰り返す
-          const char = match[0];
-          return char.repeat(CONSECUTIVE_CHAR_MAX_LENGTH);
-        });
-      } else {
-        console.warn("危険な正規表現パターンが検出されました。連続文字の短縮処理をスキップします:", pattern);
-      }
-    }
-
-    // 連続する空白や区切り文字を整理
-    text = text.replace(/\s+/g, " ").trim();
-    // 連続する区切り文字（、や、）を1つに
-    text = text.replace(/[、，,]+/g, "、").trim();
-    // 先頭と末尾の区切り文字を削除
-    text = text.replace(/^[、，,]+|[、，,]+$/g, "").trim();
-
-    // 最大文字数チェック
-    const maxLength = settings.maxTextLength || 0;
-    if (maxLength > 0 && text.length > maxLength) {
-      text = text.substring(0, maxLength) + "以下省略";
+    // 連続文字の短縮・空白や区切り文字の整理・最大文字数の切り詰めは、Python側（normalize_speech_text）で
+    // 1回の走査でまとめて行う（speechNormalizeOptions の設定を speak-text で送る）
+    text = text.trim();
+    if (shortForm) {
+      return text;
     }
-
     return text || "通知があります";
   }
 
   return "";
 };
 
+// 通知の読み上げテキストの正規化の設定（Python側の normalize_speech_text に渡す）
+const speechNormalizeOptions = (): SpeechNormalizeOptions => {
+  const settings = settingsRef.current;
+  return {
+    consecutive_min_length: settings?.consecutiveCharMinLength || 0,
+    max_length: settings?.maxTextLength || 0,
+  };
+};
+
+// 表示中の通知（古い順）と、次に読み込む通知履歴のページのカーソル（nullの場合はこれ以上ない）
+interface NotificationHistory {
+  items: ToastLog[];
+  cursor: number | null;
+}
+
+// 通知の同一性の判定に使うキー（通知履歴から読み込んだ通知と受信した通知の重複を除くため）
+function notificationKey(log: ToastLog): string {
+  return log.notification_id ||
+    [log.timestamp, log.app, log.title, log.text].map((value) => value || "").join("\u0000");
+}
+
+// 通知履歴のページ（新しい順）を表示用の通知（古い順）に変換する
+function pageToLogs(page: HistoryPage): ToastLog[] {
+  return page.items.map((item) => ({ ...item, type: "notification" as const })).reverse();
+}
+
+/**
+ * 通知履歴の最新のページで、表示中の通知の新しい側を置き換える
+ * - 最新のページと連続する読み込み済みの古いページは残す
+ * - 受信した通知のうち、まだ通知履歴に書き込まれていないもの（最新のページより新しいもの）は残す
+ */
+function mergeLatestPage(prev: NotificationHistory, page: HistoryPage): NotificationHistory {
+  const pageLogs = pageToLogs(page);
+  if (pageLogs.length === 0) {
+    return prev;
+  }
+  const oldestPageId = pageLogs[0].id as number;
+  const newestPageLog = pageLogs[pageLogs.length - 1];
+  const pageKeys = new Set(pageLogs.map(notificationKey));
+
+  let older = prev.items.filter((log) => log.id !== undefined && log.id < oldestPageId);
+  // 最新のページとの間に読み込んでいない通知がある場合は、古いページを読み込み直してもらう
+  if (older.length > 0 && oldestPageId - (older[older.length - 1].id as number) > 1) {
+    older = [];
+  }
+  const pending = prev.items.filter(
+    (log) =>
+      log.id === undefined &&
+      !pageKeys.has(notificationKey(log)) &&
+      (log.timestamp || "") > (newestPageLog.timestamp || "")
+  );
+
+  const merged = [...older, ...pageLogs, ...pending];
+  const items = merged.slice(-MAX_VISIBLE_NOTIFICATIONS);
+  let cursor = older.length > 0 ? prev.cursor : page.next_cursor;
+  if (items.length < merged.length) {
+    // 古い側を切り詰めた場合は、残っている最も古い通知から続きを読み込む
+    cursor = items.find((log) => log.id !== undefined)?.id ?? cursor;
+  }
+  return { items, cursor };
+}
+
 function setupIpcListener() {
   if (
     ipcSetupDone ||
@@ -288,6 +347,18 @@ function setupIpcListener() {
           console.log(`[${source}] 利用可能な音声: ${message.voices.length}件`);
         }
         return; // UIには表示しない
+      case "startup_report":
+        // 起動処理の所要時間（コンソールのみ出力、UIには表示しない）
+        console.debug(`[${source}] 起動処理の所要時間: ${message.total_ms}ms`, message);
+        return;
+      case "metrics":
+        // 実行状態のメトリクス（コンソールのみ出力、UIには表示しない）
+        console.debug(`[${source}] metrics`, message.metrics);
+        return;
+      case "history_page":
+      case "dry_run_result":
+        // 通知履歴の検索結果・読み上げルールの試行結果はmainプロセスが要求元に返すため、UIには表示しない
+        return;
       case "notification":
         console.log(
           `[${source}] Notification: ${message.app || "Unknown"} - ${
@@ -302,11 +373,15 @@ function setupIpcListener() {
 
     // debugタイプ以外をUIに追加
     if (setLogsRef.current) {
-      setLogsRef.current((prevLogs) => {
-        const newLogs = [...prevLogs, message];
-        // 最大100件まで保持
-        return newLogs.slice(-100);
-      });
+      if (message.type === "notification" && addNotificationRef.current) {
+        // 通知はPython側の通知履歴（SQLite）に保存されるため、表示中のページに追加するだけにする
+        addNotificationRef.current(message);
+      } else {
+        setLogsRef.current((prevLogs) => [...prevLogs, message].slice(-MAX_STATUS_LOGS));
+        if (message.type === "ready" && reloadHistoryRef.current) {
+          reloadHistoryRef.current();
+        }
+      }
 
       // 通知タイプの場合、自動的に読み上げ
       if (message.type === "notification") {
@@ -353,7 +428,16 @@ function setupIpcListener() {
           if (typeof window !== "undefined" && window.ipcRenderer) {
             const ipcRenderer = window.ipcRenderer;
             console.log("📤 IPC送信: speak-text", speechText);
-            ipcRenderer.send("speak-text", speechText);
+            // app_idはPython側でアプリごとの流量制限に使用する
+            // 短いテキストは読み上げ待ちが多いときにPython側で代わりに読み上げる（全文より短くない場合は送らない）
+            const shortText = processNotificationForSpeech(message, true);
+            ipcRenderer.send(
+              "speak-text",
+              speechText,
+              message.app_id || "",
+              shortText.length < speechText.length ? shortText : "",
+              speechNormalizeOptions()
+            );
           } else {
             console.warn("⚠️ ipcRendererが利用できません");
           }
@@ -402,14 +486,102 @@ function setupIpcListener() {
 }
 
 export function ToastLogProvider({ children }: { children: ReactNode }) {
-  const [logs, setLogs] = useState<ToastLog[]>([]);
+  // 通知以外のログ（情報・エラーなど）
+  const [statusLogs, setLogs] = useState<ToastLog[]>([]);
+  // 通知はPython側の通知履歴（SQLite）から表示する分だけ読み込む
+  const [history, setHistory] = useState<NotificationHistory>({ items: [], cursor: null });
   const [availableVoices, setAvailableVoices] = useState<string[]>([]);
   const isSetupRef = useRef(false);
   const logsLoadedRef = useRef(false);
+  // falseの場合は通知履歴を使わず、受信した通知をメモリに保持する（保存が無効、または読み上げプロセスの起動前）
+  const historyEnabledRef = useRef(false);
+  const historyLoadingRef = useRef(false);
+  const historyRefreshTimerRef = useRef<ReturnType<typeof setTimeout> | null>(null);
+
+  const queryHistoryPage = async (cursor: number | null, limit: number): Promise<HistoryPage | null> => {
+    if (typeof window === "undefined" || !window.ipcRenderer) {
+      return null;
+    }
+    try {
+      const page: HistoryPage = await window.ipcRenderer.invoke("query-history", { cursor, limit });
+      if (page.error) {
+        console.warn("[ToastLogContext] 通知履歴の取得エラー:", page.error);
+        return null;
+      }
+      historyEnabledRef.current = page.enabled !== false;
+      return historyEnabledRef.current ? page : null;
+    } catch (error) {
+      console.error("Failed to query history:", error);
+      return null;
+    }
+  };
+
+  // 通知履歴の最新のページを読み込む
+  const reloadHistory = async () => {
+    const page = await queryHistoryPage(null, HISTORY_PAGE_SIZE);
+    if (page) {
+      setHistory((prev) => mergeLatestPage(prev, page));
+    }
+  };
+
+  // 通知履歴から次の（古い）ページを読み込む
+  const loadMoreHistory = async () => {
+    const cursor = history.cursor;
+    if (cursor === null || historyLoadingRef.current) {
+      return;
+    }
+    historyLoadingRef.current = true;
+    try {
+      const page = await queryHistoryPage(cursor, HISTORY_PAGE_SIZE);
+      if (page) {
+        setHistory((prev) =>
+          prev.cursor !== cursor ? prev : { items: [...pageToLogs(page), ...prev.items], cursor: page.next_cursor }
+        );
+      }
+    } finally {
+      historyLoadingRef.current = false;
+    }
+  };
+
+  // 受信した通知を表示中の通知に追加し、通知履歴に書き込まれた後で最新のページを読み込み直す
+  const addNotification = (message: ToastLog) => {
+    const key = notificationKey(message);
+    setHistory((prev) => {
+      if (prev.items.some((log) => notificationKey(log) === key)) {
+        return prev;
+      }
+      const items = [...prev.items, message].slice(-MAX_VISIBLE_NOTIFICATIONS);
+      const trimmed = items.length <= prev.items.length;
+      return {
+        items,
+        cursor: trimmed && prev.cursor !== null ? items.find((log) => log.id !== undefined)?.id ?? prev.cursor : prev.cursor,
+      };
+    });
+    if (historyEnabledRef.current) {
+      if (historyRefreshTimerRef.current) {
+        clearTimeout(historyRefreshTimerRef.current);
+      }
+      historyRefreshTimerRef.current = setTimeout(() => {
+        historyRefreshTimerRef.current = null;
+        reloadHistory();
+      }, HISTORY_REFRESH_DELAY_MS);
+    }
+  };
 
   // 常に最新のsetLogsとsetAvailableVoicesをrefに保存
   setLogsRef.current = setLogs;
   setAvailableVoicesRef.current = setAvailableVoices;
+  addNotificationRef.current = addNotification;
+  reloadHistoryRef.current = reloadHistory;
+
+  // 通知以外のログと通知を時刻順に並べる
+  const logs = useMemo(
+    () =>
+      [...statusLogs, ...history.items].sort((a, b) =>
+        (a.timestamp || "").localeCompare(b.timestamp || "")
+      ),
+    [statusLogs, history.items]
+  );
 
   // 初回のみIPCセットアップ
   if (!isSetupRef.current) {
@@ -438,12 +610,20 @@ export function ToastLogProvider({ children }: { children: ReactNode }) {
           });
           
           if (filteredLogs.length > 0) {
-            setLogs(filteredLogs);
+            // 通知は通知履歴を読み込むまでの間（または通知履歴が無効な場合）に表示する
+            setLogs(filteredLogs.filter((log) => log.type !== "notification").slice(-MAX_STATUS_LOGS));
+            const storedNotifications = filteredLogs.filter((log) => log.type === "notification");
+            setHistory((prev) =>
+              prev.items.length > 0 ? prev : { items: storedNotifications.slice(-MAX_VISIBLE_NOTIFICATIONS), cursor: null }
+            );
           }
           logsLoadedRef.current = true;
         }
       }).catch((error) => {
         console.error("Failed to get stored logs:", error);
+      }).finally(() => {
+        // 保持されていたログの後に、通知履歴の最新のページを読み込む
+        reloadHistoryRef.current?.();
       });
 
       // 保持されている利用可能な音声リストを取得
@@ -503,6 +683,7 @@ export function ToastLogProvider({ children }: { children: ReactNode }) {
 
   const clearLogs = () => {
     setLogs([]);
+    setHistory({ items: [], cursor: null });
   };
 
   const speak = (text: string) => {
@@ -531,7 +712,7 @@ export function ToastLogProvider({ children }: { children: ReactNode }) {
 
   return (
     <ToastLogContext.Provider
-      value={{ logs, clearLogs, speak, setVolume, availableVoices, setVoice }}
+      value={{ logs, hasMoreHistory: history.cursor !== null, loadMoreHistory, clearLogs, speak, setVolume, availableVoices, setVoice }}
     >
       {children}
     </ToastLogContext.Provider>
@@ -1,3 +1,5 @@
+import type { BlockedApp, Replacement } from "./settings";
+
 // 過去の通知の型定義
 export interface PastNotification {
   app: string;
@@ -17,7 +19,11 @@ export interface ToastLog {
     | "error"
     | "debug"
     | "past_notifications"
-    | "available_voices";
+    | "available_voices"
+    | "startup_report"
+    | "history_page"
+    | "dry_run_result"
+    | "metrics";
   app?: string;
   app_id?: string;
   title?: string;
@@ -25,7 +31,72 @@ export interface ToastLog {
   notification_id?: string;
   timestamp?: string;
   source?: string;
+  id?: number; // 通知履歴（SQLite）の行ID（通知履歴から取得した通知のみ）
   notifications?: PastNotification[]; // 過去の通知一覧
   voices?: string[]; // 利用可能な音声リスト（available_voicesタイプの場合）
+  total_ms?: number; // 起動処理の所要時間（startup_reportタイプの場合）
+  metrics?: Record<string, unknown>; // 実行状態のメトリクス（metricsタイプの場合）
+}
+
+// 通知履歴の検索条件（query-history）
+export interface HistoryQuery {
+  query?: string; // app/title/textの部分一致
+  app_id?: string; // 通知元のアプリIDで絞り込む
+  cursor?: number | null; // 前のページのnext_cursor（省略時は最新から）
+  limit?: number; // 1ページの件数
+}
+
+// 通知履歴の検索結果（新しい順）
+export interface HistoryPage {
+  items: (PastNotification & { id: number })[];
+  next_cursor: number | null; // 次のページのカーソル（最後のページの場合はnull）
+  enabled?: boolean; // falseの場合は通知履歴への保存が無効
+  error?: string;
+}
+
+// 通知の読み上げテキストの正規化の設定（speak-text で送り、Python側の normalize_speech_text に渡す）
+export interface SpeechNormalizeOptions {
+  consecutive_min_length: number; // 連続文字を短縮する最小文字数（0の場合は短縮しない）
+  max_length: number; // 最大文字数（0の場合は切り詰めない）
 }
 
+// 読み上げルールの試行（dry-run）で適用する設定
+export interface DryRunSettings {
+  blockedApps?: BlockedApp[];
+  replacements?: Replacement[];
+  speechTemplate?: string;
+  consecutiveCharMinLength?: number;
+  maxTextLength?: number;
+}
+
+// 読み上げルールの試行の対象
+export interface DryRunRequest {
+  settings: DryRunSettings;
+  notifications?: Partial<PastNotification>[]; // 省略時は history の条件で通知履歴から取得
+  history?: { query?: string; app_id?: string; limit?: number };
+}
+
+// 読み上げルールの試行の結果（1件分）
+export interface DryRunItem {
+  index: number;
+  notification_id: string | null;
+  blocked: boolean;
+  blocked_by: number | null; // 一致した読ませない通知のルールの番号
+  text: string; // 実際に読み上げるテキスト（片仮名変換の後）
+  timings_ms: Record<string, number>; // 処理段階ごとの所要時間
+}
+
+// 読み上げルールの試行の結果
+export interface DryRunResponse {
+  results: DryRunItem[];
+  summary: {
+    count: number;
+    blocked: number;
+    elapsed_ms: number;
+    per_second: number | null;
+    stage_ms: Record<string, number>;
+    skipped_rules: { kind: string; index: number; pattern: string; reason: string }[];
+    e2k_available: boolean;
+  } | null;
+  error?: string;
+}
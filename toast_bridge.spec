@@ -5,18 +5,13 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
+    # 標準ライブラリ（asyncio, json など）は解析で自動的に検出されるため指定しない
     hiddenimports=[
         'winsdk',
         'winsdk.windows.ui.notifications.management',
         'winsdk.windows.ui.notifications',
         'win32com.client',
         'pythoncom',
-        'asyncio',
-        'json',
-        'sys',
-        'io',
-        'os',
-        'datetime',
         'e2k',
         'e2k.models',
         'e2k.inference',
@@ -28,7 +23,27 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # ブリッジで使用しないモジュールを除外する
+    # onefileのexeは起動のたびに展開されるため、サイズが小さいほどコールドスタートが速くなる
+    excludes=[
+        'tkinter',
+        '_tkinter',
+        'turtle',
+        'pydoc',
+        'pydoc_data',
+        'doctest',
+        'lib2to3',
+        'idlelib',
+        'ensurepip',
+        'venv',
+        'distutils',
+        'setuptools',
+        'pip',
+        'xmlrpc',
+        'PIL',
+        'IPython',
+        'matplotlib',
+    ],
     noarchive=False,
     optimize=0,
 )